@@ -6,6 +6,7 @@ import re
 import sys
 
 import hydra_genetics.utils
+from hydra_genetics.commands.hotspot_report import hotspot_report
 from hydra_genetics.commands.prep_pipeline_env import environment
 from hydra_genetics.commands.references import references
 from hydra_genetics.commands.create import PipelineCreate, RuleCreate, CreateInputFiles, CreateLongReadInputFiles
@@ -300,5 +301,7 @@ cli.add_command(references)
 
 cli.add_command(environment)
 
+cli.add_command(hotspot_report)
+
 if __name__ == "__main__":
     run()
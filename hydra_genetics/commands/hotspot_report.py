@@ -0,0 +1,406 @@
+# coding: utf-8
+
+import click
+import logging
+import signal
+
+from hydra_genetics.commands.report_client import submit
+from hydra_genetics.utils.io.cohort_report import merge_hotspot_reports
+from hydra_genetics.utils.io.hotspot_cache import HotspotCache
+from hydra_genetics.utils.io.hotspot_report import OUTPUT_FORMATS, generate_hotspot_reports, merge_report_shards, \
+    read_sample_manifest
+from hydra_genetics.utils.io.report_worker import SOCKET_ENV, ReportWorker, stop_worker
+
+log = logging.getLogger()
+
+
+@click.group("hotspot-report", short_help="generate hotspot reports")
+def hotspot_report():
+    pass
+
+
+@hotspot_report.command(short_help="generate hotspot reports for all samples in a manifest")
+@click.option(
+    "-m",
+    "--manifest",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="tab separated file with header and columns sample, output, vcf, gvcf or bam, the depth source, and optionally "
+         "vcf_wo_pick and coverage, the hotspot coverage summary output",
+)
+@click.option(
+    "-H",
+    "--hotspot-file",
+    required=True,
+    type=str,
+    help="hotspot file, '-' for none",
+)
+@click.option(
+    "-c",
+    "--chr-mapping",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="file mapping chr names to NC names",
+)
+@click.option(
+    "-y",
+    "--column-yaml-file",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="yaml file defining the report columns",
+)
+@click.option(
+    "-l",
+    "--level",
+    required=True,
+    multiple=True,
+    type=(int, str, str),
+    help="read depth level, depth status and analyzable, ex '-l 300 ok yes -l 30 low yes -l 0 low not_analyzable'",
+)
+@click.option(
+    "-p",
+    "--processes",
+    required=False,
+    type=int,
+    default=1,
+    show_default=True,
+    help="number of samples processed in parallel, or of contigs of a single sample",
+)
+@click.option(
+    "--hotspot-cache-dir",
+    required=False,
+    type=click.Path(file_okay=False),
+    default=None,
+    envvar="HYDRA_GENETICS_HOTSPOT_CACHE",
+    help="directory used to cache parsed hotspot files, can be shared between runs",
+)
+@click.option(
+    "--hotspot-cache-size",
+    required=False,
+    type=int,
+    default=1024,
+    show_default=True,
+    help="maximum size of the hotspot cache in MB, least recently used entries are removed",
+)
+@click.option(
+    "--fingerprint",
+    is_flag=True,
+    default=False,
+    help="store a fingerprint of the inputs next to each report and keep reports whose inputs are unchanged since the last run",
+)
+@click.option(
+    "-f",
+    "--force",
+    is_flag=True,
+    default=False,
+    help="regenerate reports without checking or storing fingerprints",
+)
+@click.option(
+    "-s",
+    "--streaming",
+    is_flag=True,
+    default=False,
+    help="generate each report in a single sweep with bounded memory, requires coordinate sorted vcf files",
+)
+@click.option(
+    "-t",
+    "--threads",
+    required=False,
+    type=int,
+    default=1,
+    show_default=True,
+    help="number of threads used to decompress each vcf and gvcf file, per sample processed in parallel",
+)
+@click.option(
+    "-z",
+    "--indexed",
+    is_flag=True,
+    default=False,
+    help="write coordinate sorted, bgzip compressed reports with a tabix index, outputs should end with .gz",
+)
+@click.option(
+    "-o",
+    "--output-format",
+    required=False,
+    type=click.Choice(OUTPUT_FORMATS),
+    default="tsv",
+    show_default=True,
+    help="report format, parquet and arrow write typed columns and require pyarrow",
+)
+@click.option(
+    "-r",
+    "--reference-file",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="fasta file used to read cram files in the bam column",
+)
+@click.option(
+    "--hotspot-only",
+    is_flag=True,
+    default=False,
+    help="only report the hotspots, reading the vcf records in the hotspot regions through the index",
+)
+@click.option(
+    "-b",
+    "--regions-file",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="bed file, only generate the shard of each report in its regions, shards are combined by merge-shards",
+)
+def batch(manifest, hotspot_file, chr_mapping, column_yaml_file, level, processes, hotspot_cache_dir, hotspot_cache_size,
+          fingerprint, force, streaming, threads, indexed, output_format, reference_file, hotspot_only, regions_file):
+    samples = read_sample_manifest(manifest)
+    log.info("Generating hotspot reports for {} samples".format(len(samples)))
+    hotspot_cache = None
+    if hotspot_cache_dir is not None:
+        hotspot_cache = HotspotCache(hotspot_cache_dir, hotspot_cache_size * 1024**2)
+    try:
+        generate_hotspot_reports(samples, sorted(level, key=lambda x: x[0], reverse=True), hotspot_file, chr_mapping,
+                                 column_yaml_file, processes, hotspot_cache, force, streaming, threads, indexed,
+                                 output_format, reference_file, hotspot_only, regions_file, fingerprint)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+
+@hotspot_report.command(short_help="merge sorted hotspot reports of a cohort into a variant x sample matrix")
+@click.option(
+    "-m",
+    "--manifest",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="tab separated file with header and columns sample and output, the sample report generated with --indexed",
+)
+@click.option(
+    "-c",
+    "--chr-mapping",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="file mapping chr names to NC names",
+)
+@click.option(
+    "-o",
+    "--output-format",
+    required=False,
+    type=click.Choice(OUTPUT_FORMATS),
+    default="parquet",
+    show_default=True,
+    help="matrix format, parquet and arrow require pyarrow",
+)
+@click.option(
+    "--max-open-files",
+    required=False,
+    type=int,
+    default=256,
+    show_default=True,
+    help="maximum number of reports merged at once, more reports are merged in several passes",
+)
+@click.argument("output", type=click.Path(dir_okay=False))
+def merge(manifest, chr_mapping, output_format, max_open_files, output):
+    samples = read_sample_manifest(manifest, required=('sample', 'output'))
+    merge_hotspot_reports(samples, output, chr_mapping, output_format, max_open_files)
+
+
+@hotspot_report.command("merge-shards", short_help="merge the shard reports of a sample generated with --regions-file")
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.argument("shards", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def merge_shards(output, shards):
+    merge_report_shards(list(shards), output)
+
+
+@hotspot_report.command(short_help="run a worker generating the reports submitted to it with the inputs loaded once")
+@click.option(
+    "-S",
+    "--socket",
+    "socket_path",
+    required=True,
+    type=click.Path(dir_okay=False),
+    envvar=SOCKET_ENV,
+    help="unix socket the worker listens on",
+)
+@click.option(
+    "-H",
+    "--hotspot-file",
+    required=False,
+    type=str,
+    default="-",
+    help="hotspot file, '-' for none",
+)
+@click.option(
+    "-c",
+    "--chr-mapping",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="file mapping chr names to NC names, required unless --stop is given",
+)
+@click.option(
+    "-y",
+    "--column-yaml-file",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="yaml file defining the report columns",
+)
+@click.option(
+    "--hotspot-cache-dir",
+    required=False,
+    type=click.Path(file_okay=False),
+    default=None,
+    envvar="HYDRA_GENETICS_HOTSPOT_CACHE",
+    help="directory used to cache parsed hotspot files, can be shared between runs",
+)
+@click.option(
+    "--hotspot-cache-size",
+    required=False,
+    type=int,
+    default=1024,
+    show_default=True,
+    help="maximum size of the hotspot cache in MB, least recently used entries are removed",
+)
+@click.option(
+    "--stop",
+    is_flag=True,
+    default=False,
+    help="stop the worker listening on the socket",
+)
+def worker(socket_path, hotspot_file, chr_mapping, column_yaml_file, hotspot_cache_dir, hotspot_cache_size, stop):
+    if stop:
+        if not stop_worker(socket_path):
+            log.info("No report worker on {}".format(socket_path))
+        return
+    if chr_mapping is None:
+        raise click.UsageError("Missing option '-c' / '--chr-mapping'")
+    hotspot_cache = None
+    if hotspot_cache_dir is not None:
+        hotspot_cache = HotspotCache(hotspot_cache_dir, hotspot_cache_size * 1024**2)
+    try:
+        report_worker = ReportWorker(socket_path, hotspot_file, chr_mapping, column_yaml_file, hotspot_cache)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    # remove the socket when the worker is terminated, KeyboardInterrupt isn't caught by the request handler
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        report_worker.serve()
+    except KeyboardInterrupt:
+        log.info("Report worker on {} terminated".format(socket_path))
+
+
+@hotspot_report.command(short_help="benchmark the hotspot report on synthetic samples of the given sizes")
+@click.option(
+    "--hotspots",
+    required=False,
+    multiple=True,
+    type=int,
+    default=[1000],
+    show_default=True,
+    help="number of hotspots, can be given several times",
+)
+@click.option(
+    "--variants",
+    required=False,
+    multiple=True,
+    type=int,
+    default=[10000],
+    show_default=True,
+    help="number of vcf records, can be given several times",
+)
+@click.option(
+    "--gvcf-records",
+    required=False,
+    multiple=True,
+    type=int,
+    default=[100000],
+    show_default=True,
+    help="number of gvcf records, can be given several times",
+)
+@click.option(
+    "--vep-columns",
+    required=False,
+    multiple=True,
+    type=int,
+    default=[12],
+    show_default=True,
+    help="number of vep fields, all reported, can be given several times",
+)
+# BENCHMARK_MODES, the benchmark module is only imported by the benchmark command
+@click.option(
+    "-m",
+    "--mode",
+    required=False,
+    multiple=True,
+    type=click.Choice(("serial", "streaming", "parallel", "hotspot-only", "format-row")),
+    default=("serial", "streaming", "parallel", "hotspot-only", "format-row"),
+    show_default=True,
+    help="report mode, can be given several times, format-row times the formatting of the serial report rows",
+)
+@click.option(
+    "-y",
+    "--column-yaml-file",
+    required=False,
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="yaml file defining the report columns instead of the generated one reporting all vep fields, can be given "
+         "several times",
+)
+@click.option(
+    "-t",
+    "--threads",
+    required=False,
+    multiple=True,
+    type=int,
+    default=[1],
+    show_default=True,
+    help="number of threads used to decompress each vcf and gvcf file, can be given several times",
+)
+@click.option(
+    "-p",
+    "--processes",
+    required=False,
+    type=int,
+    default=2,
+    show_default=True,
+    help="number of processes used in parallel mode",
+)
+@click.option(
+    "--repeat",
+    required=False,
+    type=int,
+    default=3,
+    show_default=True,
+    help="number of timed runs of each report",
+)
+@click.option(
+    "--no-memory",
+    is_flag=True,
+    default=False,
+    help="don't measure the peak memory, which takes an additional run",
+)
+@click.option(
+    "--work-dir",
+    required=False,
+    type=click.Path(file_okay=False),
+    default=None,
+    help="directory keeping the generated samples and reports, and reusing samples generated by a previous run",
+)
+@click.option(
+    "--seed",
+    required=False,
+    type=int,
+    default=1,
+    show_default=True,
+    help="seed of the generated samples",
+)
+@click.argument("output", type=click.Path(dir_okay=False))
+def benchmark(hotspots, variants, gvcf_records, vep_columns, mode, column_yaml_file, threads, processes, repeat, no_memory,
+              work_dir, seed, output):
+    from hydra_genetics.utils.io.report_benchmark import run_benchmarks
+    # one json line per input sizes, column yaml file, mode and threads is appended to the output
+    run_benchmarks(output, hotspots, variants, gvcf_records, vep_columns, mode, threads, processes, repeat, not no_memory,
+                   work_dir, seed, column_yaml_file or (None,))
+
+
+hotspot_report.add_command(submit)
@@ -0,0 +1,74 @@
+# coding: utf-8
+
+import click
+import logging
+
+from hydra_genetics.exceptions import ReportWorkerError
+from hydra_genetics.utils.io.report_worker import SOCKET_ENV, submit_hotspot_report
+
+log = logging.getLogger()
+
+
+# also installed as the hydra-genetics-report script, which doesn't import the other commands and starts quickly
+@click.command("submit", short_help="generate a hotspot report through a report worker, or in process if none is running")
+@click.option(
+    "-S",
+    "--socket",
+    "socket_path",
+    required=False,
+    type=click.Path(dir_okay=False),
+    default=None,
+    envvar=SOCKET_ENV,
+    help="unix socket of the report worker, see 'hotspot-report worker'",
+)
+@click.option("--sample", required=True, type=str, help="sample name in the vcf files")
+@click.option("--output", required=True, type=click.Path(dir_okay=False), help="report output")
+@click.option("--vcf", required=True, type=click.Path(exists=True, dir_okay=False), help="vep annotated vcf")
+@click.option("--gvcf", required=False, type=click.Path(exists=True, dir_okay=False), default=None,
+              help="genomic vcf the depth is read from")
+@click.option("--bam", required=False, type=click.Path(exists=True, dir_okay=False), default=None,
+              help="bam or cram file the depth is computed from, instead of a gvcf")
+@click.option("--vcf-wo-pick", required=False, type=click.Path(exists=True, dir_okay=False), default=None,
+              help="vcf annotated by vep without --pick")
+@click.option("--coverage-output", required=False, type=click.Path(dir_okay=False), default=None,
+              help="hotspot coverage summary output")
+@click.option("-H", "--hotspot-file", required=True, type=str, help="hotspot file, '-' for none")
+@click.option("-c", "--chr-mapping", required=True, type=click.Path(exists=True, dir_okay=False),
+              help="file mapping chr names to NC names")
+@click.option("-y", "--column-yaml-file", required=False, type=click.Path(exists=True, dir_okay=False), default=None,
+              help="yaml file defining the report columns")
+@click.option("-l", "--level", required=True, multiple=True, type=(int, str, str),
+              help="read depth level, depth status and analyzable, ex '-l 300 ok yes -l 30 low yes -l 0 low not_analyzable'")
+@click.option("-p", "--processes", required=False, type=int, default=1, show_default=True,
+              help="number of processes used to build the report")
+@click.option("--fingerprint", is_flag=True, default=False,
+              help="store a fingerprint of the inputs next to the report and keep the report if its inputs are unchanged")
+@click.option("-f", "--force", is_flag=True, default=False, help="regenerate the report without checking or storing a fingerprint")
+@click.option("-s", "--streaming", is_flag=True, default=False, help="generate the report with bounded memory")
+@click.option("-t", "--threads", required=False, type=int, default=1, show_default=True,
+              help="number of threads used to decompress each vcf and gvcf file")
+@click.option("-z", "--indexed", is_flag=True, default=False, help="write a coordinate sorted, bgzip compressed and indexed report")
+# OUTPUT_FORMATS, not imported from the report module to keep the client light
+@click.option("-o", "--output-format", required=False, type=click.Choice(("tsv", "parquet", "arrow")), default="tsv",
+              show_default=True, help="report format, parquet and arrow write typed columns and require pyarrow")
+@click.option("-r", "--reference-file", required=False, type=click.Path(exists=True, dir_okay=False), default=None,
+              help="fasta file used to read cram files")
+@click.option("--hotspot-only", is_flag=True, default=False, help="only report the hotspots")
+@click.option("-b", "--regions-file", required=False, type=click.Path(exists=True, dir_okay=False), default=None,
+              help="bed file, only generate the shard of the report in its regions")
+def submit(socket_path, sample, output, vcf, gvcf, bam, vcf_wo_pick, coverage_output, hotspot_file, chr_mapping,
+           column_yaml_file, level, processes, fingerprint, force, streaming, threads, indexed, output_format, reference_file,
+           hotspot_only, regions_file):
+    try:
+        generated = submit_hotspot_report(socket_path, sample=sample, output=output,
+                                          levels=sorted(level, key=lambda x: x[0], reverse=True), hotspot_file=hotspot_file,
+                                          vcf_file=vcf, gvcf_file=gvcf, chr_mapping=chr_mapping, vcf_file_wo_pick=vcf_wo_pick,
+                                          column_yaml_file=column_yaml_file, processes=processes,
+                                          coverage_output=coverage_output, force=force, streaming=streaming, threads=threads,
+                                          indexed=indexed, output_format=output_format, bam_file=bam,
+                                          reference_file=reference_file, hotspot_only=hotspot_only, regions_file=regions_file,
+                                          fingerprint=fingerprint)
+    except (ValueError, ReportWorkerError) as e:
+        raise click.ClickException(str(e))
+    if generated:
+        log.info("Report generated by the worker on {}".format(socket_path))
@@ -1,2 +1,6 @@
 class HydraGeneticsVersionError(Exception):
     pass
+
+
+class ReportWorkerError(Exception):
+    pass
@@ -27,3 +27,38 @@ class ChrTranslater(object):
 
     def get_nc_value(self, chr_id):
         return self.chr_to_nc[chr_id]
+
+
+class ContigDictionary(object):
+    """
+        Small integer ids for the contigs of a ChrTranslater mapping, shared by the chr name used in vcf
+        and gVCF files and the NC name used in hotspot files.
+
+        Parameters:
+            chr_translater (ChrTranslater): mapping between chr and NC names
+    """
+    def __init__(self, chr_translater):
+        self.chr_names = []
+        self.nc_names = []
+        self._ids = dict()
+        for chr_name, nc_name in chr_translater.chr_to_nc.items():
+            self._ids[chr_name] = len(self.chr_names)
+            self._ids[nc_name] = len(self.chr_names)
+            self.chr_names.append(chr_name)
+            self.nc_names.append(nc_name)
+
+    def get_id(self, name):
+        return self._ids[name]
+
+    def get_header_ids(self, header):
+        """
+            Contig id for each contig in a vcf header, indexed by record.rid. Contigs missing from the
+            mapping get None.
+        """
+        return [self._ids.get(contig, None) for contig in header.contigs]
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __len__(self):
+        return len(self.chr_names)
@@ -0,0 +1,142 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import functools
+import gzip
+import heapq
+import logging
+import tempfile
+from itertools import groupby
+
+from hydra_genetics.utils.io.chr import ChrTranslater, ContigDictionary
+from hydra_genetics.utils.io.hotspot_report import OUTPUT_FORMATS, get_contig_rank, write_columnar_report, write_report
+from hydra_genetics.utils.models.report import NULL_VALUES, HotspotReport
+
+log = logging.getLogger()
+
+COHORT_COLUMNS = ('chr', 'start', 'stop', 'ref', 'alt', 'sample', 'report', 'depth', 'vaf')
+
+COHORT_TYPES = {'chr': 'category', 'start': 'int', 'stop': 'int', 'sample': 'category', 'report': 'category',
+                'depth': 'float', 'vaf': 'float'}
+
+# sample report columns used by the cohort matrix
+REPORT_COLUMNS = ('chr', 'start', 'stop', 'ref', 'alt', 'report', 'gvcf_depth', 'ref_depth', 'alt_depth')
+
+
+def merge_hotspot_reports(samples, output, chr_mapping, output_format="parquet", max_open_files=256):
+    """
+        Merge the coordinate sorted hotspot reports of a cohort into a sparse variant x sample matrix.
+
+        The reports are streamed through a k-way merge on chr, start and stop, so memory use depends on the
+        number of reports and entries at a position, not on the size of the reports. Each entry of the matrix,
+        a variant (chr, start, stop, ref, alt) reported for a sample, is written as a row with the report
+        class, the gvcf depth and the variant allele frequency, see get_vaf. Hotspot positions without variants
+        have '-' as ref and alt. Rows are ordered by position, ref and alt and then by sample in manifest order.
+
+        Parameters:
+            samples (list): dicts with sample and output, the sample report, see read_sample_manifest
+            output (string): path to the matrix file
+            chr_mapping (string): path to file mapping chr to NC names, giving the contig order of the reports
+            output_format (string): one of OUTPUT_FORMATS, parquet and arrow require pyarrow and arrow
+                collects the matrix in memory before it is written
+            max_open_files (int): maximum number of reports merged at once, more reports are merged in several
+                passes through temporary files
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Unknown output format {}, expected one of: {}".format(output_format, ", ".join(OUTPUT_FORMATS)))
+    if max_open_files < 2:
+        raise ValueError("At least two reports must be merged at once, not {}".format(max_open_files))
+    contigs = ContigDictionary(ChrTranslater(chr_mapping))
+    log.info("Merging hotspot reports for {} samples".format(len(samples)))
+    matrix = HotspotReport(COHORT_COLUMNS, get_cohort_rows(samples, contigs, max_open_files), types=COHORT_TYPES)
+    if output_format == "tsv":
+        write_report(output, matrix.columns, matrix)
+    else:
+        write_columnar_report(output, matrix, output_format)
+
+
+def get_cohort_rows(samples, contigs, max_open_files=256):
+    """
+        Generate the rows of the cohort matrix, see merge_hotspot_reports.
+    """
+    sources = [functools.partial(read_report_entries, sample['output'], index, sample['sample'], contigs)
+               for index, sample in enumerate(samples)]
+    spools = []
+    try:
+        # merge groups of reports into temporary files until the remaining sources can be opened at once
+        while len(sources) > max_open_files:
+            merged = []
+            for start in range(0, len(sources), max_open_files):
+                spool = tempfile.TemporaryFile(mode="w+")
+                spools.append(spool)
+                for entry in heapq.merge(*[source() for source in sources[start:start + max_open_files]], key=_position):
+                    spool.write("\t".join(map(str, entry)) + "\n")
+                merged.append(functools.partial(read_spooled_entries, spool))
+            sources = merged
+        entries = heapq.merge(*[source() for source in sources], key=_position)
+        for _, group in groupby(entries, key=_position):
+            for _, chrom, start, stop, ref, alt, _, sample, report, depth, vaf in sorted(group):
+                yield [chrom, str(start), str(stop), ref, alt, sample, report, depth, vaf]
+    finally:
+        for spool in spools:
+            spool.close()
+
+
+def _position(entry):
+    return entry[:4]
+
+
+def read_report_entries(report_file, sample_index, sample, contigs):
+    """
+        Read the entries of a coordinate sorted sample report, bgzip compressed or plain text, see
+        write_indexed_report.
+
+        Returns:
+            generator of (contig rank, chr, start, stop, ref, alt, sample index, sample, report, depth, vaf)
+    """
+    with open_report(report_file) as report:
+        header = report.readline().rstrip("\n").split("\t")
+        missing = [column for column in REPORT_COLUMNS if column not in header]
+        if missing:
+            raise ValueError("Report {} is missing column(s): {}".format(report_file, ", ".join(missing)))
+        columns = [header.index(column) for column in REPORT_COLUMNS]
+        previous = None
+        for line in report:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            row = line.split("\t")
+            chrom, start, stop, ref, alt, report_type, depth, ref_depth, alt_depth = [row[column] for column in columns]
+            position = (get_contig_rank(contigs, chrom), chrom, int(start), int(stop))
+            if previous is not None and position < previous:
+                raise ValueError("Report {} isn't coordinate sorted at {}:{}, write it indexed".format(report_file, chrom, start))
+            previous = position
+            yield position + (ref, alt, sample_index, sample, report_type, depth, get_vaf(ref_depth, alt_depth))
+
+
+def read_spooled_entries(spool):
+    spool.seek(0)
+    for line in spool:
+        entry = line.rstrip("\n").split("\t")
+        yield (int(entry[0]), entry[1], int(entry[2]), int(entry[3]), entry[4], entry[5], int(entry[6])) + tuple(entry[7:])
+
+
+def open_report(report_file):
+    with open(report_file, 'rb') as report:
+        compressed = report.read(2) == b"\x1f\x8b"
+    return gzip.open(report_file, 'rt') if compressed else open(report_file)
+
+
+def get_vaf(ref_depth, alt_depth):
+    """
+        Variant allele frequency, the summed depth of the alt alleles divided by the total allele depth, '-' if
+        the depths are unknown or zero.
+    """
+    if ref_depth in NULL_VALUES or alt_depth in NULL_VALUES:
+        return "-"
+    try:
+        alt = sum(int(depth) for depth in alt_depth.split(","))
+        total = int(ref_depth) + alt
+    except ValueError:
+        return "-"
+    return "-" if total == 0 else "{:.4f}".format(alt / total)
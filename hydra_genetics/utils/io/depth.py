@@ -0,0 +1,196 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+from array import array
+import logging
+
+import numpy
+
+from hydra_genetics.utils.models.depth import DepthStore, DepthWindow
+
+from pysam import AlignmentFile
+
+log = logging.getLogger()
+
+
+def load_gvcf_depth(gvcf, sample, regions, depth_field='DP', contig_names=None):
+    """
+        Load depth for the given regions from a tabix indexed gVCF into a DepthStore.
+
+        Only records overlapping the regions are read, through the index. Reference blocks with an END
+        value cover all positions up to END, other records only their start position. Records without a
+        depth value are stored with depth 0.
+
+        Parameters:
+            gvcf (pysam.VariantFile): indexed gVCF
+            sample (string): sample name in the gVCF
+            regions (dict): sorted and non-overlapping 0-based, half-open (start, end) regions per
+                chromosome, as named in the gVCF, see merge_regions
+            depth_field (string): FORMAT field containing the depth
+            contig_names (list): gVCF contig name per contig id, used when regions, and the returned
+                DepthStore, are keyed by contig id instead of name
+
+        Returns:
+            DepthStore
+    """
+    depth_store = DepthStore()
+    for contig in regions:
+        chrom = contig if contig_names is None else contig_names[contig]
+        starts = array('q')
+        ends = array('q')
+        depths = array('q')
+        previous_end = None
+        for start, end in regions[contig]:
+            for block_start, block_end, depth in iter_gvcf_blocks(gvcf, sample, chrom, start, end, depth_field):
+                # blocks overlapping the previous region have already been loaded
+                if previous_end is not None and block_start < previous_end:
+                    continue
+                starts.append(block_start)
+                ends.append(block_end)
+                depths.append(depth)
+            previous_end = end
+        log.debug("Loaded {} depth blocks from {} regions on {}".format(len(starts), len(regions[contig]), chrom))
+        depth_store.add_contig(contig, starts, ends, depths)
+    return depth_store
+
+
+def iter_gvcf_blocks(gvcf, sample, chrom, start=None, end=None, depth_field='DP'):
+    """
+        Generate 0-based, half-open (start, end, depth) blocks for the gVCF records overlapping [start, end) on
+        chrom, from start to the end of the contig if end isn't given. Reference blocks with an END value cover
+        all positions up to END, other records only their start position. Records without a depth value get
+        depth 0.
+    """
+    for record in gvcf.fetch(chrom, start, end):
+        # pysam moves END into rlen, reference blocks are records spanning more than their REF
+        depth = record.samples[sample][depth_field]
+        yield (record.start,
+               record.stop if record.rlen != len(record.ref) else record.start + 1,
+               depth if depth is not None else 0)
+
+
+def open_gvcf_window(gvcf, sample, depth_field='DP', contig_names=None):
+    """
+        DepthWindow streaming depth blocks from a tabix indexed gVCF, see iter_gvcf_blocks.
+
+        Parameters:
+            contig_names (list): gVCF contig name per contig id, used when the window is queried by contig id
+    """
+    def fetch(contig, start):
+        chrom = contig if contig_names is None else contig_names[contig]
+        return iter_gvcf_blocks(gvcf, sample, chrom, start, None, depth_field)
+    return DepthWindow(fetch)
+
+
+class BamDepthReader(object):
+    """
+        Depth computed from the reads of an indexed bam or cram file: the number of reads with a base, with at
+        least min_base_quality, at a position. Unmapped, secondary, duplicate and qc failed reads and reads
+        with a mapping quality below min_mapping_quality are skipped.
+
+        Parameters:
+            bam_file (string): path to indexed bam or cram file
+            reference_file (string): fasta file, required to read cram files
+            min_base_quality (int): minimum base quality of a counted base
+            min_mapping_quality (int): minimum mapping quality of a counted read
+    """
+    def __init__(self, bam_file, reference_file=None, min_base_quality=13, min_mapping_quality=0):
+        self.alignments = AlignmentFile(bam_file, reference_filename=reference_file)
+        self.min_base_quality = min_base_quality
+        self.read_callback = "all"
+        if min_mapping_quality > 0:
+            self.read_callback = lambda read: not read.flag & 0x704 and read.mapping_quality >= min_mapping_quality
+
+    def get_blocks(self, chrom, start, end):
+        """
+            0-based, half-open (starts, ends, depths) arrays for [start, end) on chrom, consecutive positions
+            with the same depth are joined into one block and positions without depth are left out.
+        """
+        if end <= start:
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return empty, empty, empty
+        counts = self.alignments.count_coverage(chrom, start, end, quality_threshold=self.min_base_quality,
+                                                read_callback=self.read_callback)
+        depths = numpy.sum(numpy.asarray(counts, dtype=numpy.int64), axis=0)
+        changes = numpy.flatnonzero(numpy.diff(depths)) + 1
+        starts = numpy.concatenate(([0], changes))
+        ends = numpy.append(changes, len(depths))
+        depths = depths[starts]
+        covered = depths > 0
+        return starts[covered] + start, ends[covered] + start, depths[covered]
+
+    def close(self):
+        self.alignments.close()
+
+
+def load_bam_depth(bam_file, regions, contig_names=None, reference_file=None, min_base_quality=13, min_mapping_quality=0,
+                   processes=1):
+    """
+        Compute depth for the given regions from an indexed bam or cram file into a DepthStore, see
+        BamDepthReader. With processes > 1 the regions are split across a pool of processes.
+
+        Parameters:
+            regions (dict): sorted and non-overlapping 0-based, half-open (start, end) regions per
+                chromosome, as named in the bam file, see merge_regions
+            contig_names (list): bam contig name per contig id, used when regions, and the returned
+                DepthStore, are keyed by contig id instead of name
+
+        Returns:
+            DepthStore
+    """
+    tasks = [(contig if contig_names is None else contig_names[contig], start, end)
+             for contig in regions for start, end in regions[contig]]
+    reader_arguments = (bam_file, reference_file, min_base_quality, min_mapping_quality)
+    if processes > 1 and len(tasks) > 1:
+        from multiprocessing import Pool
+        with Pool(min(processes, len(tasks)), _init_bam_worker, reader_arguments) as pool:
+            blocks = pool.map(_get_bam_blocks, tasks, chunksize=max(1, len(tasks) // (processes * 4)))
+    else:
+        reader = BamDepthReader(*reader_arguments)
+        try:
+            blocks = [reader.get_blocks(*task) for task in tasks]
+        finally:
+            reader.close()
+    depth_store = DepthStore()
+    blocks = iter(blocks)
+    for contig in regions:
+        contig_blocks = [next(blocks) for _ in regions[contig]]
+        depth_store.add_contig(contig, *[numpy.concatenate(arrays) for arrays in zip(*contig_blocks)])
+    return depth_store
+
+
+# bam reader opened once per pool worker
+_bam_reader = None
+
+
+def _init_bam_worker(bam_file, reference_file, min_base_quality, min_mapping_quality):
+    global _bam_reader
+    _bam_reader = BamDepthReader(bam_file, reference_file, min_base_quality, min_mapping_quality)
+
+
+def _get_bam_blocks(task):
+    return _bam_reader.get_blocks(*task)
+
+
+def open_bam_window(reader, contig_names=None, chunk_size=1000):
+    """
+        DepthWindow streaming depth blocks computed by a BamDepthReader, chunk_size positions at a time. Gaps
+        without reads are skipped.
+
+        Parameters:
+            contig_names (list): bam contig name per contig id, used when the window is queried by contig id
+    """
+    def fetch(contig, start):
+        chrom = contig if contig_names is None else contig_names[contig]
+        length = reader.alignments.get_reference_length(chrom)
+        position = start
+        while position < length:
+            stop = min(position + chunk_size, length)
+            starts, ends, depths = reader.get_blocks(chrom, position, stop)
+            yield from zip(starts.tolist(), ends.tolist(), depths.tolist())
+            position = stop
+            if len(starts) == 0:
+                # skip positions without reads through the index
+                read = next(reader.alignments.fetch(chrom, position), None)
+                position = length if read is None else max(position, read.reference_start)
+    return DepthWindow(fetch)
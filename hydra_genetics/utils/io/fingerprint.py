@@ -0,0 +1,143 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import hydra_genetics
+
+log = logging.getLogger()
+
+
+class InputFingerprint(object):
+    """
+        Fingerprint of the input files and parameters used to generate a set of output files.
+
+        The fingerprint is stored as json next to the first output and contains the size, modification time
+        and sha256 checksum of every input file, the parameters and the hydra-genetics version, together with
+        the size of the outputs. If it matches a later run the outputs don't have to be regenerated, also when
+        the inputs have been rewritten with identical content. Checksums of input files whose size and
+        modification time haven't changed are reused from the stored fingerprint, so checking unchanged inputs
+        doesn't read them again, and inputs whose size has changed are changed without being read.
+
+        Parameters:
+            outputs (list): output files, None entries are ignored
+            inputs (dict): name to input file, None for inputs that aren't used
+            parameters (dict): json serializable parameters affecting the outputs
+    """
+    suffix = ".fingerprint.json"
+
+    def __init__(self, outputs, inputs, parameters):
+        self.outputs = [output for output in outputs if output is not None]
+        self.inputs = inputs
+        self.parameters = parameters
+        self.path = self.outputs[0] + self.suffix
+        self._input_entries = None
+
+    def read(self):
+        """
+            Return the stored fingerprint, None if missing or unreadable.
+        """
+        try:
+            with open(self.path) as fingerprint_file:
+                return json.load(fingerprint_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("Unable to read fingerprint {}: {}".format(self.path, e))
+            return None
+
+    def get_input_entries(self, previous=None):
+        if self._input_entries is None:
+            previous_entries = (previous or {}).get('inputs', {})
+            self._input_entries = {name: get_file_entry(path, previous_entries.get(name, None))
+                                   for name, path in self.inputs.items()}
+        return self._input_entries
+
+    def is_up_to_date(self):
+        """
+            True if the outputs exist, are unchanged since the fingerprint was stored, and were generated from
+            the same inputs and parameters.
+        """
+        previous = self.read()
+        if previous is None:
+            return False
+        if not previous.get('version', None) == hydra_genetics.__version__ or \
+           not previous.get('parameters', None) == self.parameters:
+            return False
+        outputs = previous.get('outputs', {})
+        if not sorted(outputs) == sorted(self.outputs):
+            return False
+        for output in self.outputs:
+            try:
+                if not os.stat(output).st_size == outputs[output]:
+                    return False
+            except FileNotFoundError:
+                return False
+        previous_inputs = previous.get('inputs', {})
+        if not sorted(previous_inputs) == sorted(self.inputs):
+            return False
+        # inputs of another size have changed, no need to read any of them
+        if not all(_has_size(path, previous_inputs[name]) for name, path in self.inputs.items()):
+            return False
+        # only the content of the inputs matter, a touched, copied or rewritten file is still up to date
+        input_entries = self.get_input_entries(previous)
+        if not all(_is_unchanged(entry, previous_inputs[name]) for name, entry in input_entries.items()):
+            return False
+        if not input_entries == previous_inputs:
+            # store the new modification times so the checksums are reused by the next check
+            self.write()
+        return True
+
+    def write(self):
+        """
+            Store the fingerprint, should be called once the outputs have been written.
+        """
+        fingerprint = {'version': hydra_genetics.__version__,
+                       'parameters': self.parameters,
+                       'inputs': self.get_input_entries(self.read()),
+                       'outputs': {output: os.stat(output).st_size for output in self.outputs}}
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, 'w') as fingerprint_file:
+                json.dump(fingerprint, fingerprint_file, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+def get_file_entry(path, previous=None):
+    """
+        Path, size, modification time and sha256 checksum of a file. The checksum in previous is reused if the
+        path, size and modification time are unchanged. None is returned for a missing path.
+    """
+    if path is None:
+        return None
+    stat = os.stat(path)
+    entry = {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous is not None and 'sha256' in previous and all(previous.get(key, None) == entry[key] for key in entry):
+        entry['sha256'] = previous['sha256']
+        return entry
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as input_file:
+        for block in iter(lambda: input_file.read(1024 * 1024), b""):
+            checksum.update(block)
+    entry['sha256'] = checksum.hexdigest()
+    return entry
+
+
+def _has_size(path, previous):
+    if path is None or previous is None:
+        return path is None and previous is None
+    return os.stat(path).st_size == previous.get('size', None)
+
+
+def _is_unchanged(entry, previous):
+    if entry is None or previous is None:
+        return entry is None and previous is None
+    return entry['sha256'] == previous.get('sha256', None)
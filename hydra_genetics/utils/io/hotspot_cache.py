@@ -0,0 +1,105 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+import hydra_genetics
+
+log = logging.getLogger()
+
+
+class HotspotCache(object):
+    """
+        On-disk cache of parsed and indexed hotspot files.
+
+        Entries are keyed on the content of the hotspot file and the hydra-genetics version, so an edited
+        file or an upgraded library never reuses a stale entry. Entries are stored as pickles, the cache
+        directory should only be writable by trusted users. When the total size of the cache exceeds
+        max_size the least recently used entries are removed.
+
+        Parameters:
+            cache_dir (string): directory used to store the cache, created if missing
+            max_size (int): maximum total size of the cache in bytes
+    """
+    suffix = ".hotspots.pickle"
+
+    def __init__(self, cache_dir, max_size=1024**3):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_key(self, hotspot_file):
+        checksum = hashlib.sha256()
+        checksum.update(hydra_genetics.__version__.encode())
+        checksum.update(b"\0")
+        with open(hotspot_file, 'rb') as hotspots:
+            for block in iter(lambda: hotspots.read(1024 * 1024), b""):
+                checksum.update(block)
+        return checksum.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def load(self, key):
+        """
+            Return the cached hotspots for key, None if there isn't a usable entry.
+        """
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                reports = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning("Unable to load cached hotspots {}: {}".format(path, e))
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        log.info("Loaded cached hotspots: {}".format(path))
+        return reports
+
+    def store(self, key, reports):
+        """
+            Store hotspots for key, written to a temporary file and then moved into place so concurrent
+            readers never see a partial entry.
+        """
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, 'wb') as cache_file:
+                pickle.dump(reports, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.get_path(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+            Remove the least recently used entries until the cache fits within max_size.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.suffix):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(entry[1] for entry in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                log.info("Evicted cached hotspots: {}".format(name))
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -1,20 +1,32 @@
-import builtins
+import csv
+import heapq
 import logging
-import statistics
-from collections import OrderedDict
+import os
+import tempfile
+from collections import OrderedDict, deque
+from itertools import islice
 
-from hydra_genetics.utils.io.chr import ChrTranslater
+from hydra_genetics.utils.io.chr import ChrTranslater, ContigDictionary
+from hydra_genetics.utils.io.depth import BamDepthReader, load_bam_depth, load_gvcf_depth, open_bam_window, open_gvcf_window
+from hydra_genetics.utils.io.fingerprint import InputFingerprint
+from hydra_genetics.utils.io.report_columns import ColumnPlan
 from hydra_genetics.utils.models.hotspot import MultiBpVariantData
 from hydra_genetics.utils.models.hotspot import ReportClass
+from hydra_genetics.utils.models.interval import IntervalIndex, RegionSet, merge_regions
+from hydra_genetics.utils.models.report import HotspotReport
 from hydra_genetics.utils.io.hotspot import Reader as HotspotReader
 from hydra_genetics.utils.io import utils
 
-from pysam import VariantFile
-
-import yaml
+from pysam import BGZFile, VariantFile, tabix_index
 
 log = logging.getLogger()
 
+# report file formats, parquet and arrow require pyarrow
+OUTPUT_FORMATS = ("tsv", "parquet", "arrow")
+
+# first column of shard reports, giving the position of each row in the merged report
+SHARD_KEY_COLUMN = "shard_key"
+
 
 def generate_hotspot_report(sample,
                             output,
@@ -24,434 +36,1438 @@ def generate_hotspot_report(sample,
                             gvcf_file,
                             chr_mapping,
                             vcf_file_wo_pick=None,
-                            column_yaml_file=None):
-    reports = OrderedDict(((ReportClass.hotspot, {}),
-                          (ReportClass.region_all, {}),
-                          (ReportClass.region, {}),
-                          (ReportClass.indel, {'indel': []})))
-    chr_translater = ChrTranslater(chr_mapping)
-
-    chromosomes_to_look_at = set()
-    if not hotspot_file == "-":
-        try:
-            hotspot_reader = HotspotReader(hotspot_file)
-            for hotspot in iter(hotspot_reader):
-                chromosomes_to_look_at.add(chr_translater.get_chr_value(hotspot.CHROMOSOME))
-                if hotspot.REPORT == ReportClass.indel:
-                    reports[hotspot.REPORT]['indel'].append(hotspot)
-                else:
-                    key = f"{hotspot.CHROMOSOME}-{hotspot.START // 1000000}"
-                    reports[hotspot.REPORT][key] = reports[hotspot.REPORT].get(key, []) + [hotspot]
-        except ValueError as e:
-            logging.error(e)
-            exit(1)
-
-    variants = VariantFile(vcf_file)
-    other = []
+                            column_yaml_file=None,
+                            processes=1,
+                            hotspot_cache=None,
+                            coverage_output=None,
+                            force=False,
+                            streaming=False,
+                            threads=1,
+                            indexed=False,
+                            output_format="tsv",
+                            bam_file=None,
+                            reference_file=None,
+                            hotspot_only=False,
+                            regions_file=None,
+                            report_inputs=None,
+                            fingerprint=False):
+    """
+        Generate the hotspot report for a sample.
 
-    transcript_dict = {}
-    log.info("Processing vep transcripts")
-    for record in variants.header.records:
-        if record.type == "INFO":
-            if record['ID'] == "CSQ":
-                vep_fields = {v: c for c, v in enumerate(record['Description'].split("Format: ")[1].split('">')[0].split("|"))}
+        With processes > 1 the report is built per contig in a process pool, each worker reading its contigs
+        from the indexed vcf/gvcf files. The rows are merged in the same order as a serial run, giving an
+        identical report. A HotspotCache can be given to reuse an already parsed hotspot file, and report_inputs
+        to reuse the hotspots, chr mapping and column plan already loaded from hotspot_file, chr_mapping and
+        column_yaml_file, see load_report_inputs, by the process building the report and its pool. If coverage_output
+        is given a coverage summary for every hotspot is written to it in the same run, see build_coverage_rows.
+
+        With fingerprint, a fingerprint of the inputs and parameters is stored next to the output, see
+        get_report_fingerprint, and if the report has already been generated from identical inputs it isn't
+        generated again. With force the report is generated, and no fingerprint is stored, in any case.
+        With streaming the report is generated with bounded memory, see get_hotspot_report_streaming, which
+        can't be combined with processes > 1. threads > 1 decompresses the vcf and gvcf files using
+        additional htslib threads, per process. With indexed the outputs are written coordinate sorted, bgzip
+        compressed and tabix indexed, see write_indexed_report. output_format, one of OUTPUT_FORMATS, selects
+        tab separated outputs or typed columnar outputs, see write_columnar_report.
+
+        The depth is read from the gvcf_file or, if gvcf_file is None, computed from the reads in bam_file at
+        the positions where it is needed, see BamDepthReader. reference_file is the fasta file used to read
+        cram files. With a bam file the processes compute the depth of the regions in parallel, instead of
+        building the report per contig.
+
+        With hotspot_only the report only has the rows of the hotspots, variants not overlapping a hotspot, the
+        4-other rows, aren't reported. Only the vcf records in the hotspot regions are read, through the index,
+        see get_hotspot_regions, so the work depends on the size of the panel rather than on the size of the vcf.
+
+        With a bed file, regions_file, only the part of the report in its regions is generated: the hotspots
+        starting in the regions, the variants starting in the regions that don't overlap a hotspot and the depth
+        needed by those rows. Reports generated for bed files splitting the genome, e.g. on different nodes, are
+        merged into the report of the whole sample by merge_report_shards. Such shard reports are tsv files with
+        a SHARD_KEY_COLUMN before the report columns.
+    """
+    if streaming and processes > 1:
+        raise ValueError("Streaming mode can't be combined with multiple processes")
+    validate_output_format(output_format, indexed, regions_file is not None)
+    validate_depth_source(gvcf_file, bam_file)
+    input_fingerprint = None
+    if fingerprint and not force:
+        input_fingerprint = get_report_fingerprint(sample, output, levels, hotspot_file, vcf_file, gvcf_file, chr_mapping,
+                                                   vcf_file_wo_pick, column_yaml_file, coverage_output, indexed,
+                                                   output_format, bam_file, reference_file, hotspot_only, regions_file)
+        if input_fingerprint.is_up_to_date():
+            log.info("Inputs are unchanged, keeping hotspot report: {}".format(output))
+            return
+    report = build_hotspot_report(sample, levels, hotspot_file, vcf_file, gvcf_file, chr_mapping, vcf_file_wo_pick,
+                                  column_yaml_file, processes, hotspot_cache, coverage_output is not None, streaming,
+                                  threads, bam_file, reference_file, hotspot_only, regions_file, report_inputs)
+    write_report_files(report, output, coverage_output, ContigDictionary(ChrTranslater(chr_mapping)) if indexed else None,
+                       output_format)
+    if input_fingerprint is not None:
+        input_fingerprint.write()
+
+
+def build_hotspot_report(sample,
+                         levels,
+                         hotspot_file,
+                         vcf_file,
+                         gvcf_file,
+                         chr_mapping,
+                         vcf_file_wo_pick=None,
+                         column_yaml_file=None,
+                         processes=1,
+                         hotspot_cache=None,
+                         coverage=False,
+                         streaming=False,
+                         threads=1,
+                         bam_file=None,
+                         reference_file=None,
+                         hotspot_only=False,
+                         regions_file=None,
+                         report_inputs=None):
+    """
+        Build the hotspot report for a sample in memory, without writing it to a file, see generate_hotspot_report
+        for the parameters.
+
+        Returns:
+            HotspotReport, with the coverage summary of the hotspots if coverage is set, with a SHARD_KEY_COLUMN if
+            regions_file is given
+    """
+    if streaming and processes > 1:
+        raise ValueError("Streaming mode can't be combined with multiple processes")
+    validate_depth_source(gvcf_file, bam_file)
+    if report_inputs is None:
+        report_inputs = load_report_inputs(hotspot_file, chr_mapping, column_yaml_file, hotspot_cache)
+    reports, chr_translater, plan = report_inputs
+    shard = None if regions_file is None else load_shard(regions_file, ContigDictionary(chr_translater))
+    return get_hotspot_report(sample, levels, reports, vcf_file, gvcf_file, chr_translater, plan, vcf_file_wo_pick,
+                              coverage, streaming, threads, bam_file, reference_file, processes, hotspot_only, shard)
+
+
+def generate_hotspot_reports(samples, levels, hotspot_file, chr_mapping, column_yaml_file=None, processes=1,
+                             hotspot_cache=None, force=False, streaming=False, threads=1, indexed=False, output_format="tsv",
+                             reference_file=None, hotspot_only=False, regions_file=None, fingerprint=False):
+    """
+        Generate hotspot reports for multiple samples, loading the hotspot file, chr mapping and column yaml
+        once and reusing them for all samples.
+
+        Parameters:
+            samples (list): dicts with sample, output, vcf, gvcf or bam and optionally vcf_wo_pick and coverage, see
+                read_sample_manifest
+            levels (list): (depth, depth status, analyzable) tuples
+            hotspot_file (string): path to hotspot file
+            chr_mapping (string): path to file mapping chr to NC names
+            column_yaml_file (string): path to yaml file defining the report columns
+            processes (int): number of samples processed in parallel, each process loads the shared files once. A
+                single sample uses the processes to build the rows of each contig in parallel, or to compute the
+                depth from a bam file, see get_hotspot_report
+            hotspot_cache (HotspotCache): cache used to load the parsed hotspot file
+            force (bool): generate the reports without checking or storing fingerprints
+            streaming (bool): generate each report with bounded memory, see get_hotspot_report_streaming
+            threads (int): number of htslib threads used to decompress the vcf and gvcf files of a sample
+            indexed (bool): write coordinate sorted, bgzip compressed and tabix indexed reports
+            output_format (string): format of the reports, one of OUTPUT_FORMATS
+            reference_file (string): fasta file used to read cram files
+            hotspot_only (bool): only report the hotspots, reading the vcf records in the hotspot regions, see
+                generate_hotspot_report
+            regions_file (string): bed file, only generate the part of the reports in its regions, see
+                generate_hotspot_report
+            fingerprint (bool): store a fingerprint of the inputs next to each report and keep the reports whose
+                inputs are unchanged, see generate_hotspot_report
+    """
+    validate_output_format(output_format, indexed, regions_file is not None)
+    shard = None
+    if regions_file is not None:
+        shard = load_shard(regions_file, ContigDictionary(ChrTranslater(chr_mapping)))
+    tasks = []
+    for sample in samples:
+        validate_depth_source(sample.get('gvcf', None), sample.get('bam', None))
+        input_fingerprint = None
+        if fingerprint and not force:
+            input_fingerprint = get_report_fingerprint(sample['sample'], sample['output'], levels, hotspot_file,
+                                                       sample['vcf'], sample.get('gvcf', None), chr_mapping,
+                                                       sample.get('vcf_wo_pick', None), column_yaml_file,
+                                                       sample.get('coverage', None), indexed, output_format,
+                                                       sample.get('bam', None), reference_file, hotspot_only, regions_file)
+        if input_fingerprint is not None and input_fingerprint.is_up_to_date():
+            log.info("Inputs are unchanged, keeping hotspot report: {}".format(sample['output']))
+        else:
+            tasks.append((sample, levels, input_fingerprint, {'streaming': streaming, 'threads': threads,
+                                                              'indexed': indexed, 'output_format': output_format,
+                                                              'reference_file': reference_file,
+                                                              'hotspot_only': hotspot_only, 'shard': shard}))
+    if not tasks:
+        return
+    if len(tasks) == 1 and not streaming:
+        # a single sample uses the processes for its contigs, or for the depth computed from a bam file
+        tasks[0][3]['processes'] = processes
+    if processes > 1 and len(tasks) > 1:
+        from multiprocessing import Pool
+        with Pool(min(processes, len(tasks)), _init_worker,
+                  (hotspot_file, chr_mapping, column_yaml_file, hotspot_cache)) as pool:
+            for sample in pool.imap(_write_batch_sample, tasks):
+                log.info("Finished hotspot report for: {}".format(sample))
+    else:
+        _init_worker(hotspot_file, chr_mapping, column_yaml_file, hotspot_cache)
+        for task in tasks:
+            log.info("Finished hotspot report for: {}".format(_write_batch_sample(task)))
+
+
+def load_report_inputs(hotspot_file, chr_mapping, column_yaml_file=None, hotspot_cache=None):
+    """
+        Load the inputs shared by the reports of all samples.
+
+        Returns:
+            tuple: (hotspots, ChrTranslater, ColumnPlan), see load_hotspots
+    """
+    return load_hotspots(hotspot_file, hotspot_cache), ChrTranslater(chr_mapping), ColumnPlan(column_yaml_file)
+
+
+# hotspots, chr mapping and column plan loaded once per pool worker
+_worker_inputs = None
+
+
+def _init_worker(hotspot_file, chr_mapping, column_yaml_file, hotspot_cache=None):
+    _set_worker_inputs(load_report_inputs(hotspot_file, chr_mapping, column_yaml_file, hotspot_cache))
+
+
+def _set_worker_inputs(report_inputs):
+    global _worker_inputs
+    _worker_inputs = report_inputs
+
+
+def _write_batch_sample(task):
+    sample, levels, fingerprint, options = task
+    reports, chr_translater, plan = _worker_inputs
+    write_hotspot_report(sample['sample'], sample['output'], levels, reports, sample['vcf'], sample.get('gvcf', None),
+                         chr_translater, plan, sample.get('vcf_wo_pick', None), sample.get('coverage', None),
+                         bam_file=sample.get('bam', None), **options)
+    if fingerprint is not None:
+        fingerprint.write()
+    return sample['sample']
+
+
+def get_report_fingerprint(sample, output, levels, hotspot_file, vcf_file, gvcf_file, chr_mapping,
+                           vcf_file_wo_pick=None, column_yaml_file=None, coverage_output=None, indexed=False,
+                           output_format="tsv", bam_file=None, reference_file=None, hotspot_only=False,
+                           regions_file=None):
+    """
+        InputFingerprint of everything affecting a hotspot report: the vcf, gvcf or bam and reference, hotspot,
+        chr mapping, column yaml and regions files, the sample name, levels, the coverage output, the output
+        format and hotspot_only.
+        The number of processes and threads, the hotspot cache and streaming give identical reports and aren't
+        part of it.
+    """
+    inputs = {'vcf': vcf_file,
+              'gvcf': gvcf_file,
+              'vcf_wo_pick': vcf_file_wo_pick,
+              'hotspot': None if hotspot_file == "-" else hotspot_file,
+              'chr_mapping': chr_mapping,
+              'column_yaml': column_yaml_file}
+    if bam_file is not None:
+        inputs.update({'bam': bam_file, 'reference': reference_file})
+    if regions_file is not None:
+        inputs['regions'] = regions_file
+    parameters = {'sample': sample,
+                  'levels': [list(level) for level in levels],
+                  'coverage': coverage_output is not None,
+                  'indexed': indexed,
+                  'output_format': output_format,
+                  'hotspot_only': hotspot_only}
+    outputs = [output, coverage_output]
+    if indexed:
+        outputs += [get_index_file(output), None if coverage_output is None else get_index_file(coverage_output)]
+    return InputFingerprint(outputs, inputs, parameters)
+
+
+def read_sample_manifest(manifest_file, required=('sample', 'output', 'vcf')):
+    """
+        Read a tab separated manifest, with a header, listing one sample per line. Required columns are sample,
+        output and vcf, gvcf or bam, the depth source, vcf_wo_pick and coverage, the coverage summary output,
+        are optional and an empty value or '-' means no file.
+
+        Returns:
+            list: a dict per sample
+    """
+    required = list(required)
+    samples = []
+    with open(manifest_file) as manifest:
+        reader = csv.DictReader(manifest, delimiter="\t")
+        missing = [column for column in required if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError("Manifest {} is missing column(s): {}".format(manifest_file, ", ".join(missing)))
+        for row in reader:
+            sample = {column: row[column] for column in required}
+            for column in ['gvcf', 'bam', 'vcf_wo_pick', 'coverage']:
+                if row.get(column, None) not in (None, "", "-"):
+                    sample[column] = row[column]
+            samples.append(sample)
+    return samples
+
+
+def read_bed_regions(bed_file):
+    """
+        Read the regions of a bed file, skipping empty, comment, track and browser lines.
+
+        Returns:
+            list: 0-based, half-open (chr, start, end) regions
+    """
+    regions = []
+    with open(bed_file) as bed:
+        for line in bed:
+            if not line.strip() or line.startswith(("#", "track", "browser")):
+                continue
+            columns = line.rstrip("\n").split("\t")
+            try:
+                regions.append((columns[0], int(columns[1]), int(columns[2])))
+            except (IndexError, ValueError):
+                raise ValueError("Invalid bed line in {}: {}".format(bed_file, line.rstrip("\n")))
+    return regions
+
+
+def load_shard(regions_file, contigs):
+    """
+        RegionSet, per contig id, of the regions in a bed file, contigs are named by their chr or NC name.
+    """
+    regions = read_bed_regions(regions_file)
+    missing = sorted({chrom for chrom, _, _ in regions if chrom not in contigs})
+    if missing:
+        raise ValueError("Bed file {} has contig(s) missing from the chr mapping: {}".format(regions_file, ", ".join(missing)))
+    return RegionSet((contigs.get_id(chrom), start, end) for chrom, start, end in regions)
+
+
+def write_hotspot_report(sample, output, levels, reports, vcf_file, gvcf_file, chr_translater, plan,
+                         vcf_file_wo_pick=None, coverage_output=None, streaming=False, threads=1, indexed=False,
+                         output_format="tsv", bam_file=None, reference_file=None, processes=1, hotspot_only=False,
+                         shard=None):
+    """
+        Write the hotspot report for a sample using already loaded hotspots, chr mapping and column plan, see
+        get_hotspot_report.
+    """
+    report = get_hotspot_report(sample, levels, reports, vcf_file, gvcf_file, chr_translater, plan, vcf_file_wo_pick,
+                                coverage_output is not None, streaming, threads, bam_file, reference_file, processes,
+                                hotspot_only, shard)
+    write_report_files(report, output, coverage_output, ContigDictionary(chr_translater) if indexed else None,
+                       output_format)
+
+
+def write_report_files(report, output, coverage_output=None, contigs=None, output_format="tsv"):
+    """
+        Write a report, and its coverage summary if coverage_output is given. If contigs, a ContigDictionary,
+        is given the files are written sorted and indexed, see write_indexed_report. Parquet and arrow outputs
+        are written by write_columnar_report.
+    """
+    validate_output_format(output_format, contigs is not None)
+    outputs = [(output, report)]
+    if coverage_output is not None:
+        outputs.append((coverage_output, report.coverage))
+    for file_name, table in outputs:
+        if not output_format == "tsv":
+            write_columnar_report(file_name, table, output_format)
+        elif contigs is None:
+            write_report(file_name, table.columns, table)
+        else:
+            write_indexed_report(file_name, table.columns, table, contigs)
+
+
+def validate_depth_source(gvcf_file, bam_file):
+    if (gvcf_file is None) == (bam_file is None):
+        raise ValueError("Depth is read from either a gvcf or a bam file, got gvcf {} and bam {}".format(gvcf_file, bam_file))
+
+
+def validate_output_format(output_format, indexed=False, sharded=False):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Unknown output format {}, expected one of: {}".format(output_format, ", ".join(OUTPUT_FORMATS)))
+    if indexed and not output_format == "tsv":
+        raise ValueError("Only tsv reports can be indexed, not {}".format(output_format))
+    if sharded and (indexed or not output_format == "tsv"):
+        raise ValueError("Shard reports are written as tsv, index or convert the report merged by merge_report_shards")
+
+
+def get_hotspot_report(sample, levels, reports, vcf_file, gvcf_file, chr_translater, plan, vcf_file_wo_pick=None,
+                       coverage=False, streaming=False, threads=1, bam_file=None, reference_file=None, processes=1,
+                       hotspot_only=False, shard=None):
+    """
+        Build the hotspot report for a sample using already loaded hotspots, chr mapping and column plan.
+        Variants added to the hotspots by a previous call are cleared first. With streaming the report is
+        generated with bounded memory, see get_hotspot_report_streaming. threads is the number of htslib
+        threads used to decompress each of the vcf and gvcf files, see open_variant_file. With processes > 1 the
+        rows of each contig are built in a pool of processes, see get_hotspot_report_parallel. If gvcf_file is None
+        the depth is computed from bam_file instead, using processes, see load_report_depth. With hotspot_only
+        only the hotspot rows are built, from the vcf records in the hotspot regions. If a shard, a RegionSet
+        per contig id, is given only the rows in its regions are built, see generate_hotspot_report.
+
+        Returns:
+            HotspotReport, with a SHARD_KEY_COLUMN if shard is given
+    """
+    if streaming:
+        return get_hotspot_report_streaming(sample, levels, reports, vcf_file, gvcf_file, chr_translater, plan,
+                                            vcf_file_wo_pick, coverage, threads, bam_file, reference_file, hotspot_only,
+                                            shard)
+    if processes > 1 and bam_file is None:
+        return get_hotspot_report_parallel(sample, levels, None, vcf_file, gvcf_file, None, vcf_file_wo_pick,
+                                           processes=processes, coverage=coverage, threads=threads,
+                                           hotspot_only=hotspot_only, shard=shard,
+                                           report_inputs=(reports, chr_translater, plan))
+    hotspots = get_report_hotspots(reports)
+    coverage_rows = [] if coverage else None
+    rows = build_report_rows(sample, levels, reports, hotspots, vcf_file, gvcf_file, chr_translater, plan,
+                             vcf_file_wo_pick, coverage_rows=coverage_rows, threads=threads, bam_file=bam_file,
+                             reference_file=reference_file, processes=processes, hotspot_only=hotspot_only, shard=shard)
+    return get_keyed_report(plan, levels, rows, coverage_rows, shard is not None)
 
-    for variant in variants:
-        if variant is None:
-            raise Exception("Empty allele found: " + str(variant))
-        if not len(variant.alts) == 1:
-            raise Exception("Multiple allele found: " + str(variant.alts))
-        chromosomes_to_look_at.add(variant.chrom)
-        variant_key = f"{variant.chrom}_{variant.start}_{variant.stop}_{variant.ref}_{','.join(variant.alts)}"
+
+def get_keyed_report(plan, levels, rows, coverage_rows=None, sharded=False):
+    """
+        HotspotReport of (key, row) report rows, and coverage rows, in report order. The keys are only kept in
+        sharded reports, formatted as the first column, see format_shard_key.
+    """
+    if sharded:
+        header = [SHARD_KEY_COLUMN] + plan.header
+        rows = ([format_shard_key(key)] + row for key, row in rows)
+    else:
+        header = plan.header
+        rows = (row for _, row in rows)
+    return HotspotReport(header, rows, get_coverage_report(levels, coverage_rows, sharded), plan.types)
+
+
+def get_coverage_report(levels, coverage_rows, sharded=False):
+    if coverage_rows is None:
+        return None
+    if sharded:
+        return HotspotReport([SHARD_KEY_COLUMN] + get_coverage_header(levels),
+                             ([format_shard_key(key)] + row for key, row in coverage_rows), types=get_coverage_types(levels))
+    return HotspotReport(get_coverage_header(levels), (row for _, row in coverage_rows), types=get_coverage_types(levels))
+
+
+def get_hotspot_report_streaming(sample, levels, reports, vcf_file, gvcf_file, chr_translater, plan,
+                                 vcf_file_wo_pick=None, coverage=False, threads=1, bam_file=None, reference_file=None,
+                                 hotspot_only=False, shard=None):
+    """
+        Build the hotspot report for a sample in a single sweep along the genome, giving the same report as
+        get_hotspot_report.
+
+        The coordinate sorted variants, hotspots and gVCF blocks are merge-joined, see ReportSweep. Memory use
+        depends on the hotspots and the variants in the active window, not on the genome size or the number of
+        variants. Requires coordinate sorted vcf files, with all records of a contig together, and an indexed
+        gVCF or bam file.
+
+        Returns:
+            HotspotReport, the rows are read back from temporary files that are removed once all rows have
+            been iterated
+    """
+    sweep = ReportSweep(sample, levels, reports, chr_translater, plan, coverage, hotspot_only, shard)
+    variants = open_variant_file(vcf_file, threads)
+    variants_wo_pick = None
+    if vcf_file_wo_pick is not None:
+        variants_wo_pick = open_variant_file(vcf_file_wo_pick, threads)
+    header = (variants if variants_wo_pick is None else variants_wo_pick).header
+    sweep.open(variants if variants_wo_pick is None else variants_wo_pick,
+               open_depth_window(sample, sweep.contigs, plan, gvcf_file, bam_file, reference_file, threads))
+    regions = None
+    if hotspot_only or shard is not None:
+        regions = get_hotspot_regions(sweep.get_hotspots(), sweep.contigs, header,
+                                      () if shard is None or hotspot_only else shard)
+    log.info("Processing variants")
+    for variant, variant_key, transcript in read_annotated_variants(variants, variants_wo_pick, regions=regions):
+        sweep.add_variant(variant, variant_key, transcript)
+    sweep.finish()
+
+    def rows():
         try:
-            transcript = variant.info['CSQ'][0].split("|")[vep_fields['Feature']]
-        except KeyError:
+            yield from sweep.get_rows()
+        finally:
+            sweep.close()
+    coverage_rows = None if sweep.coverage_rows is None else sorted(sweep.coverage_rows)
+    return get_keyed_report(plan, levels, rows(), coverage_rows, shard is not None)
+
+
+class ReportSweep(object):
+    """
+        Sweep line building the report rows of a sample from coordinate sorted variants.
+
+        The hotspots of a contig are started when the sweep reaches them and finished, i.e. their rows are
+        built, once the sweep has passed their end, since no later variant can be added to them. Variants that
+        don't overlap a hotspot are formatted as soon as the sweep has moved past their position. The depth is
+        streamed from the gVCF through a DepthWindow and only the depth blocks and transcripts at or after the
+        start of the earliest active hotspot or variant are kept. Rows are spooled to temporary files, only
+        their offsets per hotspot are kept in memory. With hotspot_only variants that don't overlap a hotspot
+        are skipped. With a shard, see get_hotspot_report, only the rows in its regions are built and the rows
+        are generated with their shard keys.
+    """
+    def __init__(self, sample, levels, reports, chr_translater, plan, coverage=False, hotspot_only=False, shard=None):
+        self.sample = sample
+        self.levels = levels
+        self.chr_translater = chr_translater
+        self.plan = plan
+        self.hotspot_only = hotspot_only
+        self.shard = shard
+        self.other_rank = len(reports)
+        self.thresholds = [int(level) for level, _, _ in levels] if coverage else None
+        self.contigs = ContigDictionary(chr_translater)
+        self.contig_intervals = get_contig_intervals(reports, self.contigs)
+        # hotspots of each contig in start order
+        self.contig_hotspots = [[] for _ in range(len(self.contigs))]
+        self.hotspot_keys = {}
+        for key, hotspot in get_report_hotspots(reports):
+            hotspot.clear_variants()
+            if shard is None or in_shard(shard, self.contigs, hotspot):
+                self.contig_hotspots[self.contigs.get_id(hotspot.CHROMOSOME)].append((hotspot.START, key, hotspot))
+                self.hotspot_keys[id(hotspot)] = key
+        for hotspots in self.contig_hotspots:
+            hotspots.sort(key=lambda entry: entry[:2])
+        self.rows = _RowSpool()
+        self.coverage_rows = [] if coverage else None
+        self.other_rows = tempfile.TemporaryFile("w+")
+        self.transcript_dict = {}
+        self.transcript_keys = deque()
+        self.visited = set()
+        self.contig_id = None
+
+    def open(self, variants, depth_window):
+        self.header = variants.header
+        self.header_ids = self.contigs.get_header_ids(self.header)
+        self.annotation_extractor = get_annotation_extractor(self.header, self.transcript_dict)
+        self.depth_window = depth_window
+        self.contig_ranks = None if self.shard is None else get_contig_ranks(variants)
+
+    def get_hotspots(self):
+        """
+            ((report rank, index), hotspot) for the hotspots that will be printed.
+        """
+        return [(key, hotspot) for hotspots in self.contig_hotspots for _, key, hotspot in hotspots]
+
+    def start_contig(self, contig_id):
+        if contig_id in self.visited:
+            raise Exception("Vcf file isn't sorted, records on {} aren't together".format(self.contigs.chr_names[contig_id]))
+        self.visited.add(contig_id)
+        self.contig_id = contig_id
+        self.position = 0
+        self.next_hotspot = 0
+        self.active = {}
+        self.other = []
+
+    def finish_contig(self):
+        self.flush_other(None)
+        hotspots = self.contig_hotspots[self.contig_id]
+        for _, key, hotspot in hotspots[self.next_hotspot:]:
+            self.active[key] = hotspot
+        self.next_hotspot = len(hotspots)
+        # in position order, the depth window of a contig without variants starts at the first hotspot queried
+        for key in sorted(self.active, key=lambda key: (self.active[key].EXTENDED_START, key)):
+            self.finish_hotspot(key, self.active[key])
+        self.active = {}
+        self.transcript_dict.clear()
+        self.transcript_keys.clear()
+        self.contig_id = None
+
+    def finish_hotspot(self, key, hotspot):
+        self.rows.add(key, build_hotspot_rows(self.sample, self.levels, hotspot, self.contig_id, self.depth_window,
+                                              self.plan, self.annotation_extractor))
+        if self.coverage_rows is not None:
+            self.coverage_rows.append((key, build_coverage_row(self.sample, hotspot, self.contig_id, self.depth_window,
+                                                               self.thresholds)))
+        hotspot.clear_variants()
+
+    def flush_other(self, position):
+        """
+            Write the rows of the variants not overlapping a hotspot that start before position, all if None.
+        """
+        if self.other and (position is None or self.other[0].start < position):
+            for var in self.other:
+                row = build_other_row(self.sample, self.levels, var, self.contig_id, self.contigs, self.depth_window,
+                                      self.plan, self.annotation_extractor)
+                if self.shard is not None:
+                    row = [format_shard_key((self.other_rank, self.contig_ranks[var.chrom], var.start))] + row
+                self.other_rows.write("\n" + "\t".join(row))
+            self.other = []
+
+    def add_variant(self, variant, variant_key, transcript):
+        if variant.rid >= len(self.header_ids):
+            # contigs missing from the header are added while reading
+            self.header_ids = self.contigs.get_header_ids(self.header)
+        contig_id = self.header_ids[variant.rid]
+        if contig_id is None:
+            raise KeyError(variant.chrom)
+        if not contig_id == self.contig_id:
+            if self.contig_id is not None:
+                self.finish_contig()
+            self.start_contig(contig_id)
+        position = variant.start
+        if position < self.position:
+            raise Exception("Vcf file isn't sorted: {}:{}".format(variant.chrom, variant.pos))
+        self.position = position
+
+        # start hotspots reached by the sweep, before finishing those ending before the variant, that can't get
+        # more variants, so a finished hotspot is never started again
+        hotspots = self.contig_hotspots[contig_id]
+        while self.next_hotspot < len(hotspots) and hotspots[self.next_hotspot][0] - 1 <= position:
+            _, key, hotspot = hotspots[self.next_hotspot]
+            self.active[key] = hotspot
+            self.next_hotspot += 1
+        for key in [key for key, hotspot in self.active.items() if hotspot.END <= position]:
+            self.finish_hotspot(key, self.active.pop(key))
+        self.flush_other(position)
+
+        self.transcript_dict[variant_key] = transcript
+        self.transcript_keys.append((position, variant_key))
+        hotspot = add_to_hotspot(variant, variant_key, self.contig_intervals[contig_id], self.contigs.nc_names[contig_id],
+                                 self.transcript_dict, self.chr_translater)
+        if hotspot is None:
+            if not self.hotspot_only and (self.shard is None or self.shard.contains(contig_id, position)):
+                self.other.append(variant)
+        elif id(hotspot) in self.hotspot_keys:
+            # hotspots outside the shard are printed by another shard
+            self.active[self.hotspot_keys[id(hotspot)]] = hotspot
+
+        # nothing before the earliest active hotspot or variant will be needed again
+        boundary = min([position] + [hotspot.EXTENDED_START - 1 for hotspot in self.active.values()])
+        self.depth_window.advance(contig_id, boundary)
+        while self.transcript_keys and self.transcript_keys[0][0] < boundary:
+            self.transcript_dict.pop(self.transcript_keys.popleft()[1], None)
+
+    def finish(self):
+        """
+            Finish the last contig and build the rows for hotspots on contigs without variants.
+        """
+        if self.contig_id is not None:
+            self.finish_contig()
+        for contig_id, hotspots in enumerate(self.contig_hotspots):
+            if hotspots and contig_id not in self.visited:
+                self.start_contig(contig_id)
+                self.finish_contig()
+
+    def get_rows(self):
+        """
+            Generate (key, row) for the report rows, hotspot rows in hotspot file order followed by the other
+            variants in vcf order, see build_report_rows for the keys.
+        """
+        yield from self.rows.get_rows()
+        self.other_rows.seek(0)
+        self.other_rows.readline()
+        for line in self.other_rows:
+            row = line.rstrip("\n").split("\t")
+            yield (None, row) if self.shard is None else (parse_shard_key(row[0]), row[1:])
+
+    def close(self):
+        self.rows.close()
+        self.other_rows.close()
+
+
+class _RowSpool(object):
+    """
+        Rows grouped by key and stored in a temporary file as tab separated lines, only the file offsets are kept
+        in memory.
+    """
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._chunks = {}
+
+    def add(self, key, rows):
+        data = "\n".join("\t".join(row) for row in rows).encode()
+        if data:
+            self._file.seek(0, os.SEEK_END)
+            self._chunks[key] = (self._file.tell(), len(data))
+            self._file.write(data)
+
+    def get_rows(self):
+        for key in sorted(self._chunks):
+            offset, size = self._chunks[key]
+            self._file.seek(offset)
+            for line in self._file.read(size).decode().split("\n"):
+                yield key, line.split("\t")
+
+    def close(self):
+        self._file.close()
+
+
+def get_hotspot_report_parallel(sample, levels, hotspot_file, vcf_file, gvcf_file, chr_mapping, vcf_file_wo_pick=None,
+                                column_yaml_file=None, processes=2, hotspot_cache=None, coverage=False, threads=1,
+                                hotspot_only=False, shard=None, report_inputs=None):
+    """
+        Build the hotspot report for a sample, building the rows for each contig in a pool of processes.
+
+        Hotspot rows are put back in hotspot file order and the remaining variants in the order of the
+        contigs in the vcf, giving the same report as get_hotspot_report. With hotspot_only only the contigs with
+        hotspots are processed. The inputs are loaded once and handed to the pool, already loaded report_inputs,
+        see load_report_inputs, are used instead of the hotspot, chr mapping and column yaml files.
+
+        Returns:
+            HotspotReport
+    """
+    if report_inputs is None:
+        report_inputs = load_report_inputs(hotspot_file, chr_mapping, column_yaml_file, hotspot_cache)
+    reports, chr_translater, plan = report_inputs
+    if hotspot_only:
+        # no vcf files, only the contigs with hotspots
+        contigs = get_report_contigs(reports, chr_translater, None)
+    else:
+        contigs = get_report_contigs(reports, chr_translater, vcf_file, vcf_file_wo_pick)
+    log.info("Processing {} contigs using {} processes".format(len(contigs), processes))
+    results = []
+    if contigs:
+        from multiprocessing import Pool
+        with Pool(min(processes, len(contigs)), _set_worker_inputs, (report_inputs,)) as pool:
+            results = pool.map(_build_contig_rows, [(contig, sample, levels, vcf_file, gvcf_file, vcf_file_wo_pick,
+                                                     coverage, threads, hotspot_only, shard) for contig in contigs])
+    hotspot_rows = {}
+    other_rows = []
+    coverage_rows = [] if coverage else None
+    for contig_rows, contig_coverage_rows in results:
+        for key, row in contig_rows:
+            if key is None:
+                other_rows.append((key, row))
+            else:
+                # the keys of a shard also sort the other variants, see build_report_rows
+                hotspot_rows.setdefault(key, []).append(row)
+        if coverage:
+            coverage_rows.extend(contig_coverage_rows)
+    rows = [(key, row) for key in sorted(hotspot_rows) for row in hotspot_rows[key]]
+    return get_keyed_report(plan, levels, rows + other_rows, None if coverage_rows is None else sorted(coverage_rows),
+                            shard is not None)
+
+
+def _build_contig_rows(task):
+    contig, sample, levels, vcf_file, gvcf_file, vcf_file_wo_pick, coverage, threads, hotspot_only, shard = task
+    reports, chr_translater, plan = _worker_inputs
+    hotspots = get_report_hotspots(reports, chr_translater, contig)
+    coverage_rows = [] if coverage else None
+    rows = list(build_report_rows(sample, levels, reports, hotspots, vcf_file, gvcf_file, chr_translater, plan,
+                                  vcf_file_wo_pick, contig, coverage_rows, threads, hotspot_only=hotspot_only, shard=shard))
+    return rows, coverage_rows
+
+
+def open_variant_file(file_name, threads=1):
+    """
+        Open a vcf/gvcf file, with threads > 1 bgzf compressed blocks are decompressed ahead of the reader by a
+        pool of htslib threads.
+    """
+    return VariantFile(file_name, threads=threads)
+
+
+def write_report(output, header, rows):
+    log.info("open output file: {}".format(output))
+    counter = 0
+    with open(output, "w") as writer:
+        writer.write("\t".join(header))
+        for row in rows:
+            writer.write("\n" + "\t".join(row))
+            counter += 1
+    log.info("-- report entries: {}".format(counter))
+
+
+def write_indexed_report(output, header, rows, contigs, chunk_size=500000):
+    """
+        Write a report sorted by the chr, start and stop columns as a bgzip compressed file with a tabix index,
+        see get_index_file. Contigs are sorted in chr mapping order, the order of rows at the same position is
+        kept. The header line is kept as the first line and is skipped by the index.
+
+        Parameters:
+            contigs (ContigDictionary): contigs of the chr mapping
+            chunk_size (int): maximum number of rows sorted in memory, see sort_rows
+    """
+    if 'chr' not in header or 'start' not in header:
+        raise ValueError("An indexed report requires the chr and start columns: {}".format(output))
+    chr_column = header.index('chr')
+    start_column = header.index('start')
+    stop_column = header.index('stop') if 'stop' in header else start_column
+
+    def position(row):
+        contig = row[chr_column]
+        return get_contig_rank(contigs, contig), contig, int(row[start_column]), int(row[stop_column])
+
+    log.info("open output file: {}".format(output))
+    counter = 0
+    with BGZFile(output, "wb") as writer:
+        writer.write(("\t".join(header) + "\n").encode())
+        for row in sort_rows(rows, position, chunk_size):
+            writer.write(("\t".join(row) + "\n").encode())
+            counter += 1
+    tabix_index(output, force=True, seq_col=chr_column, start_col=start_column, end_col=stop_column, line_skip=1,
+                index=get_index_file(output))
+    log.info("-- report entries: {}".format(counter))
+
+
+def write_columnar_report(output, report, output_format, batch_size=100000):
+    """
+        Write a report as an Apache Parquet file, or an Arrow IPC file for output_format arrow, with typed
+        columns, see HotspotReport.get_arrow_schema. Parquet files are written in row groups of batch_size rows
+        while the report is iterated. Requires pyarrow.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required to write {} reports, install hydra-genetics[arrow]".format(output_format))
+    log.info("open output file: {}".format(output))
+    counter = 0
+    if output_format == "parquet":
+        import pyarrow.parquet
+        with pyarrow.parquet.ParquetWriter(output, report.get_arrow_schema()) as writer:
+            for batch in report.to_arrow_batches(batch_size):
+                writer.write_batch(batch)
+                counter += batch.num_rows
+    else:
+        # the ipc file format needs the same dictionaries in all batches
+        table = report.to_arrow()
+        with pyarrow.ipc.new_file(output, table.schema, options=pyarrow.ipc.IpcWriteOptions(unify_dictionaries=True)) as writer:
+            writer.write_table(table)
+        counter = table.num_rows
+    log.info("-- report entries: {}".format(counter))
+
+
+def get_contig_rank(contigs, contig):
+    """
+        Sort rank of a contig in indexed reports, contigs missing from the chr mapping are sorted last.
+    """
+    return contigs.get_id(contig) if contig in contigs else len(contigs)
+
+
+def get_index_file(output):
+    return output + ".tbi"
+
+
+def sort_rows(rows, key, chunk_size=500000):
+    """
+        Stable sort of rows, lists of strings without tabs or newlines. Rows are sorted in chunks of chunk_size
+        rows, if there is more than one chunk they are spooled to temporary files and merged.
+
+        Returns:
+            generator of the sorted rows
+    """
+    rows = iter(rows)
+    chunk = sorted(islice(rows, chunk_size), key=key)
+    if len(chunk) < chunk_size:
+        yield from chunk
+        return
+    spools = []
+    try:
+        while chunk:
+            spool = tempfile.TemporaryFile(mode="w+")
+            spool.writelines("\t".join(row) + "\n" for row in chunk)
+            spool.seek(0)
+            spools.append(spool)
+            chunk = sorted(islice(rows, chunk_size), key=key)
+        yield from heapq.merge(*[(line[:-1].split("\t") for line in spool) for spool in spools], key=key)
+    finally:
+        for spool in spools:
+            spool.close()
+
+
+def format_shard_key(key):
+    return ":".join(map(str, key))
+
+
+def parse_shard_key(value):
+    return tuple(int(field) for field in value.split(":"))
+
+
+def merge_report_shards(shard_files, output, chunk_size=500000):
+    """
+        Merge the shard reports of a sample, or their coverage summaries, into a tsv report for the whole
+        sample, with the same header and rows in the same order as a report generated without a regions file,
+        see generate_hotspot_report. The shards must have the same columns and non overlapping regions.
+
+        Parameters:
+            shard_files (list): paths to shard reports, starting with the SHARD_KEY_COLUMN
+            output (string): path to the merged report
+            chunk_size (int): maximum number of rows sorted in memory, see sort_rows
+    """
+    header = None
+    for shard_file in shard_files:
+        with open(shard_file) as shard:
+            shard_header = shard.readline().rstrip("\n").split("\t")
+        if not shard_header[0] == SHARD_KEY_COLUMN:
+            raise ValueError("{} isn't a shard report, the first column should be {}".format(shard_file, SHARD_KEY_COLUMN))
+        if header is not None and not shard_header == header:
+            raise ValueError("Shard {} has different columns than {}".format(shard_file, shard_files[0]))
+        header = shard_header
+    if header is None:
+        raise ValueError("No shard reports to merge")
+
+    def shard_rows():
+        # rows prefixed with the index of their shard
+        for index, shard_file in enumerate(shard_files):
+            with open(shard_file) as shard:
+                shard.readline()
+                for line in shard:
+                    line = line.rstrip("\n")
+                    if line:
+                        yield [str(index)] + line.split("\t")
+
+    def rows():
+        previous = None
+        for row in sort_rows(shard_rows(), lambda row: parse_shard_key(row[1]), chunk_size):
+            # rows with the same key can only come from one shard, unless the regions of the shards overlap
+            if previous is not None and previous[1] == row[1] and not previous[0] == row[0]:
+                raise ValueError("Shards {} and {} overlap, both have rows with key {}".format(
+                    shard_files[int(previous[0])], shard_files[int(row[0])], row[1]))
+            previous = row
+            yield row[2:]
+    write_report(output, header[1:], rows())
+
+
+def get_report_hotspots(reports, chr_translater=None, contig=None):
+    """
+        List ((report rank, index), hotspot) for all hotspots, or those on contig as named in the vcf, in the
+        order they are printed.
+    """
+    hotspots = []
+    for rank, report in enumerate(reports):
+        for index, hotspot in enumerate(reports[report]):
+            if contig is None or chr_translater.get_chr_value(hotspot.CHROMOSOME) == contig:
+                hotspots.append(((rank, index), hotspot))
+    return hotspots
+
+
+def get_report_contigs(reports, chr_translater, vcf_file, vcf_file_wo_pick=None):
+    """
+        Contigs, as named in the vcf, that need to be processed for a report: the contigs in the vcf index, in
+        file order, followed by contigs that only have hotspots. Vcf files that are None are skipped.
+    """
+    contigs = []
+    for file_name in [vcf_file_wo_pick, vcf_file]:
+        if file_name is None:
             continue
-        transcript_dict[variant_key] = transcript
+        with VariantFile(file_name) as variant_file:
+            if variant_file.index is None:
+                raise ValueError("Vcf file must be indexed to process contigs in parallel: {}".format(file_name))
+            contigs += [contig for contig in variant_file.index if contig not in contigs]
+    for _, hotspot in get_report_hotspots(reports):
+        contig = chr_translater.get_chr_value(hotspot.CHROMOSOME)
+        if contig not in contigs:
+            contigs.append(contig)
+    return contigs
+
+
+def get_contig_ranks(variant_file):
+    """
+        Rank of each contig of a vcf: the order of the vcf index, which is the order of the records in the file,
+        followed by the other contigs of the header.
+    """
+    ranks = {}
+    for contig in list(variant_file.index if variant_file.index is not None else []) + list(variant_file.header.contigs):
+        ranks.setdefault(contig, len(ranks))
+    return ranks
+
+
+def build_report_rows(sample, levels, reports, hotspots, vcf_file, gvcf_file, chr_translater, plan,
+                      vcf_file_wo_pick=None, contig=None, coverage_rows=None, threads=1, bam_file=None, reference_file=None,
+                      processes=1, hotspot_only=False, shard=None):
+    """
+        Match the variants of a sample against the hotspots and generate the report rows.
+
+        Parameters:
+            reports (OrderedDict): hotspot index per report class, see load_hotspots
+            hotspots (list): ((report rank, index), hotspot) that will be printed, see get_report_hotspots
+            contig (string): only process variants on this contig, requires indexed vcf files
+            coverage_rows (list): if given, the coverage summary of all hotspots is appended to it, as
+                (key, row), see build_coverage_rows
+            threads (int): number of htslib threads used to decompress each vcf and gvcf file
+            bam_file (string): bam or cram file the depth is computed from if gvcf_file is None, see
+                load_report_depth
+            hotspot_only (bool): only read the vcf records in the regions of the hotspots, see get_hotspot_regions,
+                and skip the variants not overlapping a hotspot
+            shard (RegionSet): regions per contig id, only print the hotspots starting in the regions and the
+                variants starting in the regions that don't overlap a hotspot, reading the vcf records in the
+                regions and the regions of the printed hotspots. The variants are still matched against all
+                hotspots
+
+        The variants are matched, see match_report_variants, and the depth loaded by the call, the rows are
+        formatted while the returned generator is iterated, see build_matched_rows.
+
+        Returns:
+            generator of (key, row), where key is the (report rank, index) of the hotspot or None for
+            variants not overlapping a hotspot. With a shard the key of those variants is (number of report
+            classes, contig rank, start), see get_contig_ranks, sorting them after the hotspots in report order
+    """
+    matched = match_report_variants(reports, hotspots, vcf_file, chr_translater, vcf_file_wo_pick, contig, threads,
+                                    hotspot_only, shard)
+    return build_matched_rows(sample, levels, reports, matched, gvcf_file, plan, coverage_rows, threads, bam_file,
+                              reference_file, processes)
+
+
+class MatchedVariants(object):
+    """
+        Variants of a sample matched against the hotspots, see match_report_variants.
+
+        Attributes:
+            hotspots (list): ((report rank, index), hotspot) that will be printed, with their matched variants
+            other (list): (contig id, variant) of the variants that will be printed that don't overlap a hotspot
+            contigs (ContigDictionary): contigs of the chr mapping
+            contig_ranks (dict): rank of each contig of the vcf header, only with a shard, see get_contig_ranks
+            annotation_extractor (function): annotation of a variant, see get_annotation_extractor
+    """
+    def __init__(self, hotspots, other, contigs, contig_ranks, annotation_extractor):
+        self.hotspots = hotspots
+        self.other = other
+        self.contigs = contigs
+        self.contig_ranks = contig_ranks
+        self.annotation_extractor = annotation_extractor
+
+
+def match_report_variants(reports, hotspots, vcf_file, chr_translater, vcf_file_wo_pick=None, contig=None, threads=1,
+                          hotspot_only=False, shard=None):
+    """
+        Match the variants of a sample against the hotspots, variants added to the hotspots by a previous call
+        are cleared first, see build_report_rows for the parameters.
+
+        Returns:
+            MatchedVariants
+    """
+    for _, hotspot in hotspots:
+        hotspot.clear_variants()
 
+    variants = open_variant_file(vcf_file, threads)
+    variants_wo_pick = None
     if vcf_file_wo_pick is not None:
-        variants = VariantFile(vcf_file_wo_pick)
-    else:
-        variants = VariantFile(vcf_file)
+        variants_wo_pick = open_variant_file(vcf_file_wo_pick, threads)
+    other = []
+
+    contigs = ContigDictionary(chr_translater)
+    contig_intervals = get_contig_intervals(reports, contigs)
+    header = (variants if variants_wo_pick is None else variants_wo_pick).header
+    header_ids = contigs.get_header_ids(header)
+    regions = None
+    if shard is not None:
+        hotspots = [(key, hotspot) for key, hotspot in hotspots if in_shard(shard, contigs, hotspot)]
+        shard_regions = () if hotspot_only else [(contig_id, start, end) for contig_id, start, end in shard
+                                                 if contig is None or contigs.chr_names[contig_id] == contig]
+        regions = get_hotspot_regions(hotspots, contigs, header, shard_regions)
+    elif hotspot_only:
+        regions = get_hotspot_regions(hotspots, contigs, header)
+
+    transcript_dict = {}
     log.info("Processing variants")
-    sub_report_keys = list(reports.keys())[0:-1]
-    indel_report_key = list(reports.keys())[-1]
-    for variant in variants:
-        # ToDo make sure that empty variants are handled better!!!
-        if variant is None:
-            raise Exception("Empty allele found: " + str(variant))
-        if not len(variant.alts) == 1:
-            raise Exception("Multiple allele found: " + str(variant.alts))
-        variant_key = f"{variant.chrom}_{variant.start}_{variant.stop}_{variant.ref}_{','.join(variant.alts)}"
-        variant_key_hotspot = f"{chr_translater.get_nc_value(variant.chrom)}-{variant.start // 1000000}"
-        if variant_key in transcript_dict:
-            added = False
-            for report in sub_report_keys:
-                for hotspot in reports[report].get(variant_key_hotspot, []):
-                    if hotspot.add_variant(variant, chr_translater):
-                        hotspot_transcript = hotspot.ACCESSION_NUMBER
-                        if not hotspot_transcript == "-":
-                            transcript_dict[variant_key] = hotspot_transcript
-                        log.debug("Adding variant {}:{}-{} {} {} to hotspot: {}".format(variant.chrom,
-                                                                                        variant.start,
-                                                                                        variant.stop,
-                                                                                        variant.ref,
-                                                                                        ",".join(variant.alts),
-                                                                                        hotspot))
-                        added = True
-                        break
-                if added:
-                    break
-            if not added:
-                for hotspot in reports[indel_report_key]['indel']:
-                    if hotspot.add_variant(variant, chr_translater):
-                        hotspot_transcript = hotspot.ACCESSION_NUMBER
-                        if not hotspot_transcript == "-":
-                            transcript_dict[variant_key] = hotspot_transcript
-                        log.debug("Adding variant {}:{}-{} {} {} to hotspot: {}".format(variant.chrom,
-                                                                                        variant.start,
-                                                                                        variant.stop,
-                                                                                        variant.ref,
-                                                                                        ",".join(variant.alts),
-                                                                                        hotspot))
-                        added = True
-                        break
-            if not added:
-                chromosomes_to_look_at.add(variant.chrom)
-                other.append(variant)
-    log.info("Open genomic vcf")
-    g_variants = VariantFile(gvcf_file)
-
-    columns = {'columns': []}
-    if column_yaml_file is not None:
-        log.info("Process yaml for: {}".format(column_yaml_file))
-        with open(column_yaml_file) as file:
-            columns = yaml.load(file, Loader=yaml.FullLoader)
-
-    output_order = []
-    hotspot_columns = {'sample': {},
-                       'chr': {},
-                       'start': {},
-                       'stop': {},
-                       'ref': {},
-                       'alt': {},
-                       'report': {},
-                       'gvcf_depth': {},
-                       'ref_depth': {},
-                       'alt_depth': {}}
-    report_header = []
-
-    biggest_order = -1
-
-    gcvf_depth_field = 'DP'
-    if isinstance(columns['columns'], dict):
-        gcvf_depth_field = columns['columns'].get('gvcf_depth', {}).get('field', 'DP')
-    for entry in columns['columns']:
-        if entry in hotspot_columns:
-            if columns['columns'][entry].get('visible', 1) == 0 or 'order' in columns['columns'][entry]:
-                del hotspot_columns[entry]
-            elif columns['columns'][entry].get('format', None):
-                hotspot_columns[entry]['format'] = columns['columns'][entry]['format']
-        if 'order' in columns['columns'][entry]:
-            output_order.append((columns['columns'][entry]['order'], entry))
-            if 'from' in columns['columns'][entry] and 'merge' == columns['columns'][entry]['from']:
-                report_header.append((columns['columns'][entry]['order'],
-                                      entry + "_" +
-                                      columns['columns'][entry]['divider'].join(
-                                        extract_item_merge_header(columns['columns'][entry]['elements']))))
-            else:
-                report_header.append((columns['columns'][entry]['order'], entry))
-            biggest_order = max(biggest_order, columns['columns'][entry]['order'])
-    for key in hotspot_columns:
-        if key in columns['columns']:
-            del columns['columns'][key]
-
-    depth_data = dict(map(lambda x: (x, {}), chromosomes_to_look_at))
-
-    for chr in depth_data:
-        for variant in g_variants.fetch(chr):
-            depth_data[chr][variant.start] = variant.samples[sample][gcvf_depth_field]
-
-    def handle_select(data):
-        def convert_list_slice(info):
-            if len(info) < 3:
-                raise SyntaxError(f"Invalid syntax: {info}")
-            if info.startswith("[") and info.endswith("]"):
-                info = info[1:-1].split(":")
-                if len(info) == 1:
-                    return lambda data: data[int(info[0])]
-                elif len(info) == 2:
-                    value0 = int(info[0]) if len(info[0]) > 0 else None
-                    value1 = int(info[1]) if len(info[1]) > 0 else None
-                    return lambda data: data[value0:value1]
-                elif len(info) == 3:
-                    value0 = int(info[0]) if len(info[0]) > 0 else None
-                    value1 = int(info[1]) if len(info[1]) > 0 else None
-                    value2 = int(info[2]) if len(info[2]) > 0 else None
-                    return lambda data: data[value0:value1:value2]
-                else:
-                    raise SyntaxError(f"Invalid syntax: {info}, invalid number of elements inside '[]'")
-            else:
-                raise SyntaxError(f"Invalid syntax: {info}, missing bracket '[]'")
-
-        def condition(items, empty):
-            items = convert_list_slice(items)
-
-            def func(data):
-                values = items(data)
-                if isinstance(values, str):
-                    return (values == "-") == empty
-                else:
-                    return (len([v for _, v in values.items() if v != "-"]) == 0) == empty
-            return func
-
-        data['items'] = convert_list_slice(data['items'])
-        if "else" in data:
-            data['else'] = convert_list_slice(data['else'])
-        if "condition" in data:
-            data['condition'] = condition(data['condition']['items'], data['condition'].get("empty", True))
-        return data
-
-    for entry in columns['columns']:
-        if "from" in columns['columns'][entry] and "select" in columns['columns'][entry]["from"]:
-            columns['columns'][entry] = handle_select(columns['columns'][entry])
-
-    for entry in hotspot_columns:
-        biggest_order += 1
-        output_order.append((biggest_order, entry))
-        report_header.append((biggest_order, entry))
-    for entry in columns['columns']:
-        if 'order' not in columns['columns'][entry]:
-            if columns['columns'][entry].get('visible', 1) == 0:
-                continue
-            biggest_order += 1
-            output_order.append((biggest_order, entry))
-            if 'from' in columns['columns'][entry] and 'merge' == columns['columns'][entry]['from']:
-                report_header.append((biggest_order,
-                                      entry + "_" +
-                                      columns['columns'][entry]['divider'].join(
-                                        extract_item_merge_header(columns['columns'][entry]['elements']))))
-            else:
-                report_header.append((biggest_order, entry))
-    output_order = sorted(output_order, key=lambda tup: tup[0])
-    report_header = sorted(report_header, key=lambda tup: tup[0])
+    for variant, variant_key, transcript in read_annotated_variants(variants, variants_wo_pick, contig, regions):
+        transcript_dict[variant_key] = transcript
+        if variant.rid >= len(header_ids):
+            # contigs missing from the header are added while reading
+            header_ids = contigs.get_header_ids(header)
+        contig_id = header_ids[variant.rid]
+        if contig_id is None:
+            raise KeyError(variant.chrom)
+        if add_to_hotspot(variant, variant_key, contig_intervals[contig_id], contigs.nc_names[contig_id],
+                          transcript_dict, chr_translater) is None and not hotspot_only:
+            if shard is None or shard.contains(contig_id, variant.start):
+                other.append((contig_id, variant))
+    if variants_wo_pick is not None:
+        variants = variants_wo_pick
+    contig_ranks = None if shard is None else get_contig_ranks(variants)
 
     log.info("Process vcf header: {}".format(vcf_file))
-    for record in variants.header.records:
+    annotation_extractor = get_annotation_extractor(variants.header, transcript_dict)
+    return MatchedVariants(hotspots, other, contigs, contig_ranks, annotation_extractor)
+
+
+def build_matched_rows(sample, levels, reports, matched, gvcf_file, plan, coverage_rows=None, threads=1, bam_file=None,
+                       reference_file=None, processes=1):
+    """
+        Load the depth of the matched variants, see load_report_depth, and generate their report rows, see
+        build_report_rows for the parameters and the returned rows.
+
+        Parameters:
+            matched (MatchedVariants): variants matched against the hotspots, see match_report_variants
+    """
+    hotspots = matched.hotspots
+    other = matched.other
+    contigs = matched.contigs
+    depth_regions = get_depth_regions([hotspot for _, hotspot in hotspots], other, contigs,
+                                      coverage=coverage_rows is not None)
+    depth_store = load_report_depth(sample, depth_regions, contigs, plan, gvcf_file, bam_file, reference_file, threads,
+                                    processes)
+    if coverage_rows is not None:
+        coverage_rows.extend(build_coverage_rows(sample, levels, hotspots, depth_store, contigs))
+
+    def rows():
+        log.info("Generating hotspot rows")
+        for key, hotspot in hotspots:
+            contig_id = contigs.get_id(hotspot.CHROMOSOME)
+            for row in build_hotspot_rows(sample, levels, hotspot, contig_id, depth_store, plan,
+                                          matched.annotation_extractor):
+                yield key, row
+        log.info("Generating rows for variants that aren't hotspot")
+        for contig_id, var in other:
+            key = None if matched.contig_ranks is None else (len(reports), matched.contig_ranks[var.chrom], var.start)
+            yield key, build_other_row(sample, levels, var, contig_id, contigs, depth_store, plan,
+                                       matched.annotation_extractor)
+    return rows()
+
+
+def load_report_depth(sample, regions, contigs, plan, gvcf_file=None, bam_file=None, reference_file=None, threads=1,
+                      processes=1):
+    """
+        DepthStore for the regions, per contig id, read from the gvcf file or, if it is None, computed from the
+        bam file, see load_gvcf_depth and load_bam_depth. The depth field and bam filters are set by the
+        gvcf_depth column of the column plan.
+    """
+    if bam_file is None:
+        log.info("Open genomic vcf")
+        return load_gvcf_depth(open_variant_file(gvcf_file, threads), sample, regions, plan.depth_field, contigs.chr_names)
+    log.info("Computing depth from: {}".format(bam_file))
+    return load_bam_depth(bam_file, regions, contigs.chr_names, reference_file, plan.min_base_quality,
+                          plan.min_mapping_quality, processes)
+
+
+def open_depth_window(sample, contigs, plan, gvcf_file=None, bam_file=None, reference_file=None, threads=1):
+    """
+        DepthWindow, queried by contig id, streaming from the gvcf file or, if it is None, computed from the bam
+        file, see load_report_depth.
+    """
+    if bam_file is None:
+        log.info("Open genomic vcf")
+        return open_gvcf_window(open_variant_file(gvcf_file, threads), sample, plan.depth_field, contigs.chr_names)
+    reader = BamDepthReader(bam_file, reference_file, plan.min_base_quality, plan.min_mapping_quality)
+    return open_bam_window(reader, contigs.chr_names)
+
+
+def get_contig_intervals(reports, contigs):
+    """
+        Index all hotspots, of all report classes, per contig id. Queries on the returned intervals take 1-based,
+        half-open coordinates and return the hotspots in the order the report classes are matched.
+
+        Returns:
+            list: the intervals for each contig id, None for contigs without hotspots
+    """
+    hotspot_index = IntervalIndex()
+    for report in reports:
+        for hotspot in reports[report]:
+            if hotspot.CHROMOSOME in contigs:
+                hotspot_index.add(contigs.get_id(hotspot.CHROMOSOME), hotspot.START, hotspot.END, hotspot)
+    return [hotspot_index.get_contig(contig_id) for contig_id in range(len(contigs))]
+
+
+def get_hotspot_regions(hotspots, contigs, header, regions=()):
+    """
+        Merged regions of the vcf records that can be added to the hotspots, i.e. records overlapping a hotspot
+        or ending at most one base before it, see add_to_hotspot. Hotspots on contigs missing from the chr
+        mapping are skipped.
+
+        Parameters:
+            hotspots (list): ((report rank, index), hotspot), see get_report_hotspots
+            contigs (ContigDictionary): contig ids
+            header (VariantHeader): header of the vcf, giving the order of the contigs
+            regions (iterable): additional 0-based, half-open (contig id, start, end) regions
+
+        Returns:
+            list: 0-based, half-open (chr, start, end) regions, sorted by contig in header order and start
+    """
+    def hotspot_regions():
+        for _, hotspot in hotspots:
+            if hotspot.CHROMOSOME in contigs:
+                yield contigs.get_id(hotspot.CHROMOSOME), max(hotspot.START - 2, 0), hotspot.END
+        yield from regions
+    merged = merge_regions(hotspot_regions())
+    header_rank = {contig: rank for rank, contig in enumerate(header.contigs)}
+    ordered = sorted(merged, key=lambda contig_id: (header_rank.get(contigs.chr_names[contig_id], len(header_rank)), contig_id))
+    return [(contigs.chr_names[contig_id], start, end) for contig_id in ordered for start, end in merged[contig_id]]
+
+
+def in_shard(shard, contigs, hotspot):
+    """
+        True if the hotspot starts in the regions of shard, a RegionSet per contig id.
+    """
+    return hotspot.CHROMOSOME in contigs and shard.contains(contigs.get_id(hotspot.CHROMOSOME), hotspot.START - 1)
+
+
+def add_to_hotspot(variant, variant_key, intervals, chrom, transcript_dict, chr_translater):
+    """
+        Add variant to the first overlapping hotspot accepting it, the transcript of the hotspot is used for the
+        variant if it has one. Returns the hotspot or None if the variant wasn't added.
+    """
+    if intervals is None:
+        return None
+    for hotspot in intervals.overlap(variant.start + 1, variant.stop + 2):
+        if hotspot.add_variant(variant, chr_translater, chrom):
+            hotspot_transcript = hotspot.ACCESSION_NUMBER
+            if not hotspot_transcript == "-":
+                transcript_dict[variant_key] = hotspot_transcript
+            log.debug("Adding variant {}:{}-{} {} {} to hotspot: {}".format(variant.chrom,
+                                                                            variant.start,
+                                                                            variant.stop,
+                                                                            variant.ref,
+                                                                            ",".join(variant.alts),
+                                                                            hotspot))
+            return hotspot
+    return None
+
+
+def get_annotation_extractor(header, transcript_dict):
+    """
+        Vep annotation extractor for the CSQ field in header, None if the vcf isn't annotated by vep.
+    """
+    annotation_extractor = None
+    for record in header.records:
         if record.type == "INFO":
             if record['ID'] == "CSQ":
-                log.info(" -- found vep information: {}".format(vcf_file))
+                log.info(" -- found vep information")
                 log.debug(" -- -- {}".format(record['Description'].split("Format: ")[1].split('">')[0].split("|")))
                 vep_fields = {v: c for c, v in enumerate(record['Description'].split("Format: ")[1].split('">')[0].split("|"))}
                 annotation_extractor = utils.get_annotation_data_vep(vep_fields, transcript_dict)
+    return annotation_extractor
 
-    def get_depth(data, chr, start, stop):
-        depth = [data[chr].get(pos, 0) for pos in range(start, stop)]
-        if len(depth) > 1:
-            return statistics.mean(depth)
-        elif len(depth) == 1:
-            return depth[0]
+
+def build_hotspot_rows(sample, levels, hotspot, contig_id, depth_store, plan, annotation_extractor):
+    """
+        Report rows for a hotspot: one row per added variant and, for hotspots that are always printed, one row
+        for each hotspot position without variants.
+    """
+    # only hotspots that are always printed need the positions without variants
+    for position, variants, extended in hotspot.iter_positions(hotspot.ALWAYS_PRINT):
+        # even though no variants were found print hotspot and region all entries
+        if not variants:
+            if not extended:
+                depth = depth_store.get_depth(contig_id, position - 1, position)
+                data = {'sample': sample,
+                        'chr': hotspot.CHROMOSOME,
+                        'start': position,
+                        'stop': position,
+                        'ref': '-',
+                        'alt': '-',
+                        'report':  utils.format_report_type(hotspot),
+                        'gvcf_depth': depth,
+                        'ref_depth': '-',
+                        'alt_depth': '-'}
+                yield plan.format_row(data, None, hotspot, annotation_extractor, depth, levels)
         else:
-            return 0
+            # print found variants that overlap with hotspot positions
+            for var in variants:
+                depth = depth_store.get_depth(contig_id, var.start, var.stop)
+                data = {'sample': sample,
+                        'chr': hotspot.CHROMOSOME,
+                        'start': var.start + 1,
+                        'stop': var.stop,
+                        'ref': var.ref,
+                        'alt': ",".join(var.alts),
+                        'report': utils.get_report_type(var, hotspot),
+                        'gvcf_depth': depth,
+                        'ref_depth': var.samples[sample]['AD'][0],
+                        'alt_depth': ",".join(map(str, var.samples[sample]['AD'][1:]))}
+                yield plan.format_row(data, var, hotspot, annotation_extractor, depth, levels)
 
-    log.info("open output file: {}".format(output))
-    with open(output, "w") as writer:
-        writer.write("\t".join([name[1] for name in report_header]))
-        log.info("Printing header: {}".format(output))
-        log.info("Printing hotspot information: {}".format(output))
-        counter = 0
+
+def build_other_row(sample, levels, var, contig_id, contigs, depth_store, plan, annotation_extractor):
+    """
+        Report row for a variant that doesn't overlap a hotspot.
+    """
+    depth = depth_store.get_depth(contig_id, var.start, var.stop)
+    data = {'sample': sample,
+            'chr': contigs.nc_names[contig_id],
+            'start': var.start + 1,
+            'stop': var.stop,
+            'ref': var.ref,
+            'alt': ",".join(var.alts),
+            'report': "4-other",
+            'gvcf_depth': depth,
+            'ref_depth': var.samples[sample]['AD'][0],
+            'alt_depth': ",".join(map(str, var.samples[sample]['AD'][1:]))}
+    return plan.format_row(data, var, None, annotation_extractor, depth, levels)
+
+
+def load_hotspots(hotspot_file, hotspot_cache=None):
+    """
+        Read hotspot file and index the entries per report class and contig.
+
+        Returns an OrderedDict with an IntervalIndex for each report class, in the order the report
+        classes are matched against variants and printed. If a HotspotCache is given the indexed hotspots
+        are loaded from, or stored in, the cache.
+
+        Raises:
+            ValueError: if the hotspot file has an invalid entry
+    """
+    cache_key = None
+    if hotspot_cache is not None and not hotspot_file == "-":
+        cache_key = hotspot_cache.get_key(hotspot_file)
+        reports = hotspot_cache.load(cache_key)
+        if reports is not None:
+            return reports
+    reports = OrderedDict(((ReportClass.hotspot, IntervalIndex()),
+                          (ReportClass.region_all, IntervalIndex()),
+                          (ReportClass.region, IntervalIndex()),
+                          (ReportClass.indel, IntervalIndex())))
+    if not hotspot_file == "-":
+        try:
+            hotspot_reader = HotspotReader(hotspot_file)
+            for hotspot in iter(hotspot_reader):
+                reports[hotspot.REPORT].add(hotspot.CHROMOSOME, hotspot.START, hotspot.END, hotspot)
+        except (ValueError, KeyError, IndexError) as e:
+            raise ValueError("Invalid hotspot file {}: {}".format(hotspot_file, repr(e))) from e
+    if cache_key is not None:
         for report in reports:
-            for index_data in reports[report]:
-                for hotspot in reports[report][index_data]:
-                    for index, variant in enumerate(hotspot.VARIANTS):
-                        # even though no variants were found print hotspot and region all entries
-                        if not variant['variants'] and not variant['extended']:
-                            depth = get_depth(depth_data,
-                                              chr_translater.get_chr_value(hotspot.CHROMOSOME),
-                                              hotspot.EXTENDED_START + index-1,
-                                              hotspot.EXTENDED_START + index)
-                            if hotspot.ALWAYS_PRINT:
-                                data = {'sample': sample,
-                                        'chr': hotspot.CHROMOSOME,
-                                        'start': hotspot.EXTENDED_START + index,
-                                        'stop': hotspot.EXTENDED_START + index,
-                                        'ref': '-',
-                                        'alt': '-',
-                                        'report':  utils.format_report_type(hotspot),
-                                        'gvcf_depth': depth,
-                                        'ref_depth': '-',
-                                        'alt_depth': '-'}
-                                format_hotspot(data, columns, hotspot_columns)
-                                add_columns(data, None, hotspot, columns, annotation_extractor, depth, levels)
-                                writer.write("\n" + "\t".join([str(data[c[1]]) for c in output_order]))
-                                counter += 1
-                        else:
-                            # print found variants that overlap with hotspot positions
-                            for var in variant['variants']:
-                                depth = get_depth(depth_data,
-                                                  var.chrom,
-                                                  var.start,
-                                                  var.stop)
-                                data = {'sample': sample,
-                                        'chr': chr_translater.get_nc_value(var.chrom),
-                                        'start': var.start + 1,
-                                        'stop': var.stop,
-                                        'ref': var.ref,
-                                        'alt': ",".join(var.alts),
-                                        'report': utils.get_report_type(var, hotspot),
-                                        'gvcf_depth': depth,
-                                        'ref_depth': var.samples[sample]['AD'][0],
-                                        'alt_depth': ",".join(map(str, var.samples[sample]['AD'][1:]))}
-                                format_hotspot(data, columns, hotspot_columns)
-                                add_columns(data, var, hotspot, columns, annotation_extractor, depth, levels)
-                                writer.write("\n" + "\t".join([str(data[c[1]]) for c in output_order]))
-                                counter += 1
-        log.info("-- hotspot entries: {}".format(counter))
-        log.info("Printing variants that aren't hotspot: {}".format(output))
-        counter = 0
-        for var in other:
-            # print variants that doesn't overlap with a hotspot
-            depth = get_depth(depth_data,
-                              var.chrom,
-                              var.start,
-                              var.stop)
-            data = {'sample': sample,
-                    'chr': chr_translater.get_nc_value(var.chrom),
-                    'start': var.start + 1,
-                    'stop': var.stop,
-                    'ref': var.ref,
-                    'alt': ",".join(var.alts),
-                    'report': "4-other",
-                    'gvcf_depth': depth,
-                    'ref_depth': var.samples[sample]['AD'][0],
-                    'alt_depth': ",".join(map(str, var.samples[sample]['AD'][1:]))}
-            format_hotspot(data, columns, hotspot_columns)
-            add_columns(data, var, None, columns, annotation_extractor, depth, levels)
-            writer.write("\n" + "\t".join([str(data[c[1]]) for c in output_order]))
-            counter += 1
-            log.info("-- non-hotspot entries: {}".format(counter))
+            reports[report].index()
+        hotspot_cache.store(cache_key, reports)
+    return reports
 
 
-def format_value(value, format):
-    if format[0] == "replace":
-        return value.replace(format[1], format[2])
-    elif format[0] == "string":
-        if len(format) == 3:
-            value = getattr(builtins, format[2])(value)
-        else:
-            value = float(value)
-        return format[1].format(value)
-    else:
-        raise Exception("Unknown format value: " + format)
+def get_depth_regions(hotspots, other, contigs, distance=1000, coverage=False):
+    """
+        Merged regions, per contig id, where depth will be needed: the extended window of hotspots that
+        are always printed and the span of every other reported variant.
 
+        Parameters:
+            hotspots (list): hotspots that will be printed
+            other (list): (contig id, variant) for variants not overlapping a hotspot
+            contigs (ContigDictionary): contig ids
+            coverage (bool): also include the full region of every hotspot, needed by build_coverage_rows
 
-def format_hotspot(data, columns, hotspot):
-    for key in data:
-        format = columns.get(key, {}).get("format", None)
-        format = hotspot.get(key, {}).get("format", format)
-        if format:
-            try:
-                data[key] = format_value(data[key], format)
-            except ValueError:
-                log.warning("Unable to format value {}, field {}, format {}".format(data[key], key, format))
-            except TypeError:
-                log.warning("Unable to format value {}, field {}, format {}".format(data[key], key, format))
-
-
-def extract_item_merge_header(columns):
-    header_list = []
-    for value in columns:
-        if 'from' in columns[value] and columns[value]['from'] == 'merge':
-            header_list.append(value + "_" +
-                               columns[value]['divider'].join(extract_item_merge_header(columns[value]['elements'])))
-        else:
-            header_list.append(value)
-    return header_list
-
-
-def add_columns(data, var, hotspot, columns, annotation_extractor, depth, levels):
-    """
-        print extra columns defined by a yaml file. Data from variant, hotspot or annotations
-    """
-    def add_data(data, column, c, depth, levels):
-        if column[c]['from'] == "merge":
-            # Used to merge two columns and combine using divider
-            divider = column[c]['divider']
-            temp_data = OrderedDict()
-            for key in column[c]['elements']:
-                add_data(temp_data, column[c]['elements'], key, depth, levels)
-            data[c] = divider.join([v for k, v in temp_data.items()])
-        elif column[c]['from'] == "select":
-            # From multiple column select the first one with data
-            temp_data = OrderedDict()
-            for key in column[c]['elements']:
-                add_data(temp_data, column[c]['elements'], key, depth, levels)
-            temp_data = [v for _, v in temp_data.items()]
-            select = column[c]['items'](temp_data)
-            if not isinstance(select, str):
-                select = column[c].get("divider", ":").join(select)
-            data[c] = "-"
-            condition = True
-            if 'condition' in column[c]:
-                condition = column[c]['condition'](temp_data)
-            if select is not None and select != '-' and condition:
-                data[c] = select
-            elif 'else' in column[c]:
-                select = column[c]['else'](temp_data)
-                if not isinstance(select, str):
-                    select = [v for v in select if v != "-"]
-                    if len(select) == 0:
-                        select = "-"
-                    else:
-                        select = column[c].get("divider", ":").join(select)
-                data[c] = select
-        elif column[c]['from'] == "vep":
-            try:
-                data[c] = annotation_extractor(var,  column[c]['field'])
-                if data[c] is None or data[c] == "":
-                    data[c] = '-'
-            except AttributeError:
-                data[c] = '-'
-            if "extract_regex" in column[c]:
-                data[c] = utils.regex_extract(data[c], column[c]['extract_regex'])
-        elif column[c]['from'] == "hotspot":
-            if hotspot is None:
-                data[c] = "-"
-            else:
-                data[c] = getattr(hotspot, column[c]['field'])
-        elif column[c]['from'] == "function":
-            function = getattr(utils, column[c]['name'])
-            variables = ()
-            if 'variables' in column[c]:
-                variables = []
-                for v in column[c]['variables']:
-                    variables.append(locals().get(v, v))
-                try:
-                    value = function(*variables)
-                except AttributeError:
-                    value = "-"
-            else:
-                value = function()
-            if 'column' in column[c]:
-                data[c] = value[column[c]['column']]
+        Returns:
+            OrderedDict, see merge_regions
+    """
+    def regions():
+        for hotspot in hotspots:
+            contig_id = contigs.get_id(hotspot.CHROMOSOME)
+            if coverage:
+                yield contig_id, hotspot.START - 1, hotspot.END
+            if hotspot.ALWAYS_PRINT:
+                yield contig_id, hotspot.EXTENDED_START - 1, hotspot.EXTENDED_END
             else:
-                if isinstance(value, tuple):
-                    value = ",".join(value)
-                data[c] = value
-            if data[c] is None:
-                data[c] = "-"
-        elif column[c]['from'] == 'variable':
-            data[c] = locals()[column[c]['field']]
-        else:
-            raise Exception("Undhandledd cased: " + column[c]['field'])
-        if "format" in column[c]:
+                for _, variants, _ in hotspot.iter_positions(False):
+                    for var in variants:
+                        yield contig_id, var.start, var.stop
+        for contig_id, var in other:
+            yield contig_id, var.start, var.stop
+    return merge_regions(regions(), distance)
+
+
+def get_coverage_header(levels):
+    return ['sample', 'chr', 'start', 'stop', 'gene', 'report', 'min_depth', 'mean_depth', 'median_depth'] + \
+           ["fraction_{}x".format(level) for level, _, _ in levels]
+
+
+def get_coverage_types(levels):
+    types = {'sample': 'category', 'chr': 'category', 'start': 'int', 'stop': 'int', 'report': 'category',
+             'min_depth': 'float', 'mean_depth': 'float', 'median_depth': 'float'}
+    types.update(("fraction_{}x".format(level), 'float') for level, _, _ in levels)
+    return types
+
+
+def build_coverage_rows(sample, levels, hotspots, depth_store, contigs):
+    """
+        Coverage summary of each hotspot region, from START to END: minimum, mean and median depth and the
+        fraction of positions with a depth at or above each of the depth levels.
+
+        Returns:
+            generator of (key, row), where key is the (report rank, index) of the hotspot
+    """
+    thresholds = [int(level) for level, _, _ in levels]
+    for key, hotspot in hotspots:
+        yield key, build_coverage_row(sample, hotspot, contigs.get_id(hotspot.CHROMOSOME), depth_store, thresholds)
+
+
+def build_coverage_row(sample, hotspot, contig_id, depth_store, thresholds):
+    minimum, mean, median, fractions = depth_store.get_coverage(contig_id, hotspot.START - 1, hotspot.END, thresholds)
+    row = [sample, hotspot.CHROMOSOME, str(hotspot.START), str(hotspot.END), hotspot.GENE, str(hotspot.REPORT),
+           str(minimum), "{:.2f}".format(mean), "{:.1f}".format(median)]
+    return row + ["{:.4f}".format(fraction) for fraction in fractions]
+
+
+def get_vep_fields(header):
+    for record in header.records:
+        if record.type == "INFO":
+            if record['ID'] == "CSQ":
+                return {v: c for c, v in enumerate(record['Description'].split("Format: ")[1].split('">')[0].split("|"))}
+    return {}
+
+
+def validate_variant(variant):
+    # ToDo make sure that empty variants are handled better!!!
+    if variant is None:
+        raise Exception("Empty allele found: " + str(variant))
+    if not len(variant.alts) == 1:
+        raise Exception("Multiple allele found: " + str(variant.alts))
+
+
+def fetch_contig(variant_file, contig=None, start=None, end=None):
+    """
+        Iterate over all records, or the records on contig, overlapping the 0-based start and end if given,
+        using the index. A contig missing from the file gives no records.
+    """
+    if contig is None:
+        return iter(variant_file)
+    if contig not in variant_file.header.contigs and contig not in variant_file.index:
+        return iter(())
+    return variant_file.fetch(contig, start, end)
+
+
+def fetch_regions(variant_file, regions):
+    """
+        Iterate over the records overlapping regions, using the index. Regions must be sorted and not overlap,
+        see get_hotspot_regions. A record overlapping several regions is only returned once and contigs
+        missing from the file give no records.
+    """
+    previous_contig = None
+    previous_end = 0
+    for contig, start, end in regions:
+        if not contig == previous_contig:
+            previous_contig, previous_end = contig, 0
+        for record in fetch_contig(variant_file, contig, start, end):
+            # records starting before the end of the previous region were returned by that region
+            if record.start >= previous_end:
+                yield record
+        previous_end = end
+
+
+def read_annotated_variants(variants, variants_wo_pick=None, contig=None, regions=None):
+    """
+        Single pass ingestion of vep annotated variants.
+
+        Yields (variant, variant_key, transcript) for every record that has a CSQ annotation, where
+        transcript is the Feature picked by vep. When a vcf annotated without --pick is provided, both
+        files are co-iterated with a merge-join on position and the records from the wo_pick file are
+        yielded instead, each together with the transcript picked for the same variant in the main vcf.
+        Both files must be coordinate sorted with the same contig order. If contig is set only records
+        on that contig are read, and if regions are given only records in the regions, using the index, see
+        fetch_regions.
+    """
+    vep_fields = get_vep_fields(variants.header)
+
+    def fetch(variant_file):
+        return fetch_contig(variant_file, contig) if regions is None else fetch_regions(variant_file, regions)
+
+    def picked_variants():
+        for variant in fetch(variants):
+            validate_variant(variant)
             try:
-                data[c] = format_value(data[c], column[c]["format"])
-            except ValueError:
-                log.debug("Unable to format value {}, field {}, format {}".format(data[c], c, column[c]["format"]))
-            except TypeError:
-                log.debug("Unable to format value {}, field {}, format {}".format(data[c], c, column[c]["format"]))
-
-    for c in columns['columns']:
-        if 'from' in columns['columns'][c]:
-            add_data(data, columns['columns'], c, depth, levels)
+                transcript = variant.info['CSQ'][0].split("|")[vep_fields['Feature']]
+            except KeyError:
+                continue
+            yield variant, utils.get_variant_key(variant), transcript
+
+    if variants_wo_pick is None:
+        yield from picked_variants()
+        return
+
+    contig_rank = {contig: rank for rank, contig in enumerate(variants.header.contigs)}
+
+    def position(variant):
+        return (contig_rank.setdefault(variant.chrom, len(contig_rank)), variant.start)
+
+    def sorted_picked_variants():
+        last_position = None
+        for variant, variant_key, transcript in picked_variants():
+            current = position(variant)
+            if last_position is not None and current < last_position:
+                raise Exception("Vcf file isn't sorted: {}:{}".format(variant.chrom, variant.pos))
+            last_position = current
+            yield current, variant_key, transcript
+
+    picked = sorted_picked_variants()
+    pending = next(picked, None)
+    transcripts = {}
+    transcripts_position = None
+    for variant in fetch(variants_wo_pick):
+        validate_variant(variant)
+        current = position(variant)
+        if current != transcripts_position:
+            if transcripts_position is not None and current < transcripts_position:
+                raise Exception("Vcf file isn't sorted: {}:{}".format(variant.chrom, variant.pos))
+            transcripts = {}
+            transcripts_position = current
+            while pending is not None and pending[0] <= current:
+                if pending[0] == current:
+                    transcripts[pending[1]] = pending[2]
+                pending = next(picked, None)
+        variant_key = utils.get_variant_key(variant)
+        if variant_key in transcripts:
+            yield variant, variant_key, transcripts[variant_key]
+    # validate the remaining records of the main vcf
+    for _ in picked:
+        pass
@@ -0,0 +1,374 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import gc
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pysam
+import yaml
+
+from hydra_genetics.utils.io.hotspot_report import build_hotspot_report, build_matched_rows, get_keyed_report, \
+    get_report_hotspots, load_report_inputs, match_report_variants, write_report_files
+
+log = logging.getLogger()
+
+# report modes that can be benchmarked, see get_report_phases
+BENCHMARK_MODES = ("serial", "streaming", "parallel", "hotspot-only", "format-row")
+
+BENCHMARK_LEVELS = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not_analyzable")]
+
+BENCHMARK_SAMPLE = "sample1"
+
+# vep fields always present in the generated annotation, additional fields are named Extra_<n>
+BENCHMARK_VEP_FIELDS = ("Allele", "Consequence", "IMPACT", "SYMBOL", "Gene", "Feature_type", "Feature", "BIOTYPE", "EXON",
+                        "INTRON", "HGVSc", "HGVSp")
+
+BENCHMARK_CONTIGS = ["chr{}".format(i) for i in range(1, 23)]
+
+BENCHMARK_CONTIG_LENGTH = 2000000
+
+# length of the generated region hotspots
+BENCHMARK_REGION_LENGTH = 150
+
+
+def write_benchmark_inputs(directory, hotspots, variants, gvcf_records, vep_columns, seed=1):
+    """
+        Write a synthetic sample, with hotspot, chr mapping and column yaml files, for benchmarking hotspot
+        reports. The hotspots, of all report classes, and the variants are spread over 22 contigs, half of the
+        hotspots have a variant and the remaining variants are placed at random. The gvcf has reference blocks
+        covering the contigs and every variant has two annotated transcripts. All vep fields are report
+        columns. The same sizes and seed give the same files.
+
+        Parameters:
+            directory (string): created if missing
+            hotspots (int): number of hotspots
+            variants (int): number of vcf records
+            gvcf_records (int): number of gvcf records, rounded to a multiple of the number of contigs
+            vep_columns (int): number of vep fields, at least len(BENCHMARK_VEP_FIELDS)
+
+        Returns:
+            dict: paths of the 'hotspot_file', 'chr_mapping', 'column_yaml_file', 'vcf_file' and 'gvcf_file'
+    """
+    if vep_columns < len(BENCHMARK_VEP_FIELDS):
+        raise ValueError("At least {} vep columns are generated, got {}".format(len(BENCHMARK_VEP_FIELDS), vep_columns))
+    per_contig = -(-hotspots // len(BENCHMARK_CONTIGS))
+    spacing = (BENCHMARK_CONTIG_LENGTH - 20000) // max(per_contig, 1)
+    if spacing <= 2 * BENCHMARK_REGION_LENGTH:
+        raise ValueError("Too many hotspots for the benchmark contigs: {}".format(hotspots))
+    if variants > len(BENCHMARK_CONTIGS) * (BENCHMARK_CONTIG_LENGTH - 20000) // 2:
+        raise ValueError("Too many variants for the benchmark contigs: {}".format(variants))
+    os.makedirs(directory, exist_ok=True)
+    generator = random.Random(seed)
+    fields = list(BENCHMARK_VEP_FIELDS) + ["Extra_{}".format(i) for i in range(1, vep_columns - len(BENCHMARK_VEP_FIELDS) + 1)]
+    file_names = {'hotspot_file': "hotspots.tsv", 'chr_mapping': "chr_mapping.tsv", 'column_yaml_file': "columns.yaml",
+                  'vcf_file': "sample.vcf", 'gvcf_file': "sample.g.vcf"}
+    paths = {name: os.path.join(directory, file_name) for name, file_name in file_names.items()}
+
+    with open(paths['chr_mapping'], "w") as mapping:
+        mapping.write("#Chr name\tNC\tID\tLength\n")
+        for i, contig in enumerate(BENCHMARK_CONTIGS, 1):
+            mapping.write("{}\tNC_0000{:02d}.10\t{}\t{}\n".format(contig, i, contig, BENCHMARK_CONTIG_LENGTH))
+
+    positions = {contig: set() for contig in BENCHMARK_CONTIGS}
+    with open(paths['hotspot_file'], "w") as hotspot_file:
+        hotspot_file.write("#Chr\tStart\tEnd\tGene\tCDS_mutation_syntax\tAA_mutation_syntax\tReport\tcomment\tExon\t"
+                           "Accession_number\n")
+        for i in range(hotspots):
+            contig_index, j = i % len(BENCHMARK_CONTIGS), i // len(BENCHMARK_CONTIGS)
+            report = ["hotspot", "region_all", "region", "indel"][j % 4]
+            start = 10000 + j * spacing
+            end = start if report == "hotspot" else start + BENCHMARK_REGION_LENGTH
+            hotspot_file.write("NC_0000{:02d}.10\t{}\t{}\tGENE{}\tc.{}A>T\tp.K{}N\t{}\t-\texon{}\tNM_{}\n".format(
+                contig_index + 1, start, end, j, j, j, report, j % 20 + 1, i))
+            if generator.random() < 0.5 and sum(len(contig) for contig in positions.values()) < variants:
+                positions[BENCHMARK_CONTIGS[contig_index]].add(generator.randint(start, end))
+    remaining = variants - sum(len(contig) for contig in positions.values())
+    for i, contig in enumerate(BENCHMARK_CONTIGS):
+        count = remaining // len(BENCHMARK_CONTIGS) + (1 if i < remaining % len(BENCHMARK_CONTIGS) else 0)
+        target = len(positions[contig]) + count
+        while len(positions[contig]) < target:
+            positions[contig].add(generator.randrange(5000, BENCHMARK_CONTIG_LENGTH - 5000))
+
+    header = ["##fileformat=VCFv4.2"]
+    header += ["##contig=<ID={},length={}>".format(contig, BENCHMARK_CONTIG_LENGTH) for contig in BENCHMARK_CONTIGS]
+    header += ['##INFO=<ID=CALLERS,Number=.,Type=String,Description="Callers">',
+               '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. '
+               'Format: {}">'.format("|".join(fields)),
+               '##INFO=<ID=END,Number=1,Type=Integer,Description="End of the reference block">',
+               '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+               '##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allelic depths">',
+               '##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read depth">',
+               "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t{}".format(BENCHMARK_SAMPLE)]
+
+    with open(paths['vcf_file'], "w") as vcf:
+        vcf.write("\n".join(header) + "\n")
+        for contig in BENCHMARK_CONTIGS:
+            for position in sorted(positions[contig]):
+                kind = generator.random()
+                ref, alt = ("A", "T") if kind < 0.8 else ("A", "AGT") if kind < 0.9 else ("ACGT", "A")
+                values = {'Allele': alt, 'Consequence': "missense_variant", 'IMPACT': "MODERATE", 'SYMBOL': "GENE",
+                          'Gene': "1", 'Feature_type': "Transcript", 'BIOTYPE': "protein_coding", 'EXON': "2/10", 'INTRON': "",
+                          'HGVSc': "c.{}A>T".format(position), 'HGVSp': "p.K{}N".format(position)}
+                transcripts = []
+                for transcript in range(2):
+                    values['Feature'] = "NM_{}.{}".format(position % 1000, transcript)
+                    transcripts.append("|".join(values.get(field, "{}_{}".format(field, transcript)) for field in fields))
+                csq = ",".join(transcripts)
+                depth = generator.randint(20, 600)
+                alt_depth = generator.randint(1, depth)
+                vcf.write("{}\t{}\t.\t{}\t{}\t50\tPASS\tCALLERS=vardict,gatk_mutect2;CSQ={}\tGT:AD:DP\t0/1:{},{}:{}\n".format(
+                    contig, position, ref, alt, csq, depth - alt_depth, alt_depth, depth))
+    pysam.tabix_index(paths['vcf_file'], preset="vcf", force=True)
+    paths['vcf_file'] += ".gz"
+
+    blocks = max(gvcf_records // len(BENCHMARK_CONTIGS), 1)
+    block_length = -(-BENCHMARK_CONTIG_LENGTH // blocks)
+    with open(paths['gvcf_file'], "w") as gvcf:
+        gvcf.write("\n".join(header) + "\n")
+        for contig in BENCHMARK_CONTIGS:
+            for start in range(1, BENCHMARK_CONTIG_LENGTH + 1, block_length):
+                gvcf.write("{}\t{}\t.\tA\t<NON_REF>\t.\t.\tEND={}\tGT:DP\t0/0:{}\n".format(
+                    contig, start, min(start + block_length - 1, BENCHMARK_CONTIG_LENGTH), generator.randint(10, 800)))
+    pysam.tabix_index(paths['gvcf_file'], preset="vcf", force=True)
+    paths['gvcf_file'] += ".gz"
+
+    columns = {'Analyzable': {'from': 'function', 'name': "get_read_level", 'variables': ['levels', 'depth'], 'column': 1},
+               'Min_read_depth300': {'from': 'function', 'name': "get_read_level", 'variables': ['levels', 'depth'], 'column': 0},
+               'Callers': {'from': 'function', 'name': "get_annotation_data_info", 'variables': ['var', 'CALLERS']},
+               'Comment': {'from': 'hotspot', 'field': "COMMENT"}}
+    columns.update(("vep_{}".format(field), {'from': 'vep', 'field': field}) for field in fields)
+    with open(paths['column_yaml_file'], "w") as column_yaml:
+        yaml.dump({'columns': columns}, column_yaml, sort_keys=False)
+    return paths
+
+
+def get_report_phases(inputs, output, coverage_output, mode="serial", threads=1, processes=2):
+    """
+        Phases generating a hotspot report from benchmark inputs, see write_benchmark_inputs, in the given mode,
+        one of BENCHMARK_MODES:
+
+        - load_inputs: parse the hotspot, chr mapping and column yaml files, see load_report_inputs
+        - match_variants: match the variants against the hotspots, in the serial, hotspot-only and format-row
+          modes, see match_report_variants
+        - load_depth: load the depth of the hotspots and variants, in the serial, hotspot-only and format-row
+          modes, see build_matched_rows. The format-row mode also collects the values of every row
+        - format_row: format the collected rows with the column plan, see ColumnPlan.format_row, in the
+          format-row mode, which otherwise generates the serial report
+        - build: match the variants and load the depth, in the parallel and streaming modes where they are
+          interleaved, per contig process or along the sweep, and format the rows, streaming spooling them to
+          temporary files
+        - write: format the rows in the serial and hotspot-only modes, and write the report and coverage files
+
+        Returns:
+            list: (name, function) for each phase, in the order they are run
+    """
+    if mode not in BENCHMARK_MODES:
+        raise ValueError("Unknown benchmark mode {}, expected one of: {}".format(mode, ", ".join(BENCHMARK_MODES)))
+    state = {}
+
+    def load_inputs():
+        state['inputs'] = load_report_inputs(inputs['hotspot_file'], inputs['chr_mapping'], inputs['column_yaml_file'])
+
+    def match_variants():
+        reports, chr_translater, _ = state['inputs']
+        state['matched'] = match_report_variants(reports, get_report_hotspots(reports), inputs['vcf_file'], chr_translater,
+                                                 threads=threads, hotspot_only=mode == "hotspot-only")
+
+    def load_depth():
+        reports, _, plan = state['inputs']
+        coverage_rows = []
+        if mode == "format-row":
+            plan = _RowCollector(plan)
+        rows = build_matched_rows(BENCHMARK_SAMPLE, BENCHMARK_LEVELS, reports, state.pop('matched'), inputs['gvcf_file'],
+                                  plan, coverage_rows, threads)
+        if mode == "format-row":
+            state['keys'] = [key for key, _ in rows]
+            state['collected'] = plan.rows
+            state['coverage_rows'] = coverage_rows
+        else:
+            state['report'] = get_keyed_report(plan, BENCHMARK_LEVELS, rows, coverage_rows)
+
+    def format_row():
+        plan = state['inputs'][2]
+        rows = [plan.format_row(*row) for row in state.pop('collected')]
+        state['report'] = get_keyed_report(plan, BENCHMARK_LEVELS, zip(state.pop('keys'), rows), state.pop('coverage_rows'))
+
+    def build():
+        state['report'] = build_hotspot_report(BENCHMARK_SAMPLE, BENCHMARK_LEVELS, inputs['hotspot_file'], inputs['vcf_file'],
+                                               inputs['gvcf_file'], inputs['chr_mapping'],
+                                               column_yaml_file=inputs['column_yaml_file'],
+                                               processes=processes if mode == "parallel" else 1, coverage=True,
+                                               streaming=mode == "streaming", threads=threads,
+                                               hotspot_only=mode == "hotspot-only", report_inputs=state['inputs'])
+
+    def write():
+        write_report_files(state.pop('report'), output, coverage_output)
+
+    if mode in ("streaming", "parallel"):
+        return [("load_inputs", load_inputs), ("build", build), ("write", write)]
+    if mode == "format-row":
+        return [("load_inputs", load_inputs), ("match_variants", match_variants), ("load_depth", load_depth),
+                ("format_row", format_row), ("write", write)]
+    return [("load_inputs", load_inputs), ("match_variants", match_variants), ("load_depth", load_depth), ("write", write)]
+
+
+class _RowCollector(object):
+    """
+        Column plan collecting the values given to format_row instead of formatting them, so the formatting
+        can be timed on its own.
+    """
+    def __init__(self, plan):
+        self.plan = plan
+        self.rows = []
+
+    def __getattr__(self, name):
+        return getattr(self.plan, name)
+
+    def format_row(self, *row):
+        self.rows.append(row)
+        return None
+
+
+def measure_phases(phases, memory=False):
+    """
+        Run the phases and measure them. With memory the python memory allocations are traced, which slows the
+        phases down, so the wall time and the peak memory should come from different runs.
+
+        Returns:
+            list: (name, wall time in seconds, peak size in bytes of the memory allocated by the phase, on top of
+                the memory in use when it started, or None without memory) for each phase
+    """
+    results = []
+    for name, phase in phases:
+        gc.collect()
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            phase()
+            wall_time = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1] if memory else None
+        finally:
+            if memory:
+                tracemalloc.stop()
+        results.append((name, wall_time, peak_memory))
+    return results
+
+
+def run_report_benchmark(inputs, directory, mode="serial", threads=1, processes=2, repeat=3, memory=True, name=None):
+    """
+        Benchmark the report of benchmark inputs, see write_benchmark_inputs, in a mode. The phases, see
+        get_report_phases, are timed repeat times, and their memory measured by an additional run if memory
+        is set. Only the memory of this process is traced, not the memory of the htslib buffers or, in parallel
+        mode, of the worker processes. name is added to the report file names.
+
+        Returns:
+            dict: the mode, threads, processes, number of report and coverage rows, total wall time, the fastest
+                run, and per phase the wall time of the fastest run and per report row, the wall time of each run
+                and the peak memory, in bytes
+    """
+    suffix = "{}.t{}.tsv".format(mode, threads) if name is None else "{}.{}.t{}.tsv".format(name, mode, threads)
+    output = os.path.join(directory, "report." + suffix)
+    coverage_output = os.path.join(directory, "coverage." + suffix)
+    runs = [measure_phases(get_report_phases(inputs, output, coverage_output, mode, threads, processes))
+            for _ in range(repeat)]
+    peaks = None
+    if memory:
+        phases = get_report_phases(inputs, output, coverage_output, mode, threads, processes)
+        peaks = [peak for _, _, peak in measure_phases(phases, True)]
+    report_rows = count_rows(output)
+    phases = []
+    for i, (phase, _, _) in enumerate(runs[0]):
+        wall_times = [run[i][1] for run in runs]
+        phases.append({'phase': phase, 'wall_time': min(wall_times),
+                       'wall_time_per_row': min(wall_times) / report_rows if report_rows else None,
+                       'wall_times': wall_times, 'peak_memory': None if peaks is None else peaks[i]})
+    return {'mode': mode,
+            'threads': threads,
+            'processes': processes if mode == "parallel" else 1,
+            'report_rows': report_rows,
+            'coverage_rows': count_rows(coverage_output),
+            'wall_time': min(sum(wall_time for _, wall_time, _ in run) for run in runs),
+            'phases': phases}
+
+
+def count_rows(report_file):
+    with open(report_file) as report:
+        return sum(1 for _ in report) - 1
+
+
+def get_benchmark_environment():
+    from hydra_genetics import __version__
+    return {'hydra_genetics': __version__,
+            'python': platform.python_version(),
+            'pysam': pysam.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()}
+
+
+def run_benchmarks(output, hotspots=(1000,), variants=(10000,), gvcf_records=(100000,), vep_columns=(12,),
+                   modes=BENCHMARK_MODES, threads=(1,), processes=2, repeat=3, memory=True, work_dir=None, seed=1,
+                   column_yaml_files=(None,)):
+    """
+        Benchmark hotspot reports of synthetic samples, for every combination of the input sizes, column yaml
+        files, modes and threads, see write_benchmark_inputs and run_report_benchmark. Each result is written as soon as it is
+        measured, as a json object on one line, with the input sizes and the environment, so results of
+        different releases can be compared.
+
+        Parameters:
+            output (string): json lines file, appended to if it exists
+            hotspots, variants, gvcf_records, vep_columns (list): input sizes
+            modes (list): report modes, see BENCHMARK_MODES
+            threads (list): htslib threads, see open_variant_file
+            processes (int): processes used in parallel mode
+            work_dir (string): directory where the inputs and reports are kept, a temporary directory removed
+                afterwards if None. Existing inputs generated with the same sizes and seed are reused.
+            column_yaml_files (list): yaml files defining the report columns, None for the generated one reporting
+                all vep fields
+
+        Returns:
+            list: the results
+    """
+    environment = get_benchmark_environment()
+    directory = tempfile.mkdtemp(prefix="hotspot_report_benchmark_") if work_dir is None else work_dir
+    results = []
+    try:
+        with open(output, "a") as result_file:
+            for sizes in itertools.product(hotspots, variants, gvcf_records, vep_columns):
+                case = dict(zip(('hotspots', 'variants', 'gvcf_records', 'vep_columns'), sizes))
+                case_directory = os.path.join(directory, "h{}_v{}_g{}_c{}_s{}".format(*sizes, seed))
+                done_file = os.path.join(case_directory, "inputs.json")
+                if os.path.exists(done_file):
+                    with open(done_file) as done:
+                        inputs = json.load(done)
+                else:
+                    log.info("Generating benchmark inputs: {}".format(case))
+                    inputs = write_benchmark_inputs(case_directory, *sizes, seed=seed)
+                    with open(done_file, "w") as done:
+                        json.dump(inputs, done)
+                for column_yaml_file, mode, thread_count in itertools.product(column_yaml_files, modes, threads):
+                    log.info("Benchmarking {} report with {} threads: {}".format(mode, thread_count, case))
+                    report_inputs, name = inputs, None
+                    if column_yaml_file is not None:
+                        report_inputs = dict(inputs, column_yaml_file=os.path.abspath(column_yaml_file))
+                        name = os.path.splitext(os.path.basename(column_yaml_file))[0]
+                    result = {'benchmark': "hotspot_report", 'seed': seed, **case, 'column_yaml_file': column_yaml_file,
+                              **run_report_benchmark(report_inputs, case_directory, mode, thread_count, processes, repeat,
+                                                     memory, name),
+                              'environment': environment}
+                    result_file.write(json.dumps(result) + "\n")
+                    result_file.flush()
+                    results.append(result)
+    finally:
+        if work_dir is None:
+            shutil.rmtree(directory)
+    return results
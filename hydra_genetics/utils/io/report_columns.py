@@ -0,0 +1,316 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import builtins
+import logging
+import re
+
+from hydra_genetics.utils.io import utils
+
+import yaml
+
+log = logging.getLogger()
+
+HOTSPOT_COLUMNS = ('sample', 'chr', 'start', 'stop', 'ref', 'alt', 'report', 'gvcf_depth', 'ref_depth', 'alt_depth')
+
+# value types of default columns in columnar outputs, see HotspotReport, other columns are strings
+HOTSPOT_COLUMN_TYPES = {'sample': 'category', 'chr': 'category', 'start': 'int', 'stop': 'int', 'report': 'category',
+                        'gvcf_depth': 'float', 'ref_depth': 'int'}
+
+# values that a 'function' or 'variable' column can refer to by name, in the order they are passed to a column
+ROW_VARIABLES = ('data', 'var', 'hotspot', 'annotation_extractor', 'depth', 'levels')
+
+
+def format_value(value, format):
+    if format[0] == "replace":
+        return value.replace(format[1], format[2])
+    elif format[0] == "string":
+        if len(format) == 3:
+            value = getattr(builtins, format[2])(value)
+        else:
+            value = float(value)
+        return format[1].format(value)
+    else:
+        raise Exception("Unknown format value: " + format)
+
+
+def compile_format(format):
+    """
+        Pre-build a formatter, behaving as format_value, for a format definition.
+    """
+    if format[0] == "replace":
+        old, new = format[1], format[2]
+        return lambda value: value.replace(old, new)
+    elif format[0] == "string":
+        converter = getattr(builtins, format[2]) if len(format) == 3 else float
+        formatter = format[1].format
+        return lambda value: formatter(converter(value))
+    else:
+        log.warning("Unknown format value: {}".format(format))
+        return lambda value: value
+
+
+def extract_item_merge_header(columns):
+    header_list = []
+    for value in columns:
+        if 'from' in columns[value] and columns[value]['from'] == 'merge':
+            header_list.append(value + "_" +
+                               columns[value]['divider'].join(extract_item_merge_header(columns[value]['elements'])))
+        else:
+            header_list.append(value)
+    return header_list
+
+
+def convert_list_slice(info):
+    if len(info) < 3:
+        raise SyntaxError(f"Invalid syntax: {info}")
+    if info.startswith("[") and info.endswith("]"):
+        info = info[1:-1].split(":")
+        if len(info) == 1:
+            return lambda data: data[int(info[0])]
+        elif len(info) == 2:
+            value0 = int(info[0]) if len(info[0]) > 0 else None
+            value1 = int(info[1]) if len(info[1]) > 0 else None
+            return lambda data: data[value0:value1]
+        elif len(info) == 3:
+            value0 = int(info[0]) if len(info[0]) > 0 else None
+            value1 = int(info[1]) if len(info[1]) > 0 else None
+            value2 = int(info[2]) if len(info[2]) > 0 else None
+            return lambda data: data[value0:value1:value2]
+        else:
+            raise SyntaxError(f"Invalid syntax: {info}, invalid number of elements inside '[]'")
+    else:
+        raise SyntaxError(f"Invalid syntax: {info}, missing bracket '[]'")
+
+
+def select_condition(items, empty):
+    items = convert_list_slice(items)
+
+    def func(data):
+        values = items(data)
+        if isinstance(values, str):
+            return (values == "-") == empty
+        else:
+            return (len([v for _, v in values.items() if v != "-"]) == 0) == empty
+    return func
+
+
+class ColumnPlan(object):
+    """
+        Report columns defined by a column yaml file, compiled once into pre-bound callables.
+
+        Functions are resolved, regexes compiled and formatters built when the plan is created, so formatting
+        a row is a flat sequence of calls. The plan doesn't depend on the sample and can be shared between
+        reports.
+
+        Parameters:
+            column_yaml_file (string): path to yaml file with a 'columns' entry, None gives the default columns
+    """
+    def __init__(self, column_yaml_file=None):
+        definitions = {}
+        if column_yaml_file is not None:
+            log.info("Process yaml for: {}".format(column_yaml_file))
+            with open(column_yaml_file) as file:
+                definitions = yaml.load(file, Loader=yaml.FullLoader).get('columns', None) or {}
+        self.column_yaml_file = column_yaml_file
+
+        self.depth_field = definitions.get('gvcf_depth', {}).get('field', 'DP')
+        # filters used when the depth is computed from a bam file
+        self.min_base_quality = definitions.get('gvcf_depth', {}).get('min_base_quality', 13)
+        self.min_mapping_quality = definitions.get('gvcf_depth', {}).get('min_mapping_quality', 0)
+
+        # default columns that aren't hidden or ordered are printed after the ordered columns, these are
+        # the only columns where a format is applied to the default value
+        default_columns = [name for name in HOTSPOT_COLUMNS
+                           if definitions.get(name, {}).get('visible', 1) != 0 and 'order' not in definitions.get(name, {})]
+        self._default_formats = [(name, compile_format(definitions[name]['format']), definitions[name]['format'])
+                                 for name in default_columns if definitions.get(name, {}).get('format', None)]
+
+        output = []
+        biggest_order = -1
+        for name, definition in definitions.items():
+            if 'order' in definition:
+                output.append((definition['order'], name, self._header_name(name, definition)))
+                biggest_order = max(biggest_order, definition['order'])
+        for name in default_columns:
+            biggest_order += 1
+            output.append((biggest_order, name, name))
+        self._columns = []
+        for name, definition in definitions.items():
+            if name in default_columns:
+                continue
+            visible = 'order' in definition or definition.get('visible', 1) != 0
+            if 'order' not in definition and visible:
+                biggest_order += 1
+                output.append((biggest_order, name, self._header_name(name, definition)))
+            if 'from' in definition and visible:
+                self._columns.append((name, self._compile(name, definition, definitions)))
+        output = sorted(output, key=lambda column: column[0])
+        self.header = [column[2] for column in output]
+        self._output = [column[1] for column in output]
+        # formatted default columns, and yaml columns replacing them, are kept as strings
+        formatted = set(name for name, _, _ in self._default_formats)
+        self.types = {name: HOTSPOT_COLUMN_TYPES[name] for name in self._output
+                      if name in HOTSPOT_COLUMN_TYPES and name not in formatted and 'from' not in definitions.get(name, {})}
+
+    def _header_name(self, name, definition):
+        if definition.get('from', None) == 'merge':
+            return name + "_" + definition['divider'].join(extract_item_merge_header(definition['elements']))
+        return name
+
+    def _compile(self, name, definition, parent):
+        source = definition['from']
+        if source == "merge":
+            getter = self._compile_merge(definition)
+        elif source == "select":
+            getter = self._compile_select(definition)
+        elif source == "vep":
+            getter = self._compile_vep(definition)
+        elif source == "hotspot":
+            field = definition['field']
+
+            def getter(data, var, hotspot, annotation_extractor, depth, levels):
+                if hotspot is None:
+                    return "-"
+                return getattr(hotspot, field)
+        elif source == "function":
+            getter = self._compile_function(name, definition, parent)
+        elif source == 'variable':
+            variable = self._compile_variable(definition['field'], {'c': name, 'column': parent}, strict=True)
+
+            def getter(*row):
+                return variable(row)
+        else:
+            raise Exception("Undhandledd cased: " + definition['field'])
+
+        if "format" in definition:
+            formatter = compile_format(definition['format'])
+            unformatted = getter
+
+            def getter(*row):
+                value = unformatted(*row)
+                try:
+                    return formatter(value)
+                except (ValueError, TypeError):
+                    log.debug("Unable to format value {}, field {}, format {}".format(value, name, definition["format"]))
+                    return value
+        return getter
+
+    def _compile_elements(self, definition):
+        elements = definition['elements']
+        return [(key, self._compile(key, elements[key], elements)) for key in elements]
+
+    def _compile_merge(self, definition):
+        elements = self._compile_elements(definition)
+        divider = definition['divider']
+
+        def getter(data, var, hotspot, annotation_extractor, depth, levels):
+            temp_data = {}
+            for key, element in elements:
+                temp_data[key] = element(temp_data, var, hotspot, annotation_extractor, depth, levels)
+            return divider.join(temp_data.values())
+        return getter
+
+    def _compile_select(self, definition):
+        elements = self._compile_elements(definition)
+        divider = definition.get("divider", ":")
+        items = convert_list_slice(definition['items'])
+        other = convert_list_slice(definition['else']) if 'else' in definition else None
+        condition = None
+        if 'condition' in definition:
+            condition = select_condition(definition['condition']['items'], definition['condition'].get("empty", True))
+
+        def getter(data, var, hotspot, annotation_extractor, depth, levels):
+            temp_data = {}
+            for key, element in elements:
+                temp_data[key] = element(temp_data, var, hotspot, annotation_extractor, depth, levels)
+            values = list(temp_data.values())
+            select = items(values)
+            if not isinstance(select, str):
+                select = divider.join(select)
+            if select is not None and select != '-' and (condition is None or condition(values)):
+                return select
+            elif other is not None:
+                select = other(values)
+                if not isinstance(select, str):
+                    select = [v for v in select if v != "-"]
+                    if len(select) == 0:
+                        select = "-"
+                    else:
+                        select = divider.join(select)
+                return select
+            return "-"
+        return getter
+
+    def _compile_vep(self, definition):
+        field = definition['field']
+        regex = re.compile(definition['extract_regex']) if "extract_regex" in definition else None
+
+        def getter(data, var, hotspot, annotation_extractor, depth, levels):
+            try:
+                value = annotation_extractor(var, field)
+                if value is None or value == "":
+                    value = '-'
+            except AttributeError:
+                value = '-'
+            if regex is not None:
+                search_result = regex.search(value)
+                return "-" if search_result is None else search_result[1]
+            return value
+        return getter
+
+    def _compile_function(self, name, definition, parent):
+        function = getattr(utils, definition['name'])
+        column = definition.get('column', None)
+        if 'variables' in definition:
+            constants = {'c': name, 'column': parent, 'function': function}
+            variables = [self._compile_variable(v, constants) for v in definition['variables']]
+
+            def call(row):
+                try:
+                    return function(*[variable(row) for variable in variables])
+                except AttributeError:
+                    return "-"
+        else:
+            def call(row):
+                return function()
+
+        def getter(*row):
+            value = call(row)
+            if column is not None:
+                value = value[column]
+            elif isinstance(value, tuple):
+                value = ",".join(value)
+            if value is None:
+                value = "-"
+            return value
+        return getter
+
+    def _compile_variable(self, variable, constants, strict=False):
+        """
+            Resolve a variable name to a function returning its value for a row. Names that don't refer to a
+            row value or a constant are passed on as strings, unless strict is set.
+        """
+        if variable in ROW_VARIABLES:
+            index = ROW_VARIABLES.index(variable)
+            return lambda row: row[index]
+        if variable in constants:
+            value = constants[variable]
+        elif strict:
+            raise KeyError(variable)
+        else:
+            value = variable
+        return lambda row: value
+
+    def format_row(self, data, var, hotspot, annotation_extractor, depth, levels):
+        """
+            Format default column values in data, add all yaml defined columns and return the printed values.
+        """
+        for key, formatter, format in self._default_formats:
+            try:
+                data[key] = formatter(data[key])
+            except (ValueError, TypeError):
+                log.warning("Unable to format value {}, field {}, format {}".format(data[key], key, format))
+        for name, getter in self._columns:
+            data[name] = getter(data, var, hotspot, annotation_extractor, depth, levels)
+        return [str(data[key]) for key in self._output]
@@ -0,0 +1,205 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import json
+import logging
+import os
+import socket
+import socketserver
+
+from hydra_genetics.exceptions import ReportWorkerError
+
+# only the standard library is imported here, the report modules are imported when a report is generated, so a
+# client handing its report to a running worker starts quickly
+
+log = logging.getLogger()
+
+# environment variable with the socket of the report worker used by clients
+SOCKET_ENV = "HYDRA_GENETICS_REPORT_WORKER"
+
+# generate_hotspot_report arguments that are paths, made absolute by the client since the worker can run in
+# another directory
+PATH_ARGUMENTS = ('output', 'hotspot_file', 'vcf_file', 'gvcf_file', 'chr_mapping', 'vcf_file_wo_pick', 'column_yaml_file',
+                  'coverage_output', 'bam_file', 'reference_file', 'regions_file')
+
+
+class ReportWorker(socketserver.UnixStreamServer):
+    """
+        Long-lived process generating hotspot reports with the hotspots, chr mapping and column plan loaded once,
+        instead of once per report.
+
+        Clients connect to the unix socket and send one request per connection, a json object on a single
+        line, and get a json object with the status as reply, see submit_hotspot_report. Requests are handled one
+        at a time. Reports for other hotspot, chr mapping or column yaml files than the ones loaded by the worker
+        are refused, and generated by the client itself. The loaded files are read again when they are modified.
+
+        Parameters:
+            socket_path (string): path of the unix socket, a socket left by a worker that is no longer running
+                is replaced
+            hotspot_file (string): path to hotspot file, '-' for none
+            chr_mapping (string): path to file mapping chr to NC names
+            column_yaml_file (string): path to yaml file defining the report columns
+            hotspot_cache (HotspotCache): cache used to load the parsed hotspot file
+    """
+    def __init__(self, socket_path, hotspot_file, chr_mapping, column_yaml_file=None, hotspot_cache=None):
+        self.socket_path = socket_path
+        self.files = get_absolute_paths({'hotspot_file': hotspot_file,
+                                         'chr_mapping': chr_mapping,
+                                         'column_yaml_file': column_yaml_file})
+        self.hotspot_cache = hotspot_cache
+        self.inputs = None
+        self.stamps = None
+        self.stopping = False
+        self.load()
+        if os.path.exists(socket_path):
+            if is_worker_running(socket_path):
+                raise ReportWorkerError("A report worker is already listening on {}".format(socket_path))
+            os.remove(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+    def get_stamps(self):
+        return [(os.stat(path).st_mtime_ns, os.stat(path).st_size) if path not in (None, "-") else None
+                for path in self.files.values()]
+
+    def load(self):
+        from hydra_genetics.utils.io.hotspot_report import load_report_inputs
+        # stamps taken before reading, and only kept once loaded, so files that fail to load are read again
+        stamps = self.get_stamps()
+        self.inputs = load_report_inputs(self.files['hotspot_file'], self.files['chr_mapping'],
+                                         self.files['column_yaml_file'], self.hotspot_cache)
+        self.stamps = stamps
+        log.info("Loaded report inputs: {}".format(", ".join(str(path) for path in self.files.values())))
+
+    def serve(self):
+        """
+            Handle requests until a stop request is received, the socket is removed when the worker stops.
+        """
+        log.info("Report worker listening on {}".format(self.socket_path))
+        try:
+            while not self.stopping:
+                self.handle_request()
+        finally:
+            self.server_close()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def handle_command(self, request):
+        """
+            Reply to a request: 'report' generates a report, 'ping' checks that the worker is running and 'stop'
+            stops the worker after the reply.
+        """
+        command = request.get('command', None)
+        if command == 'ping':
+            return {'status': 'ok', 'pid': os.getpid()}
+        if command == 'stop':
+            self.stopping = True
+            return {'status': 'ok'}
+        if command == 'report':
+            return self.generate(request['arguments'])
+        return {'status': 'error', 'message': "Unknown command: {}".format(command)}
+
+    def generate(self, arguments):
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        arguments = get_absolute_paths(arguments)
+        if not {name: arguments.get(name, None) for name in self.files} == self.files:
+            return {'status': 'unsupported', 'message': "Worker has loaded other files: {}".format(
+                ", ".join(str(path) for path in self.files.values()))}
+        if not self.get_stamps() == self.stamps:
+            self.load()
+        arguments['levels'] = [tuple(level) for level in arguments['levels']]
+        log.info("Generating hotspot report for {}: {}".format(arguments['sample'], arguments['output']))
+        generate_hotspot_report(report_inputs=self.inputs, **arguments)
+        return {'status': 'ok'}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            reply = self.server.handle_command(json.loads(self.rfile.readline()))
+        # SystemExit too, a failed request must not stop the worker
+        except (Exception, SystemExit) as e:
+            log.exception("Report request failed")
+            reply = {'status': 'error', 'message': "{}: {}".format(type(e).__name__, e)}
+        self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+def get_absolute_paths(arguments):
+    return {name: os.path.abspath(value) if name in PATH_ARGUMENTS and value not in (None, "-") else value
+            for name, value in arguments.items()}
+
+
+def send_request(socket_path, request, timeout=None):
+    """
+        Send a request to the worker listening on socket_path and return its reply.
+
+        Raises:
+            OSError: if no worker is listening on socket_path
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(5)
+        connection.connect(socket_path)
+        connection.settimeout(timeout)
+        connection.sendall((json.dumps(request) + "\n").encode())
+        with connection.makefile("rb") as reply:
+            line = reply.readline()
+    if not line:
+        raise ReportWorkerError("Report worker on {} closed the connection without a reply".format(socket_path))
+    return json.loads(line)
+
+
+def is_worker_running(socket_path):
+    try:
+        return send_request(socket_path, {'command': 'ping'}, timeout=5)['status'] == 'ok'
+    except (OSError, ValueError, ReportWorkerError):
+        return False
+
+
+def stop_worker(socket_path):
+    """
+        Stop the worker listening on socket_path, returns False if no worker was running.
+    """
+    try:
+        send_request(socket_path, {'command': 'stop'}, timeout=5)
+    except OSError:
+        return False
+    return True
+
+
+def submit_hotspot_report(socket_path=None, **arguments):
+    """
+        Generate a hotspot report through the report worker listening on socket_path, or the socket in the
+        SOCKET_ENV environment variable, see ReportWorker. If no worker is running, or it has loaded other files,
+        the report is generated in this process instead.
+
+        Parameters:
+            socket_path (string): path of the worker socket
+            arguments: arguments of generate_hotspot_report, except hotspot_cache
+
+        Returns:
+            bool: True if the report was generated by a worker
+
+        Raises:
+            ReportWorkerError: if the worker failed to generate the report
+    """
+    if socket_path is None:
+        socket_path = os.environ.get(SOCKET_ENV, None)
+    arguments = get_absolute_paths(arguments)
+    arguments['levels'] = [list(level) for level in arguments['levels']]
+    if socket_path is not None:
+        try:
+            reply = send_request(socket_path, {'command': 'report', 'arguments': arguments})
+        except OSError as e:
+            log.info("No report worker on {}, generating the report in process: {}".format(socket_path, e))
+        else:
+            if reply['status'] == 'ok':
+                return True
+            if not reply['status'] == 'unsupported':
+                raise ReportWorkerError("Report worker on {} failed: {}".format(socket_path, reply['message']))
+            log.info("Generating the report in process: {}".format(reply['message']))
+    from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+    arguments['levels'] = [tuple(level) for level in arguments['levels']]
+    generate_hotspot_report(**arguments)
+    return False
@@ -33,29 +33,70 @@ def get_annotation_data(data_extracter, mapper):
 
 
 def get_annotation_data_vep(field_dict, transcript_dict=None):
+    """
+        Create an extractor returning a vep annotation field for a variant.
+
+        The CSQ annotation of a variant is parsed once, selecting the transcript given by transcript_dict,
+        or the first one, and the parsed fields of the last seen variant are reused for all following
+        lookups of that variant.
+
+        Parameters:
+            field_dict (dict): CSQ field name to index
+            transcript_dict (dict): variant key to the Feature of the transcript that should be reported
+
+        Returns:
+            function(variant, field name) returning the value or None if missing
+    """
+    cache = [object(), None]
+
     def extractor(variant, info_name):
-        data = None
-        if not transcript_dict:
-            try:
-                data = variant.info['CSQ'][0].split("|")[field_dict[info_name]]
-            except KeyError:
-                return None
-        else:
-            variant_key = f"{variant.chrom}_{variant.start}_{variant.stop}_{variant.ref}_{','.join(variant.alts)}"
-            try:
-                for transcript_data in variant.info['CSQ']:
-                    if transcript_data.split("|")[field_dict['Feature']].startswith(transcript_dict[variant_key]):
-                        data = transcript_data.split("|")[field_dict[info_name]]
-                if data is None:
-                    data = variant.info['CSQ'][0].split("|")[field_dict[info_name]]
-            except KeyError:
-                return None
+        if variant is not cache[0]:
+            cache[1] = parse_vep_transcript(variant, field_dict, transcript_dict)
+            cache[0] = variant
+        if cache[1] is None:
+            return None
+        try:
+            data = cache[1][field_dict[info_name]]
+        except KeyError:
+            return None
         if data == "":
             return None
         return data
     return extractor
 
 
+def get_variant_key(variant):
+    """
+        Key identifying a variant across the vcf files of a sample, as used by transcript_dict:
+        "chrom_start_stop_ref_alts".
+    """
+    return f"{variant.chrom}_{variant.start}_{variant.stop}_{variant.ref}_{','.join(variant.alts)}"
+
+
+def parse_vep_transcript(variant, field_dict, transcript_dict=None):
+    """
+        Split the CSQ annotation for the selected transcript of a variant into a list of fields. The last
+        transcript with a Feature starting with the one in transcript_dict is selected, falling back to the
+        first transcript. None is returned if the annotation, or the variant in transcript_dict, is missing.
+    """
+    try:
+        csq = variant.info['CSQ']
+        if not transcript_dict:
+            return csq[0].split("|")
+        transcript = transcript_dict[get_variant_key(variant)]
+        feature = field_dict['Feature']
+    except KeyError:
+        return None
+    selected = None
+    for transcript_data in csq:
+        fields = transcript_data.split("|")
+        if fields[feature].startswith(transcript):
+            selected = fields
+    if selected is None:
+        selected = csq[0].split("|")
+    return selected
+
+
 def get_depth(gvcf_file, sample, chr, start, stop, depth_flag='DP'):
     depth = [r.samples[sample][depth_flag] for r in gvcf_file.fetch(chr, start, stop)]
     if len(depth) > 1:
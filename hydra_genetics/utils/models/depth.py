@@ -0,0 +1,191 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+from bisect import bisect_left, bisect_right
+
+import numpy
+
+
+class DepthStore(object):
+    """
+        Read depth per contig, stored as sorted and non-overlapping blocks.
+
+        Each contig is kept as three numpy arrays: 0-based start, exclusive end and depth of every block, which
+        makes it possible to store gVCF reference blocks (END=) without expanding them to single positions.
+        Positions that aren't covered by any block have depth 0.
+    """
+    def __init__(self):
+        self._contigs = {}
+
+    def add_contig(self, contig, starts, ends, depths):
+        """
+            Add blocks for a contig, sorted by start position. Overlapping blocks are truncated at the start of
+            the following block, i.e. a later block takes precedence over an earlier one.
+        """
+        starts = numpy.asarray(starts, dtype=numpy.int64)
+        ends = numpy.asarray(ends, dtype=numpy.int64)
+        depths = numpy.asarray(depths)
+        if len(starts) > 1 and numpy.any(starts[1:] < starts[:-1]):
+            raise ValueError("Depth blocks for %s aren't sorted by start position" % contig)
+        if len(starts) > 0:
+            ends = numpy.minimum(ends, numpy.append(starts[1:], ends[-1]))
+            keep = ends > starts
+            starts, ends, depths = starts[keep], ends[keep], depths[keep]
+        self._contigs[contig] = (starts, ends, depths)
+
+    def contigs(self):
+        return list(self._contigs.keys())
+
+    def get_blocks(self, contig, start, stop):
+        """
+            Return (starts, ends, depths) for blocks overlapping [start, stop), truncated to the queried range.
+        """
+        blocks = self._contigs.get(contig, None)
+        if blocks is None or stop <= start:
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return empty, empty, empty
+        starts, ends, depths = blocks
+        first = numpy.searchsorted(ends, start, side='right')
+        last = numpy.searchsorted(starts, stop, side='left')
+        return (numpy.maximum(starts[first:last], start),
+                numpy.minimum(ends[first:last], stop),
+                depths[first:last])
+
+    def get_depth(self, contig, start, stop):
+        """
+            Mean depth for the 0-based positions in [start, stop), 0 if the range is empty.
+
+            Integer depths give an int when the mean is a whole number, i.e. the same values as statistics.mean
+            over the per position depths.
+        """
+        length = stop - start
+        if length <= 0:
+            return 0
+        starts, ends, depths = self.get_blocks(contig, start, stop)
+        total = numpy.dot(ends - starts, depths).item() if len(depths) > 0 else 0
+        if length == 1:
+            return total
+        if isinstance(total, int):
+            return total // length if total % length == 0 else total / length
+        return total / length
+
+    def get_coverage(self, contig, start, stop, thresholds=()):
+        """
+            Coverage summary for the 0-based positions in [start, stop).
+
+            The blocks are sorted by depth and a prefix sum of their lengths gives, without expanding them to
+            single positions, the median and the number of positions with a depth at or above each threshold.
+
+            Returns:
+                (minimum, mean, median, fractions) where fractions has one value per threshold, all 0 if the
+                range is empty
+        """
+        length = stop - start
+        if length <= 0:
+            return 0, 0.0, 0.0, [0.0] * len(thresholds)
+        starts, ends, depths = self.get_blocks(contig, start, stop)
+        lengths = ends - starts
+        uncovered = length - lengths.sum()
+        if uncovered > 0:
+            lengths = numpy.append(lengths, uncovered)
+            depths = numpy.append(depths, 0)
+        order = numpy.argsort(depths, kind='stable')
+        depths = depths[order]
+        lengths = lengths[order]
+        cumulative = numpy.cumsum(lengths)
+        mean = numpy.dot(lengths, depths).item() / length
+        lower = depths[numpy.searchsorted(cumulative, (length - 1) // 2, side='right')]
+        upper = depths[numpy.searchsorted(cumulative, length // 2, side='right')]
+        below = numpy.concatenate(([0], cumulative))[numpy.searchsorted(depths, numpy.asarray(thresholds), side='left')]
+        return depths[0].item(), mean, (lower + upper).item() / 2, ((length - below) / length).tolist()
+
+
+class DepthWindow(DepthStore):
+    """
+        Read depth of one contig at a time, streamed from a coordinate sorted source of depth blocks.
+
+        Blocks are read on demand as positions further along the contig are queried and dropped once the
+        caller has advanced past them, so only the blocks of the active window are kept in memory. Queries
+        give the same values as a DepthStore loaded with the same blocks. When the window is empty and the
+        next position of interest is more than distance bases ahead, the source is opened again at that
+        position instead of reading all blocks in between.
+
+        Parameters:
+            fetch (function): fetch(contig, start) returning (start, end, depth) for the blocks overlapping
+                start and all following blocks on contig, sorted by start position
+            distance (int): gap before the source is reopened further along the contig
+    """
+    def __init__(self, fetch, distance=1000):
+        self._fetch = fetch
+        self.distance = distance
+        self.contig = None
+        self._reset(None, 0)
+
+    def _reset(self, contig, position):
+        self.contig = contig
+        self._position = position
+        self._source = None
+        self._pending = None
+        self._first = 0
+        self._starts = []
+        self._ends = []
+        self._depths = []
+
+    def contigs(self):
+        return [] if self.contig is None else [self.contig]
+
+    def advance(self, contig, position):
+        """
+            Positions before position on contig, and all positions on previous contigs, won't be queried again.
+        """
+        if not contig == self.contig:
+            self._reset(contig, position)
+            return
+        self._position = max(self._position, position)
+        self._first = bisect_right(self._ends, self._position, lo=self._first)
+        if self._first > 1024 and self._first * 2 > len(self._starts):
+            del self._starts[:self._first], self._ends[:self._first], self._depths[:self._first]
+            self._first = 0
+        if self._first == len(self._starts) and self._pending is not None and \
+                self._pending[0] + self.distance < self._position:
+            # nothing left in the window, skip ahead through the index
+            self._source = None
+            self._pending = None
+
+    def _load(self, stop):
+        if self._source is None:
+            self._source = iter(self._fetch(self.contig, self._position))
+            self._pending = next(self._source, None)
+        while self._pending is not None and self._pending[0] < stop:
+            start, end, depth = self._pending
+            # same as DepthStore.add_contig, a block is truncated at the start of the following block
+            while self._first < len(self._starts) and self._ends[-1] > start:
+                self._ends[-1] = start
+                if self._ends[-1] > self._starts[-1]:
+                    break
+                self._starts.pop()
+                self._ends.pop()
+                self._depths.pop()
+            if end > start:
+                self._starts.append(start)
+                self._ends.append(end)
+                self._depths.append(depth)
+            self._pending = next(self._source, None)
+
+    def get_blocks(self, contig, start, stop):
+        """
+            Return (starts, ends, depths) for blocks overlapping [start, stop), truncated to the queried range.
+        """
+        if not contig == self.contig:
+            self._reset(contig, start)
+        if stop <= start:
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return empty, empty, empty
+        if start < self._position:
+            raise ValueError("Depth window on %s has already advanced past %d" % (contig, start))
+        self._load(stop)
+        first = bisect_right(self._ends, start, lo=self._first)
+        last = bisect_left(self._starts, stop, lo=first)
+        return (numpy.maximum(numpy.asarray(self._starts[first:last], dtype=numpy.int64), start),
+                numpy.minimum(numpy.asarray(self._ends[first:last], dtype=numpy.int64), stop),
+                numpy.asarray(self._depths[first:last], dtype=numpy.int64))
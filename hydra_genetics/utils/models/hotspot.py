@@ -1,6 +1,7 @@
 # vim: syntax=python tabstop=4 expandtab
 # coding: utf-8
 
+from collections.abc import Sequence
 from enum import Enum, auto, unique
 import enum
 import re
@@ -75,7 +76,41 @@ class MultiBpVariantData(object):
         return self.data.get("{}:{}:{}:{}:{}".format(chromosome, start, stop, reference, variant), None)
 
 
+class VariantPositions(Sequence):
+    """
+        Read-only view of the positions in the extended region of a hotspot, each position given as
+        {'extended': bool, 'variants': list}. Entries are created on access, nothing is stored per position.
+    """
+    __slots__ = ('_hotspot',)
+
+    def __init__(self, hotspot):
+        self._hotspot = hotspot
+
+    def __len__(self):
+        return self._hotspot.EXTENDED_END - self._hotspot.EXTENDED_START + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("position index out of range")
+        position = self._hotspot.EXTENDED_START + index
+        return {'extended': not self._hotspot.START <= position <= self._hotspot.END,
+                'variants': self._hotspot.get_variants(position)}
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+
 class Hotspot(object):
+    __slots__ = ('CHROMOSOME', 'CHR_SHORT', 'START', 'END', 'GENE', 'CDS_MUTATION_SYNTAX', 'AA_MUTATION_SYNTAX',
+                 'REPORT', 'COMMENT', 'EXON', 'ACCESSION_NUMBER', 'ALWAYS_PRINT', 'PRINT_ALL', 'EXTENDED_START',
+                 'EXTENDED_END', 'VARIANT_ADDED', '_variants')
+
     def __init__(self, CHROMOSOME, START, END, GENE, CDS_MUTATION_SYNTAX, AA_MUTATION_SYNTAX, REPORT, COMMENT,
                  EXON, ACCESSION_NUMBER, ALWAYS_PRINT=False, PRINT_ALL=False):
         self.CHROMOSOME = CHROMOSOME
@@ -115,48 +150,93 @@ class Hotspot(object):
         if not _exon_intron_pattern.match(self.EXON):
             raise ValueError("Exon value should have the following format: exon or intronic. not %s" % self.EXON)
 
-        self.VARIANTS = [{'extended': False, 'variants': []} for i in range((self.END - self.START + 1))]
+        self.PRINT_ALL = PRINT_ALL
+        self.clear_variants()
+
+    def clear_variants(self):
+        # variants per 1-based start position, only positions with variants are stored
+        self._variants = {}
 
         self.EXTENDED_START = self.START
         self.EXTENDED_END = self.END
-        self.PRINT_ALL = PRINT_ALL
         self.VARIANT_ADDED = False
 
+    def __reduce__(self):
+        # pickle the validated fields and rebuild without validation, which makes loading a pickled
+        # hotspot set several times faster than the default handling of __slots__
+        fields = tuple(getattr(self, name) for name in _hotspot_fields)
+        if not self.VARIANT_ADDED:
+            return (_restore_hotspot, (fields,))
+        return (_restore_hotspot, (fields,), (self.EXTENDED_START, self.EXTENDED_END, self._variants))
+
+    def __setstate__(self, state):
+        self.EXTENDED_START, self.EXTENDED_END, self._variants = state
+        self.VARIANT_ADDED = True
+
+    @property
+    def VARIANTS(self):
+        return VariantPositions(self)
+
+    def get_variants(self, position):
+        """
+            Variants starting at a 1-based position, an empty list if there are none.
+        """
+        return self._variants.get(position, [])
+
+    def iter_positions(self, all_positions=True):
+        """
+            Lazily yield (position, variants, extended) for every position in the extended region, or only for
+            positions with variants if all_positions is False, in position order. Extended is True for positions
+            outside START-END.
+        """
+        if all_positions:
+            positions = range(self.EXTENDED_START, self.EXTENDED_END + 1)
+        else:
+            positions = sorted(self._variants)
+        for position in positions:
+            yield position, self._variants.get(position, []), not self.START <= position <= self.END
+
     def check_overlap(self, chrom, region_start, region_stop, start, stop=None):
         return self.CHROMOSOME == chrom and \
                ((stop is not None and region_start <= stop and start <= region_stop) or (region_start <= start <= region_stop))
 
-    def add_variant(self, variant, chr_translater):
+    def add_variant(self, variant, chr_translater, chrom=None):
+        """
+            Add variant if it overlaps the hotspot, chrom is the NC name of the variant contig and is looked
+            up with chr_translater when not given.
+        """
         if isinstance(variant, pysam.VariantRecord):
             if len(variant.ref) == 1 and len(variant.alts[0]) == 1 and self.REPORT == ReportClass.indel:
                 return False
             v_start = variant.start + 1
             v_stop = variant.stop + 1
 
-            if self.check_overlap(chr_translater.get_nc_value(variant.chrom), self.START, self.END, v_start, v_stop):
+            if chrom is None:
+                chrom = chr_translater.get_nc_value(variant.chrom)
+            if self.check_overlap(chrom, self.START, self.END, v_start, v_stop):
                 if self.REPORT == ReportClass.indel and not is_indel(variant):
                     return False
                 if self.EXTENDED_END < v_stop or v_start < self.EXTENDED_START:
                     if variant.start < self.EXTENDED_START or self.EXTENDED_END < variant.stop:
-                        new_start = min(v_start, self.EXTENDED_START)
-                        new_end = max(v_stop, self.EXTENDED_END)
-                        new_var = []
-                        for i in range(new_end - new_start + 1):
-                            if self.START <= i + new_start <= self.END:
-                                new_var.append(self.VARIANTS[new_start - self.EXTENDED_START + i])
-                            else:
-                                new_var.append({'extended': True, 'variants': []})
-                        self.VARIANTS = new_var
-                        self.EXTENDED_START = new_start
-                        self.EXTENDED_END = new_end
-                position = v_start - self.EXTENDED_START
-                # try:
-                self.VARIANTS[position]['variants'].append(variant)
-                # except:
-                #    self.DEPTH_VARIANTS[position]['variants'] = [variant]
+                        self.EXTENDED_START = min(v_start, self.EXTENDED_START)
+                        self.EXTENDED_END = max(v_stop, self.EXTENDED_END)
+                self._variants.setdefault(v_start, []).append(variant)
                 self.VARIANT_ADDED = True
                 return True
         return False
 
     def __str__(self):
         return self.CHROMOSOME + ":" + str(self.START) + "-" + str(self.END) + " " + str(self.REPORT) + " " + self.GENE
+
+
+_hotspot_fields = ('CHROMOSOME', 'CHR_SHORT', 'START', 'END', 'GENE', 'CDS_MUTATION_SYNTAX', 'AA_MUTATION_SYNTAX', 'REPORT',
+                   'COMMENT', 'EXON', 'ACCESSION_NUMBER', 'ALWAYS_PRINT', 'PRINT_ALL')
+
+
+def _restore_hotspot(fields):
+    hotspot = Hotspot.__new__(Hotspot)
+    (hotspot.CHROMOSOME, hotspot.CHR_SHORT, hotspot.START, hotspot.END, hotspot.GENE, hotspot.CDS_MUTATION_SYNTAX,
+     hotspot.AA_MUTATION_SYNTAX, hotspot.REPORT, hotspot.COMMENT, hotspot.EXON, hotspot.ACCESSION_NUMBER,
+     hotspot.ALWAYS_PRINT, hotspot.PRINT_ALL) = fields
+    hotspot.clear_variants()
+    return hotspot
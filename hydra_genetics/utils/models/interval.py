@@ -0,0 +1,204 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+from bisect import bisect_right
+from collections import OrderedDict
+
+
+class IntervalIndex(object):
+    """
+        Per contig interval index.
+
+        Intervals are kept sorted by start position and indexed as an implicit augmented interval tree,
+        i.e. every element of the sorted array is a node storing the largest end position of its subtree
+        (same layout as cgranges). The index is built once, on the first query after data has been added,
+        and overlap queries are then O(log n + k).
+
+        Coordinates are 1-based and inclusive, as in the hotspot file, and query results are returned in
+        the order the intervals were added.
+    """
+    def __init__(self):
+        self._contigs = OrderedDict()
+        self._items = []
+        self._indexed = True
+
+    def add(self, contig, start, end, data):
+        if start > end:
+            raise ValueError("Start cannot be larger then end: %s > %s" % (start, end))
+        self._contigs.setdefault(contig, _ContigIntervals()).add(start, end + 1, len(self._items), data)
+        self._items.append(data)
+        self._indexed = False
+
+    def index(self):
+        if not self._indexed:
+            for intervals in self._contigs.values():
+                intervals.index()
+            self._indexed = True
+        return self
+
+    def overlap(self, contig, start, end):
+        """
+            Return data for all intervals on contig overlapping [start, end].
+        """
+        intervals = self._contigs.get(contig, None)
+        if intervals is None:
+            return []
+        self.index()
+        return intervals.overlap(start, end + 1)
+
+    def get_contig(self, contig):
+        """
+            Return the indexed intervals of contig, None if there are no intervals on it. Queries on the
+            returned object take 1-based, half-open coordinates, i.e. overlap(start, end + 1).
+        """
+        intervals = self._contigs.get(contig, None)
+        if intervals is not None:
+            self.index()
+        return intervals
+
+    def contigs(self):
+        return list(self._contigs.keys())
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class _ContigIntervals(object):
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.order = []
+        self.data = []
+        self.max_ends = []
+        self.root_level = -1
+
+    def add(self, start, end, order, data):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.order.append(order)
+        self.data.append(data)
+
+    def index(self):
+        rows = sorted(zip(self.starts, self.ends, self.order, self.data), key=lambda row: (row[0], row[2]))
+        self.starts = [row[0] for row in rows]
+        self.ends = [row[1] for row in rows]
+        self.order = [row[2] for row in rows]
+        self.data = [row[3] for row in rows]
+
+        n = len(self.starts)
+        max_ends = list(self.ends)
+        self.max_ends = max_ends
+        if n == 0:
+            self.root_level = -1
+            return
+        # leaves, i.e. all even indexes, are at level 0
+        last_i = 0
+        last = 0
+        for i in range(0, n, 2):
+            last_i = i
+            last = max_ends[i]
+        # internal nodes, processed bottom-up
+        k = 1
+        while (1 << k) <= n:
+            x = 1 << (k - 1)
+            for i in range((x << 1) - 1, n, x << 2):
+                end_left = max_ends[i - x]
+                end_right = max_ends[i + x] if i + x < n else last
+                max_ends[i] = max(self.ends[i], end_left, end_right)
+            # last_i now points to the parent of the previous last_i
+            last_i = last_i - x if (last_i >> k) & 1 else last_i + x
+            if last_i < n and max_ends[last_i] > last:
+                last = max_ends[last_i]
+            k += 1
+        self.root_level = k - 1
+
+    def overlap(self, start, end):
+        """
+            Return data for intervals overlapping the half-open interval [start, end).
+        """
+        starts = self.starts
+        ends = self.ends
+        max_ends = self.max_ends
+        n = len(starts)
+        if n == 0:
+            return []
+        found = []
+        stack = [(self.root_level, (1 << self.root_level) - 1, False)]
+        while stack:
+            level, node, left_done = stack.pop()
+            if level <= 3:
+                # small subtree, scan all nodes
+                i = node >> level << level
+                last = min(i + (1 << (level + 1)) - 1, n)
+                while i < last and starts[i] < end:
+                    if start < ends[i]:
+                        found.append(i)
+                    i += 1
+            elif not left_done:
+                left = node - (1 << (level - 1))
+                stack.append((level, node, True))
+                if left >= n or max_ends[left] > start:
+                    stack.append((level - 1, left, False))
+            elif node < n and starts[node] < end:
+                if start < ends[node]:
+                    found.append(node)
+                stack.append((level - 1, node + (1 << (level - 1)), False))
+        found.sort(key=lambda i: self.order[i])
+        return [self.data[i] for i in found]
+
+
+def merge_regions(regions, distance=0):
+    """
+        Merge 0-based, half-open (contig, start, end) regions that overlap or are at most distance bases apart.
+
+        Returns an OrderedDict with a sorted list of (start, end) tuples per contig, contigs in the order they
+        were first seen.
+    """
+    per_contig = OrderedDict()
+    for contig, start, end in regions:
+        per_contig.setdefault(contig, []).append((start, end))
+    merged = OrderedDict()
+    for contig, intervals in per_contig.items():
+        intervals.sort()
+        result = [list(intervals[0])]
+        for start, end in intervals[1:]:
+            if start <= result[-1][1] + distance:
+                result[-1][1] = max(result[-1][1], end)
+            else:
+                result.append([start, end])
+        merged[contig] = [(start, end) for start, end in result]
+    return merged
+
+
+class RegionSet(object):
+    """
+        Set of 0-based, half-open regions per contig, merged when they overlap or touch, that can be queried for
+        the positions they contain.
+
+        Parameters:
+            regions (iterable): (contig, start, end) tuples
+    """
+    def __init__(self, regions):
+        self._regions = merge_regions(regions)
+        self._starts = {contig: [start for start, _ in intervals] for contig, intervals in self._regions.items()}
+
+    def contains(self, contig, position):
+        """
+            True if the 0-based position on contig is in one of the regions.
+        """
+        starts = self._starts.get(contig, None)
+        if not starts:
+            return False
+        i = bisect_right(starts, position) - 1
+        return i >= 0 and position < self._regions[contig][i][1]
+
+    def __iter__(self):
+        for contig, intervals in self._regions.items():
+            for start, end in intervals:
+                yield contig, start, end
+
+    def __len__(self):
+        return sum(len(intervals) for intervals in self._regions.values())
@@ -0,0 +1,95 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+from itertools import islice
+
+# values of typed columns that are stored as null
+NULL_VALUES = frozenset(("", "-", ".", "None"))
+
+
+class HotspotReport(object):
+    """
+        Rows of a hotspot report, each a list with the formatted value of every column, i.e. the fields of a
+        line in the report file.
+
+        The rows are generated while they are iterated and can only be iterated once, which keeps the memory
+        use of streaming reports bounded. Use to_columns or to_pandas to get a table that can be reused.
+
+        Parameters:
+            columns (list): column names
+            rows (iterable): rows in report order
+            coverage (HotspotReport): coverage summary of the hotspots, if it was requested
+            types (dict): value type, 'int', 'float' or 'category', of typed columns in columnar outputs,
+                see to_arrow, other columns are strings
+    """
+    def __init__(self, columns, rows, coverage=None, types=None):
+        self.columns = list(columns)
+        self._rows = iter(rows)
+        self.coverage = coverage
+        self.types = dict(types or {})
+
+    def __iter__(self):
+        return self._rows
+
+    def to_dicts(self):
+        """
+            Generate each row as a dict with the column names as keys.
+        """
+        for row in self._rows:
+            yield dict(zip(self.columns, row))
+
+    def to_columns(self):
+        """
+            Column oriented table, a dict with a list of values for each column name.
+        """
+        table = [[] for _ in self.columns]
+        for row in self._rows:
+            for values, value in zip(table, row):
+                values.append(value)
+        return dict(zip(self.columns, table))
+
+    def to_pandas(self):
+        """
+            pandas.DataFrame with the report columns, all values are strings as in the report file.
+        """
+        import pandas
+        return pandas.DataFrame.from_records(list(self._rows), columns=self.columns)
+
+    def get_arrow_schema(self):
+        """
+            pyarrow.Schema of the report columns: int64 and float64 columns, with '-' and empty values as null,
+            dictionary encoded category columns and string columns. Requires pyarrow.
+        """
+        import pyarrow
+        types = {'int': pyarrow.int64(),
+                 'float': pyarrow.float64(),
+                 'category': pyarrow.dictionary(pyarrow.int32(), pyarrow.string())}
+        return pyarrow.schema([(column, types.get(self.types.get(column, None), pyarrow.string())) for column in self.columns])
+
+    def to_arrow_batches(self, batch_size=100000):
+        """
+            Generate the rows as pyarrow.RecordBatch of at most batch_size rows, see get_arrow_schema.
+        """
+        import pyarrow
+        schema = self.get_arrow_schema()
+        converters = {'int': int, 'float': float}
+        column_types = [self.types.get(column, None) for column in self.columns]
+        for batch in iter(lambda: list(islice(self._rows, batch_size)), []):
+            arrays = []
+            for values, column_type, field in zip(zip(*batch), column_types, schema):
+                if column_type in converters:
+                    convert = converters[column_type]
+                    values = [None if value in NULL_VALUES else convert(value) for value in values]
+                    arrays.append(pyarrow.array(values, type=field.type))
+                elif column_type == 'category':
+                    arrays.append(pyarrow.array(values, type=pyarrow.string()).dictionary_encode())
+                else:
+                    arrays.append(pyarrow.array(values, type=pyarrow.string()))
+            yield pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def to_arrow(self):
+        """
+            pyarrow.Table with typed report columns, see get_arrow_schema.
+        """
+        import pyarrow
+        return pyarrow.Table.from_batches(list(self.to_arrow_batches()), schema=self.get_arrow_schema())
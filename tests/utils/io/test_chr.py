@@ -0,0 +1,51 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestContigDictionary(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.mapping = os.path.join(self.tempdir, "mapping")
+        with open(self.mapping, 'w') as mapping:
+            mapping.write("#Chr name\tNC\tID\tLength\n")
+            mapping.write("chr1\tNC_000001.10\tchr1#x\t249250621\n")
+            mapping.write("NC_000002.11\tchr2\tchr2#x\t243199373\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_contig_dictionary(self):
+        from hydra_genetics.utils.io.chr import ChrTranslater, ContigDictionary
+        from pysam import VariantHeader
+
+        contigs = ContigDictionary(ChrTranslater(self.mapping))
+        self.assertEqual(len(contigs), 2)
+        self.assertEqual(contigs.get_id("chr2"), contigs.get_id("NC_000002.11"))
+        self.assertEqual(contigs.chr_names[contigs.get_id("NC_000001.10")], "chr1")
+        self.assertEqual(contigs.nc_names[contigs.get_id("chr1")], "NC_000001.10")
+        self.assertNotIn("chr3", contigs)
+        with self.assertRaises(KeyError):
+            contigs.get_id("chr3")
+
+        header = VariantHeader()
+        for contig in ["chr2", "chr3", "chr1"]:
+            header.contigs.add(contig)
+        record = header.new_record(contig="chr1", start=10, alleles=("A", "T"))
+        header_ids = contigs.get_header_ids(header)
+        self.assertEqual(header_ids, [contigs.get_id("chr2"), None, contigs.get_id("chr1")])
+        self.assertEqual(header_ids[record.rid], contigs.get_id("chr1"))
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
@@ -0,0 +1,113 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+HEADER = ['sample', 'chr', 'start', 'stop', 'ref', 'alt', 'report', 'gvcf_depth', 'ref_depth', 'alt_depth']
+
+
+class TestCohortReport(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.mapping = os.path.join(self.tempdir, "mapping")
+        with open(self.mapping, 'w') as mapping:
+            mapping.write("#Chr name\tNC\tID\tLength\n")
+            mapping.write("chr2\tNC_000002.11\tchr2#x\t243199373\n")
+            mapping.write("chr10\tNC_000010.10\tchr10#x\t135534747\n")
+        self.samples = []
+        self.write_report("sample1", [['NC_000002.11', '100', '100', '-', '-', '1-hotspot', '300', '-', '-'],
+                                      ['NC_000002.11', '200', '200', 'A', 'T', '4-other', '50', '40', '10'],
+                                      ['NC_000010.10', '50', '51', 'AC', 'A', '2-region', '80', '60', '20']])
+        self.write_report("sample2", [['NC_000002.11', '200', '200', 'A', 'G,T', '4-other', '100', '50', '25,25'],
+                                      ['NC_000002.11', '200', '200', 'A', 'T', '4-other', '100', '0', '0'],
+                                      ['NC_000010.10', '50', '51', 'AC', 'A', '2-region', '90', '45', '45']], compress=True)
+        self.write_report("sample3", [['NC_000002.11', '100', '100', '-', '-', '1-hotspot', '20', '-', '-']])
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def write_report(self, sample, rows, compress=False):
+        from pysam import BGZFile
+        output = os.path.join(self.tempdir, sample + (".report.gz" if compress else ".report"))
+        content = "\n".join("\t".join(row) for row in [HEADER] + [[sample] + row for row in rows]) + "\n"
+        if compress:
+            with BGZFile(output, "wb") as writer:
+                writer.write(content.encode())
+        else:
+            with open(output, "w") as writer:
+                writer.write(content)
+        self.samples.append({'sample': sample, 'output': output})
+
+    def read_matrix(self, output):
+        with open(output) as matrix:
+            return [line.split("\t") for line in matrix.read().split("\n")]
+
+    def test_merge_hotspot_reports(self):
+        from hydra_genetics.utils.io.cohort_report import COHORT_COLUMNS, merge_hotspot_reports
+        expected = [list(COHORT_COLUMNS),
+                    ['NC_000002.11', '100', '100', '-', '-', 'sample1', '1-hotspot', '300', '-'],
+                    ['NC_000002.11', '100', '100', '-', '-', 'sample3', '1-hotspot', '20', '-'],
+                    ['NC_000002.11', '200', '200', 'A', 'G,T', 'sample2', '4-other', '100', '0.5000'],
+                    ['NC_000002.11', '200', '200', 'A', 'T', 'sample1', '4-other', '50', '0.2000'],
+                    ['NC_000002.11', '200', '200', 'A', 'T', 'sample2', '4-other', '100', '-'],
+                    ['NC_000010.10', '50', '51', 'AC', 'A', 'sample1', '2-region', '80', '0.2500'],
+                    ['NC_000010.10', '50', '51', 'AC', 'A', 'sample2', '2-region', '90', '0.5000']]
+        for max_open_files in [2, 3]:
+            output = os.path.join(self.tempdir, "matrix_{}.tsv".format(max_open_files))
+            merge_hotspot_reports(self.samples, output, self.mapping, "tsv", max_open_files)
+            self.assertEqual(self.read_matrix(output), expected)
+
+        with self.assertRaises(ValueError):
+            merge_hotspot_reports(self.samples, output, self.mapping, "csv")
+
+    def test_unsorted_report(self):
+        from hydra_genetics.utils.io.cohort_report import merge_hotspot_reports
+        self.write_report("sample4", [['NC_000010.10', '50', '51', 'AC', 'A', '2-region', '80', '60', '20'],
+                                      ['NC_000002.11', '100', '100', '-', '-', '1-hotspot', '300', '-', '-']])
+        with self.assertRaises(ValueError):
+            merge_hotspot_reports(self.samples, os.path.join(self.tempdir, "matrix.tsv"), self.mapping, "tsv")
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "requires pyarrow")
+    def test_merge_hotspot_reports_parquet(self):
+        import pyarrow.parquet
+        from hydra_genetics.utils.io.cohort_report import merge_hotspot_reports
+        output = os.path.join(self.tempdir, "matrix.parquet")
+        merge_hotspot_reports(self.samples, output, self.mapping)
+        table = pyarrow.parquet.read_table(output)
+        self.assertEqual(table.num_rows, 7)
+        self.assertEqual(table.column('start').to_pylist(), [100, 100, 200, 200, 200, 50, 50])
+        self.assertEqual(table.column('vaf').to_pylist(), [None, None, 0.5, 0.2, None, 0.25, 0.5])
+
+    def test_merge_command(self):
+        from click.testing import CliRunner
+        from hydra_genetics.commands.hotspot_report import hotspot_report
+        manifest = os.path.join(self.tempdir, "manifest.tsv")
+        with open(manifest, "w") as manifest_file:
+            manifest_file.write("sample\toutput\n")
+            manifest_file.write("".join("{}\t{}\n".format(sample['sample'], sample['output']) for sample in self.samples))
+        output = os.path.join(self.tempdir, "matrix.tsv")
+        result = CliRunner().invoke(hotspot_report, ["merge", "-m", manifest, "-c", self.mapping, "-o", "tsv", output])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(self.read_matrix(output)), 8)
+
+    def test_get_vaf(self):
+        from hydra_genetics.utils.io.cohort_report import get_vaf
+        self.assertEqual(get_vaf("30", "10"), "0.2500")
+        self.assertEqual(get_vaf("30", "5,5"), "0.2500")
+        self.assertEqual(get_vaf("-", "-"), "-")
+        self.assertEqual(get_vaf("0", "0"), "-")
+        self.assertEqual(get_vaf("10", "None"), "-")
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
@@ -0,0 +1,153 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from pysam import tabix_index
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestGvcfDepth(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+        self.gvcf = os.path.join(self.tempdir, "data.g.vcf")
+        with open(self.gvcf, 'w', encoding="ascii") as gvcf:
+            gvcf.write('##fileformat=VCFv4.2\n')
+            gvcf.write('##ALT=<ID=NON_REF,Description="Represents any possible alternative allele at this location">\n')
+            gvcf.write('##INFO=<ID=END,Number=1,Type=Integer,Description="Stop position of the interval">\n')
+            gvcf.write('##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n')
+            gvcf.write('##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Approximate read depth">\n')
+            gvcf.write('##FORMAT=<ID=MIN_DP,Number=1,Type=Integer,Description="Minimum DP observed within the GVCF block">\n')
+            gvcf.write("##contig=<ID=chr1,length=249250621>\n")
+            gvcf.write("##contig=<ID=chr2,length=243199373>\n")
+            gvcf.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tsample1\n")
+            gvcf.write("chr1\t100\t.\tA\t<NON_REF>\t.\t.\tEND=109\tGT:DP:MIN_DP\t0/0:50:40\n")
+            gvcf.write("chr1\t110\t.\tAT\tA,<NON_REF>\t.\t.\t.\tGT:DP\t0/1:60\n")
+            gvcf.write("chr1\t111\t.\tT\t<NON_REF>\t.\t.\tEND=120\tGT:DP:MIN_DP\t0/0:70:65\n")
+            gvcf.write("chr1\t130\t.\tG\t<NON_REF>\t.\t.\t.\tGT:DP\t0/0:.\n")
+            gvcf.write("chr2\t100\t.\tC\t<NON_REF>\t.\t.\tEND=199\tGT:DP:MIN_DP\t0/0:30:20\n")
+
+        tabix_index(self.gvcf, preset="vcf")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_load_gvcf_depth(self):
+        from hydra_genetics.utils.io.depth import load_gvcf_depth
+        from pysam import VariantFile
+
+        depth_store = load_gvcf_depth(VariantFile(self.gvcf + ".gz"), "sample1", {"chr1": [(0, 1000)]})
+        self.assertEqual(depth_store.contigs(), ["chr1"])
+        # positions inside a reference block get the depth of the block
+        self.assertEqual(depth_store.get_depth("chr1", 99, 100), 50)
+        self.assertEqual(depth_store.get_depth("chr1", 104, 105), 50)
+        self.assertEqual(depth_store.get_depth("chr1", 108, 109), 50)
+        # a deletion only covers its start position
+        self.assertEqual(depth_store.get_depth("chr1", 109, 110), 60)
+        self.assertEqual(depth_store.get_depth("chr1", 110, 111), 70)
+        self.assertEqual(depth_store.get_depth("chr1", 119, 120), 70)
+        self.assertEqual(depth_store.get_depth("chr1", 120, 121), 0)
+        self.assertEqual(depth_store.get_depth("chr1", 129, 130), 0)
+        self.assertEqual(depth_store.get_depth("chr1", 108, 110), 55)
+        self.assertEqual(depth_store.get_depth("chr2", 150, 151), 0)
+
+        depth_store = load_gvcf_depth(VariantFile(self.gvcf + ".gz"), "sample1", {"chr2": [(150, 151)]}, "MIN_DP")
+        self.assertEqual(depth_store.get_depth("chr2", 150, 151), 20)
+
+    def test_load_gvcf_depth_regions(self):
+        from hydra_genetics.utils.io.depth import load_gvcf_depth
+        from pysam import VariantFile
+
+        # the first block overlaps both regions, but should only be loaded once
+        depth_store = load_gvcf_depth(VariantFile(self.gvcf + ".gz"), "sample1", {"chr1": [(100, 101), (105, 106), (129, 130)]})
+        self.assertEqual(depth_store.get_depth("chr1", 99, 109), 50)
+        self.assertEqual(depth_store.get_depth("chr1", 109, 110), 0)
+        self.assertEqual(depth_store.get_depth("chr1", 119, 120), 0)
+        self.assertEqual(depth_store.get_depth("chr1", 129, 130), 0)
+
+
+def write_bam(path, contigs, reads):
+    """
+        Write a coordinate sorted and indexed bam file, reads are (contig, start, length, mapping quality, base
+        quality, flag) sorted by position.
+    """
+    from pysam import AlignedSegment, AlignmentFile, index
+    header = {'HD': {'VN': '1.6', 'SO': 'coordinate'}, 'SQ': [{'SN': name, 'LN': length} for name, length in contigs]}
+    names = [name for name, _ in contigs]
+    with AlignmentFile(path, "wb", header=header) as bam:
+        for number, (contig, start, length, mapping_quality, base_quality, flag) in enumerate(reads):
+            read = AlignedSegment()
+            read.query_name = "read{}".format(number)
+            read.query_sequence = "A" * length
+            read.flag = flag
+            read.reference_id = names.index(contig)
+            read.reference_start = start
+            read.mapping_quality = mapping_quality
+            read.cigarstring = "{}M".format(length)
+            read.query_qualities = [base_quality] * length
+            bam.write(read)
+    index(path)
+
+
+class TestBamDepth(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.bam = os.path.join(self.tempdir, "data.bam")
+        write_bam(self.bam, [("chr1", 1000), ("chr2", 1000)],
+                  [("chr1", 100, 50, 60, 30, 0),
+                   ("chr1", 120, 50, 10, 30, 0),
+                   ("chr1", 140, 10, 60, 30, 0x400),
+                   ("chr1", 150, 20, 60, 5, 0),
+                   ("chr2", 500, 10, 60, 30, 0)])
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_bam_depth_reader(self):
+        from hydra_genetics.utils.io.depth import BamDepthReader
+
+        reader = BamDepthReader(self.bam)
+        starts, ends, depths = reader.get_blocks("chr1", 0, 1000)
+        # duplicates and bases below the base quality aren't counted
+        self.assertEqual(list(zip(starts.tolist(), ends.tolist(), depths.tolist())), [(100, 120, 1), (120, 150, 2), (150, 170, 1)])
+        starts, ends, depths = reader.get_blocks("chr1", 110, 125)
+        self.assertEqual(list(zip(starts.tolist(), ends.tolist(), depths.tolist())), [(110, 120, 1), (120, 125, 2)])
+        self.assertEqual(len(reader.get_blocks("chr1", 10, 10)[0]), 0)
+        reader.close()
+
+        reader = BamDepthReader(self.bam, min_base_quality=0, min_mapping_quality=20)
+        starts, ends, depths = reader.get_blocks("chr1", 0, 1000)
+        self.assertEqual(list(zip(starts.tolist(), ends.tolist(), depths.tolist())), [(100, 170, 1)])
+        reader.close()
+
+    def test_load_bam_depth(self):
+        from hydra_genetics.utils.io.depth import load_bam_depth
+        regions = {0: [(90, 110), (130, 160)], 1: [(495, 505)]}
+        for processes in [1, 2]:
+            depth_store = load_bam_depth(self.bam, regions, ["chr1", "chr2"], processes=processes)
+            self.assertEqual(depth_store.contigs(), [0, 1])
+            self.assertEqual(depth_store.get_depth(0, 95, 96), 0)
+            self.assertEqual(depth_store.get_depth(0, 105, 106), 1)
+            self.assertEqual(depth_store.get_depth(0, 135, 136), 2)
+            self.assertEqual(depth_store.get_depth(0, 155, 156), 1)
+            self.assertEqual(depth_store.get_depth(1, 502, 503), 1)
+
+    def test_open_bam_window(self):
+        from hydra_genetics.utils.io.depth import BamDepthReader, load_bam_depth, open_bam_window
+        depth_store = load_bam_depth(self.bam, {"chr1": [(0, 1000)]})
+        window = open_bam_window(BamDepthReader(self.bam), chunk_size=7)
+        for start in range(90, 180, 3):
+            window.advance("chr1", start)
+            self.assertEqual(window.get_depth("chr1", start, start + 5), depth_store.get_depth("chr1", start, start + 5))
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
@@ -0,0 +1,112 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestInputFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.input = os.path.join(self.tempdir, "input.txt")
+        self.output = os.path.join(self.tempdir, "output.txt")
+        with open(self.input, 'w') as input_file:
+            input_file.write("data\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def write_output(self, content="report\n"):
+        with open(self.output, 'w') as output_file:
+            output_file.write(content)
+
+    def test_is_up_to_date(self):
+        from hydra_genetics.utils.io.fingerprint import InputFingerprint
+
+        def fingerprint(parameters={'sample': 'sample1'}):
+            return InputFingerprint([self.output, None], {'input': self.input, 'unused': None}, parameters)
+
+        self.assertFalse(fingerprint().is_up_to_date())
+        self.write_output()
+        fingerprint().write()
+        self.assertTrue(os.path.exists(self.output + InputFingerprint.suffix))
+        self.assertTrue(fingerprint().is_up_to_date())
+        self.assertFalse(fingerprint({'sample': 'sample2'}).is_up_to_date())
+
+        # a touched input is rehashed once, and then its checksum is reused
+        os.utime(self.input, ns=(0, 0))
+        self.assertTrue(fingerprint().is_up_to_date())
+        self.assertEqual(fingerprint().read()['inputs']['input']['mtime_ns'], 0)
+
+        with open(self.input, 'w') as input_file:
+            input_file.write("changed\n")
+        self.assertFalse(fingerprint().is_up_to_date())
+        fingerprint().write()
+        self.assertTrue(fingerprint().is_up_to_date())
+
+        self.write_output("edited report\n")
+        self.assertFalse(fingerprint().is_up_to_date())
+        os.remove(self.output)
+        self.assertFalse(fingerprint().is_up_to_date())
+
+    def test_get_file_entry(self):
+        from hydra_genetics.utils.io.fingerprint import get_file_entry
+        import hashlib
+
+        self.assertIsNone(get_file_entry(None))
+        entry = get_file_entry(self.input)
+        self.assertEqual(entry['sha256'], hashlib.sha256(b"data\n").hexdigest())
+        self.assertEqual(entry['size'], 5)
+        self.assertEqual(get_file_entry(self.input, dict(entry, sha256="reused"))['sha256'], "reused")
+        self.assertEqual(get_file_entry(self.input, dict(entry, sha256="reused", mtime_ns=0))['sha256'], entry['sha256'])
+
+    def test_is_up_to_date_rewritten_inputs(self):
+        from hydra_genetics.utils.io.fingerprint import InputFingerprint
+        import hashlib
+        from unittest.mock import patch
+
+        def is_up_to_date():
+            with patch("hydra_genetics.utils.io.fingerprint.hashlib.sha256", wraps=hashlib.sha256) as sha256:
+                up_to_date = InputFingerprint([self.output], {'input': self.input}, {}).is_up_to_date()
+            return up_to_date, sha256.call_count
+
+        self.write_output()
+        InputFingerprint([self.output], {'input': self.input}, {}).write()
+        self.assertEqual(is_up_to_date(), (True, 0))
+
+        # an input rewritten with identical content is read once, and then its checksum is reused
+        with open(self.input, 'w') as input_file:
+            input_file.write("data\n")
+        os.utime(self.input, ns=(10**18, 10**18))
+        self.assertEqual(is_up_to_date(), (True, 1))
+        self.assertEqual(is_up_to_date(), (True, 0))
+
+        # an input of the same size is read, one of another size isn't
+        with open(self.input, 'w') as input_file:
+            input_file.write("diff\n")
+        self.assertEqual(is_up_to_date(), (False, 1))
+        with open(self.input, 'w') as input_file:
+            input_file.write("changed\n")
+        self.assertEqual(is_up_to_date(), (False, 0))
+
+        # fingerprints stored without checksums are outdated
+        fingerprint = InputFingerprint([self.output], {'input': self.input}, {})
+        fingerprint.write()
+        stored = fingerprint.read()
+        del stored['inputs']['input']['sha256']
+        with open(fingerprint.path, 'w') as fingerprint_file:
+            json.dump(stored, fingerprint_file)
+        self.assertFalse(is_up_to_date()[0])
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
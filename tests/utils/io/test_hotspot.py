@@ -58,7 +58,7 @@ class TestHotspots(unittest.TestCase):
         self.assertEqual("exon4", record.EXON)
         self.assertEqual("NM_002524", record.ACCESSION_NUMBER)
         self.assertEqual(160, len(record.VARIANTS))
-        self.assertListEqual([{'extended': False, "variants": []} for i in range(160)], record.VARIANTS)
+        self.assertListEqual([{'extended': False, "variants": []} for i in range(160)], list(record.VARIANTS))
 
         record = reader.next()
         self.assertEqual("NC_000001.10", record.CHROMOSOME)
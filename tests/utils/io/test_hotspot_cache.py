@@ -0,0 +1,78 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestHotspotCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tempdir, "cache")
+        self.hotspot = os.path.join(self.tempdir, "hotspot")
+        with open(self.hotspot, 'w') as hotspots:
+            hotspots.write("#Chr\tStart\tEnd\tGene\tCDS_mutation_syntax\tAA_mutation_syntax\tReport\tcomment\tExon\tAccession_number\n")  # noqa
+            hotspots.write("NC_000001.10\t115252190\t115252349\tNRAS\t-\t-\tindel\t-\texon4\tNM_002524\n")
+            hotspots.write("NC_000001.10\t115252202\t115252202\tNRAS\tc.C438\tp.A146\thotspot\t-\texon4\tNM_002524\n")
+            hotspots.write("NC_000017.10\t37880986\t37880987\tERBB2\t-\tp.Y772\tregion_all\t-\texon20\tNM_004448\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_load_hotspots_cached(self):
+        from hydra_genetics.utils.io.hotspot_cache import HotspotCache
+        from hydra_genetics.utils.io.hotspot_report import load_hotspots
+        from hydra_genetics.utils.models.hotspot import ReportClass
+
+        cache = HotspotCache(self.cache_dir)
+        key = cache.get_key(self.hotspot)
+        self.assertIsNone(cache.load(key))
+
+        parsed = load_hotspots(self.hotspot, cache)
+        self.assertTrue(os.path.exists(cache.get_path(key)))
+        cached = load_hotspots(self.hotspot, cache)
+        self.assertIsNot(parsed, cached)
+        self.assertEqual(list(cached.keys()), list(parsed.keys()))
+        for report in parsed:
+            self.assertEqual([str(h) for h in cached[report]], [str(h) for h in parsed[report]])
+        hotspot = cached[ReportClass.hotspot].overlap("NC_000001.10", 115252202, 115252202)
+        self.assertEqual([h.GENE for h in hotspot], ["NRAS"])
+        self.assertEqual(hotspot[0].ACCESSION_NUMBER, "NM_002524")
+        self.assertEqual(len(hotspot[0].VARIANTS), 1)
+
+        # an edited file gets a new key
+        with open(self.hotspot, 'a') as hotspots:
+            hotspots.write("NC_000012.11\t25398279\t25398279\tKRAS\tc.G40\tp.V14\tregion\t-\texon2\tNM_004985\n")
+        self.assertNotEqual(cache.get_key(self.hotspot), key)
+        self.assertEqual(len(load_hotspots(self.hotspot, cache)[ReportClass.region]), 1)
+
+        # corrupt entries are ignored
+        with open(cache.get_path(key), 'wb') as cache_file:
+            cache_file.write(b"corrupt")
+        self.assertIsNone(cache.load(key))
+
+    def test_evict(self):
+        from hydra_genetics.utils.io.hotspot_cache import HotspotCache
+
+        cache = HotspotCache(self.cache_dir)
+        for i, key in enumerate(["a", "b", "c"]):
+            cache.store(key, "x" * 1000)
+            os.utime(cache.get_path(key), (i, i))
+        # the oldest entry was used last and is kept
+        cache.load("a")
+        cache.max_size = 2500
+        cache.evict()
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), sorted([os.path.basename(cache.get_path("a")),
+                                                                     os.path.basename(cache.get_path("c"))]))
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
@@ -1,6 +1,7 @@
 # vim: syntax=python tabstop=4 expandtab
 # coding: utf-8
 
+import importlib.util
 import logging
 import os
 import shutil
@@ -430,6 +431,587 @@ class TestWp1Reports(unittest.TestCase):
         self.assertEqual(get_read_level(levels, -15), ("-", "zero"))
         self.assertEqual(get_read_level(levels, "-"), ("-", "zero"))
 
+    def test_load_hotspots(self):
+        from hydra_genetics.utils.io.hotspot_report import load_hotspots
+        from hydra_genetics.utils.models.hotspot import ReportClass
+
+        reports = load_hotspots(self.hotspot)
+        self.assertEqual(list(reports.keys()), [ReportClass.hotspot, ReportClass.region_all, ReportClass.region, ReportClass.indel])
+        self.assertEqual([h.GENE for h in reports[ReportClass.hotspot]], ["ALK", "EGFR", "BRAF", "MET"])
+        self.assertEqual([h.GENE for h in reports[ReportClass.hotspot].overlap("NC_000007.13", 140498359, 140498362)], ["EGFR"])
+        self.assertEqual(len(reports[ReportClass.indel].overlap("NC_000016.11", 81954789, 81954790)), 1)
+        self.assertEqual(reports[ReportClass.indel].overlap("NC_000016.11", 81954796, 81954800), [])
+        self.assertEqual(reports[ReportClass.indel].overlap("NC_000002.11", 29445271, 29445271), [])
+
+        with open(self.hotspot) as hotspot_file:
+            header = hotspot_file.readline()
+        invalid = os.path.join(self.tempdir, "invalid.hotspot")
+        for line in ["NC_000002.11\tinvalid\t29445271\n", "NC_000002.11\t29445271\n"]:
+            with open(invalid, "w") as hotspot_file:
+                hotspot_file.write(header + line)
+            with self.assertRaises(ValueError):
+                load_hotspots(invalid)
+
+    def test_read_annotated_variants(self):
+        from hydra_genetics.utils.io.hotspot_report import read_annotated_variants
+        from pysam import VariantFile
+
+        result = list(read_annotated_variants(VariantFile(self.vcf_vep + ".gz")))
+        self.assertEqual(len(result), 7)
+        self.assertEqual(result[0][1], "chr2_29445270_29445271_G_A")
+        self.assertEqual(result[0][2], "NM_004304.4")
+
+        result = list(read_annotated_variants(VariantFile(self.vcf_vep + ".gz"), VariantFile(self.vcf_vep_wo_pick + ".gz")))
+        self.assertEqual([r[1] for r in result], ["chr2_29445270_29445271_G_A",
+                                                  "chr2_29445281_29445282_G_A",
+                                                  "chr7_140498358_140498362_CTTT_C",
+                                                  "chr8_145738767_145738768_G_C",
+                                                  "chr8_145742513_145742514_A_G",
+                                                  "chr16_81954788_81954789_C_GT",
+                                                  "chr16_81954788_81954789_C_G"])
+
+    def write_manifest(self, name, outputs):
+        manifest = os.path.join(self.tempdir, name)
+        with open(manifest, 'w') as manifest_file:
+            manifest_file.write("sample\toutput\tvcf\tgvcf\tvcf_wo_pick\n")
+            manifest_file.write("\t".join(["sample1", outputs[0], self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                           self.vcf_vep_wo_pick + ".gz"]) + "\n")
+            manifest_file.write("\t".join(["sample1", outputs[1], self.vcf_vep + ".gz", self.gvcf + ".gz", "-"]) + "\n")
+        return manifest
+
+    def test_generate_hotspot_reports(self):
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report, generate_hotspot_reports
+        from hydra_genetics.utils.io.hotspot_report import get_hotspot_report_parallel, read_sample_manifest
+        from unittest.mock import patch
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+        column_yaml = "tests/utils/files/report_columns_select_column2.yaml"
+
+        expected = []
+        for name, wo_pick in [("single_wo_pick.report", self.vcf_vep_wo_pick + ".gz"), ("single.report", None)]:
+            report = os.path.join(self.tempdir, name)
+            generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, wo_pick, column_yaml)
+            with open(report) as report_file:
+                expected.append(report_file.read())
+
+        for processes in [1, 2]:
+            outputs = [os.path.join(self.tempdir, "batch_{}_{}.report".format(processes, i)) for i in range(2)]
+            samples = read_sample_manifest(self.write_manifest("manifest_{}.tsv".format(processes), outputs))
+            self.assertEqual(samples[0]['vcf_wo_pick'], self.vcf_vep_wo_pick + ".gz")
+            self.assertNotIn('vcf_wo_pick', samples[1])
+            generate_hotspot_reports(samples, levels, self.hotspot, self.reference, column_yaml, processes)
+            for output, expected_report in zip(outputs, expected):
+                with open(output) as report_file:
+                    self.assertEqual(report_file.read(), expected_report)
+
+        # the contigs of a single sample are processed in parallel
+        output = os.path.join(self.tempdir, "batch_single.report")
+        samples = read_sample_manifest(self.write_manifest("manifest_single.tsv", [output, output]))[:1]
+        with patch("hydra_genetics.utils.io.hotspot_report.get_hotspot_report_parallel",
+                   wraps=get_hotspot_report_parallel) as parallel:
+            generate_hotspot_reports(samples, levels, self.hotspot, self.reference, column_yaml, 2)
+        self.assertEqual(parallel.call_count, 1)
+        self.assertEqual(parallel.call_args.kwargs['processes'], 2)
+        with open(output) as report_file:
+            self.assertEqual(report_file.read(), expected[0])
+
+    def test_hotspot_report_batch_command(self):
+        from click.testing import CliRunner
+        from hydra_genetics.commands.hotspot_report import hotspot_report
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        expected = os.path.join(self.tempdir, "expected.report")
+        generate_hotspot_report("sample1", expected, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                self.reference, self.vcf_vep_wo_pick + ".gz")
+
+        outputs = [os.path.join(self.tempdir, "cli_{}.report".format(i)) for i in range(2)]
+        result = CliRunner().invoke(hotspot_report, ["batch", "-m", self.write_manifest("manifest.tsv", outputs),
+                                                     "-H", self.hotspot, "-c", self.reference,
+                                                     "-l", "30", "low", "yes", "-l", "300", "ok", "yes",
+                                                     "-l", "0", "low", "not analyzable"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with open(outputs[0]) as report_file, open(expected) as expected_file:
+            self.assertEqual(report_file.read(), expected_file.read())
+
+    def test_generate_hotspot_report_unchanged_inputs(self):
+        import shutil
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+        vcf = os.path.join(self.tempdir, "copy.vcf.gz")
+        shutil.copy(self.vcf_vep + ".gz", vcf)
+        shutil.copy(self.vcf_vep + ".gz.tbi", vcf + ".tbi")
+
+        report = os.path.join(self.tempdir, "fingerprint.report")
+        generate_hotspot_report("sample1", report, levels, self.hotspot, vcf, self.gvcf + ".gz", self.reference)
+        self.assertFalse(os.path.exists(report + ".fingerprint.json"))
+        generate_hotspot_report("sample1", report, levels, self.hotspot, vcf, self.gvcf + ".gz", self.reference,
+                                fingerprint=True, force=True)
+        self.assertFalse(os.path.exists(report + ".fingerprint.json"))
+        generate_hotspot_report("sample1", report, levels, self.hotspot, vcf, self.gvcf + ".gz", self.reference,
+                                fingerprint=True)
+        self.assertTrue(os.path.exists(report + ".fingerprint.json"))
+        with open(report) as report_file:
+            expected = report_file.read()
+
+        def generate(fingerprint=True, **kwargs):
+            with open(report, 'w') as report_file:
+                report_file.write(expected.upper())
+            generate_hotspot_report("sample1", report, levels, self.hotspot, vcf, self.gvcf + ".gz", self.reference,
+                                    fingerprint=fingerprint, **kwargs)
+            with open(report) as report_file:
+                return report_file.read()
+
+        # unchanged, touched or rewritten inputs keep the existing report
+        self.assertEqual(generate(), expected.upper())
+        os.utime(vcf, ns=(0, 0))
+        self.assertEqual(generate(), expected.upper())
+        with open(vcf, "rb") as vcf_file:
+            content = vcf_file.read()
+        with open(vcf, "wb") as vcf_file:
+            vcf_file.write(content)
+        self.assertEqual(generate(), expected.upper())
+        self.assertEqual(generate(force=True), expected)
+        self.assertEqual(generate(fingerprint=False), expected)
+        self.assertEqual(generate(coverage_output=report + ".coverage"), expected)
+        self.assertEqual(generate(coverage_output=report + ".coverage"), expected.upper())
+
+        shutil.copy(self.vcf_vep_wo_pick + ".gz", vcf)
+        shutil.copy(self.vcf_vep_wo_pick + ".gz.tbi", vcf + ".tbi")
+        self.assertNotEqual(generate(coverage_output=report + ".coverage"), expected.upper())
+
+    def test_build_hotspot_report(self):
+        from hydra_genetics.utils.io.hotspot_report import build_hotspot_report, generate_hotspot_report
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        report = os.path.join(self.tempdir, "api.report")
+        coverage = os.path.join(self.tempdir, "api.coverage")
+        generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                self.reference, coverage_output=coverage)
+        with open(report) as report_file, open(coverage) as coverage_file:
+            expected = [line.rstrip("\n").split("\t") for line in report_file]
+            expected_coverage = [line.rstrip("\n").split("\t") for line in coverage_file]
+
+        for streaming in [False, True]:
+            result = build_hotspot_report("sample1", levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                          self.reference, coverage=True, streaming=streaming)
+            self.assertEqual([result.coverage.columns] + list(result.coverage), expected_coverage)
+            self.assertEqual([result.columns] + list(result), expected)
+
+        result = build_hotspot_report("sample1", levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                      self.reference)
+        self.assertIsNone(result.coverage)
+        data_frame = result.to_pandas()
+        self.assertEqual(list(data_frame.columns), expected[0])
+        self.assertEqual(data_frame.values.tolist(), expected[1:])
+
+    def test_generate_hotspot_report_streaming(self):
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        for wo_pick, column_yaml in [(None, None),
+                                     (self.vcf_vep_wo_pick + ".gz", "tests/utils/files/report_columns_select_column2.yaml")]:
+            reports = []
+            for streaming in [False, True]:
+                report = os.path.join(self.tempdir, "streaming_{}.report".format(streaming))
+                coverage = os.path.join(self.tempdir, "streaming_{}.coverage".format(streaming))
+                generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                        self.reference, wo_pick, column_yaml, coverage_output=coverage, streaming=streaming)
+                with open(report) as report_file, open(coverage) as coverage_file:
+                    reports.append((report_file.read(), coverage_file.read()))
+            self.assertEqual(reports[0], reports[1])
+
+        # the hotspots of a contig without variants aren't in position order in the hotspot file
+        from pysam import VariantFile, tabix_index
+        vcf = os.path.join(self.tempdir, "without_chr7.vcf")
+        with VariantFile(self.vcf_vep + ".gz") as variants, VariantFile(vcf, "w", header=variants.header) as output:
+            for variant in variants:
+                if not variant.chrom == "chr7":
+                    output.write(variant)
+        tabix_index(vcf, preset="vcf", force=True)
+        reports = []
+        for streaming in [False, True]:
+            report = os.path.join(self.tempdir, "without_chr7_{}.report".format(streaming))
+            generate_hotspot_report("sample1", report, levels, self.hotspot, vcf + ".gz", self.gvcf + ".gz", self.reference,
+                                    coverage_output=report + ".coverage", streaming=streaming)
+            with open(report) as report_file, open(report + ".coverage") as coverage_file:
+                reports.append((report_file.read(), coverage_file.read()))
+        self.assertEqual(reports[0], reports[1])
+
+        with self.assertRaises(ValueError):
+            generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, processes=2, streaming=True)
+
+    def test_generate_hotspot_report_indexed(self):
+        import gzip
+        from pysam import TabixFile
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report, get_index_file
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        report = os.path.join(self.tempdir, "plain.report")
+        coverage = os.path.join(self.tempdir, "plain.coverage")
+        generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                self.reference, self.vcf_vep_wo_pick + ".gz", coverage_output=coverage)
+        for streaming in [False, True]:
+            indexed_report = os.path.join(self.tempdir, "indexed_{}.report.gz".format(streaming))
+            indexed_coverage = os.path.join(self.tempdir, "indexed_{}.coverage.gz".format(streaming))
+            generate_hotspot_report("sample1", indexed_report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, self.vcf_vep_wo_pick + ".gz", coverage_output=indexed_coverage,
+                                    streaming=streaming, indexed=True)
+            for plain, indexed in [(report, indexed_report), (coverage, indexed_coverage)]:
+                self.assertTrue(os.path.exists(get_index_file(indexed)))
+                with open(plain) as plain_file, gzip.open(indexed, 'rt') as indexed_file:
+                    plain_lines = plain_file.read().split("\n")
+                    indexed_lines = indexed_file.read().rstrip("\n").split("\n")
+                self.assertEqual(plain_lines[0], indexed_lines[0])
+                self.assertEqual(sorted(plain_lines[1:]), sorted(indexed_lines[1:]))
+                rows = [line.split("\t") for line in indexed_lines[1:]]
+                self.assertEqual([row[1:4] for row in rows],
+                                 sorted([row[1:4] for row in rows], key=lambda row: (row[0], int(row[1]), int(row[2]))))
+
+            with open(report) as plain_file, TabixFile(indexed_report) as tabix:
+                rows = [line.split("\t") for line in plain_file.read().split("\n")[1:]]
+                expected = [row for row in rows if row[1] == "NC_000007.13" and int(row[2]) <= 140453137 and
+                            int(row[3]) >= 140453136]
+                region = [row.split("\t") for row in tabix.fetch("NC_000007.13", 140453135, 140453137)]
+                self.assertTrue(len(expected) > 0)
+                self.assertEqual(sorted(region), sorted(expected))
+
+        with self.assertRaises(ValueError):
+            generate_hotspot_report("sample1", indexed_report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, None, "tests/utils/files/report_columns_vep_hide_column.yaml",
+                                    force=True, indexed=True)
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "requires pyarrow")
+    def test_generate_hotspot_report_columnar(self):
+        import pyarrow
+        import pyarrow.parquet
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+        column_yaml = "tests/utils/files/report_columns_select_column2.yaml"
+
+        report = os.path.join(self.tempdir, "columnar.report")
+        coverage = os.path.join(self.tempdir, "columnar.coverage")
+        generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                self.reference, self.vcf_vep_wo_pick + ".gz", column_yaml, coverage_output=coverage)
+        expected = []
+        for file_name in [report, coverage]:
+            with open(file_name) as report_file:
+                lines = report_file.read().split("\n")
+            expected.append((lines[0].split("\t"), [line.split("\t") for line in lines[1:]]))
+
+        def read_arrow(file_name):
+            with pyarrow.OSFile(file_name) as arrow_file:
+                return pyarrow.ipc.open_file(arrow_file).read_all()
+
+        for output_format, read_table in [("parquet", pyarrow.parquet.read_table), ("arrow", read_arrow)]:
+            for streaming in [False, True]:
+                columnar_report = os.path.join(self.tempdir, "columnar_{}.{}".format(streaming, output_format))
+                columnar_coverage = os.path.join(self.tempdir, "columnar_coverage_{}.{}".format(streaming, output_format))
+                generate_hotspot_report("sample1", columnar_report, levels, self.hotspot, self.vcf_vep + ".gz",
+                                        self.gvcf + ".gz", self.reference, self.vcf_vep_wo_pick + ".gz", column_yaml,
+                                        coverage_output=columnar_coverage, streaming=streaming, output_format=output_format)
+                for file_name, (header, rows) in zip([columnar_report, columnar_coverage], expected):
+                    table = read_table(file_name)
+                    self.assertEqual(table.column_names, header)
+                    self.assertEqual(table.num_rows, len(rows))
+                    self.assertEqual(table.column('start').to_pylist(), [int(row[header.index('start')]) for row in rows])
+                    self.assertEqual(table.column('chr').to_pylist(), [row[header.index('chr')] for row in rows])
+                header, rows = expected[0]
+                table = read_table(columnar_report)
+                self.assertEqual(table.schema.field('report').type, pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+                self.assertEqual(table.column('ref_depth').to_pylist(),
+                                 [None if row[header.index('ref_depth')] == "-" else int(row[header.index('ref_depth')])
+                                  for row in rows])
+
+    def test_output_format(self):
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+        report = os.path.join(self.tempdir, "format.report")
+        for output_format, indexed in [("csv", False), ("parquet", True)]:
+            with self.assertRaises(ValueError):
+                generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                        self.reference, indexed=indexed, output_format=output_format)
+
+    def test_sort_rows(self):
+        from hydra_genetics.utils.io.hotspot_report import sort_rows
+        rows = [[str(position % 7), str(index)] for index, position in enumerate(range(50, 0, -1))]
+        expected = sorted(rows, key=lambda row: int(row[0]))
+        for chunk_size in [3, 50, 100]:
+            self.assertEqual(list(sort_rows(rows, lambda row: int(row[0]), chunk_size)), expected)
+
+    def test_generate_hotspot_report_bam(self):
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        from tests.utils.io.test_depth import write_bam
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        bam = os.path.join(self.tempdir, "sample1.bam")
+        with open(self.reference) as reference:
+            contigs = [(line.split("\t")[0], int(line.split("\t")[3])) for line in reference.read().split("\n")[1:]]
+        write_bam(bam, contigs, [("chr7", 140453100, 100, 60, 30, 0)] * 30 + [("chr16", 81954750, 100, 60, 30, 0)] * 5)
+
+        reports = []
+        for processes, streaming in [(1, False), (2, False), (1, True)]:
+            report = os.path.join(self.tempdir, "bam_{}_{}.report".format(processes, streaming))
+            coverage = os.path.join(self.tempdir, "bam_{}_{}.coverage".format(processes, streaming))
+            generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", None, self.reference,
+                                    self.vcf_vep_wo_pick + ".gz", processes=processes, coverage_output=coverage,
+                                    streaming=streaming, bam_file=bam)
+            with open(report) as report_file, open(coverage) as coverage_file:
+                reports.append((report_file.read(), coverage_file.read()))
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual(reports[0], reports[2])
+
+        rows = [line.split("\t") for line in reports[0][0].split("\n")[1:]]
+        depths = {(row[1], row[2]): row[7] for row in rows}
+        self.assertEqual(depths[("NC_000007.13", "140453136")], "30")
+        self.assertEqual(depths[("NC_000016.11", "81954789")], "5")
+        self.assertEqual(depths[("NC_000002.11", "29445271")], "0")
+
+        with self.assertRaises(ValueError):
+            generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, bam_file=bam)
+
+    def test_generate_hotspot_report_threads(self):
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        reports = []
+        for streaming, threads in [(False, 1), (False, 3), (True, 3)]:
+            report = os.path.join(self.tempdir, "threads_{}_{}.report".format(streaming, threads))
+            generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, self.vcf_vep_wo_pick + ".gz", streaming=streaming, threads=threads)
+            with open(report) as report_file:
+                reports.append(report_file.read())
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual(reports[0], reports[2])
+
+    def test_generate_hotspot_report_parallel(self):
+        from hydra_genetics.utils.io.chr import ChrTranslater
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report, get_report_contigs, load_hotspots
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        self.assertEqual(get_report_contigs(load_hotspots(self.hotspot), ChrTranslater(self.reference), self.vcf_vep + ".gz"),
+                         ["chr2", "chr7", "chr8", "chr16"])
+
+        for wo_pick, column_yaml in [(None, None),
+                                     (self.vcf_vep_wo_pick + ".gz", "tests/utils/files/report_columns_select_column2.yaml")]:
+            reports = []
+            for processes in [1, 3]:
+                report = os.path.join(self.tempdir, "parallel_{}.report".format(processes))
+                coverage = os.path.join(self.tempdir, "parallel_{}.coverage".format(processes))
+                generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                        self.reference, wo_pick, column_yaml, processes=processes, coverage_output=coverage)
+                with open(report) as report_file, open(coverage) as coverage_file:
+                    reports.append((report_file.read(), coverage_file.read()))
+            self.assertEqual(reports[0], reports[1])
+
+    def test_generate_hotspot_report_hotspot_only(self):
+        from pysam import VariantFile
+        from hydra_genetics.utils.io.chr import ChrTranslater, ContigDictionary
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report, get_hotspot_regions, \
+            get_report_hotspots, load_hotspots, read_annotated_variants
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        variants = VariantFile(self.vcf_vep_wo_pick + ".gz")
+        regions = get_hotspot_regions(get_report_hotspots(load_hotspots(self.hotspot)),
+                                      ContigDictionary(ChrTranslater(self.reference)), variants.header)
+        contig_order = list(variants.header.contigs)
+        self.assertEqual(regions, sorted(regions, key=lambda region: (contig_order.index(region[0]), region[1])))
+        self.assertEqual(regions[:2], [("chr2", 29445269, 29445281), ("chr7", 116412041, 116412043)])
+        result = list(read_annotated_variants(VariantFile(self.vcf_vep + ".gz"), variants, regions=regions))
+        self.assertEqual(len(result), len({variant_key for _, variant_key, _ in result}))
+
+        for wo_pick, column_yaml in [(None, None),
+                                     (self.vcf_vep_wo_pick + ".gz", "tests/utils/files/report_columns_select_column2.yaml")]:
+            report = os.path.join(self.tempdir, "all.report")
+            generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, wo_pick, column_yaml)
+            with open(report) as report_file:
+                lines = report_file.read().split("\n")
+            self.assertTrue(any("4-other" in line for line in lines))
+            expected = "\n".join(line for line in lines if "4-other" not in line)
+
+            for processes, streaming in [(1, False), (3, False), (1, True)]:
+                report = os.path.join(self.tempdir, "hotspot_only_{}_{}.report".format(processes, streaming))
+                generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                        self.reference, wo_pick, column_yaml, processes=processes, streaming=streaming,
+                                        hotspot_only=True)
+                with open(report) as report_file:
+                    self.assertEqual(report_file.read(), expected)
+
+    def test_generate_hotspot_report_shards(self):
+        from click.testing import CliRunner
+        from hydra_genetics.commands.hotspot_report import hotspot_report
+        from hydra_genetics.utils.io.hotspot_report import SHARD_KEY_COLUMN, generate_hotspot_report, merge_report_shards
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        # the EGFR deletion starts in the first shard and is read by the second shard through the hotspot region
+        beds = [["chr2\t0\t29445275", "chr7\t0\t140498360", "NC_000008.11\t0\t145740000"],
+                ["chr2\t29445275\t243199373", "chr7\t140498360\t159138663", "chr8\t145740000\t146364022",
+                 "chr16\t0\t90354753"]]
+        regions_files = []
+        for index, lines in enumerate(beds):
+            regions_files.append(os.path.join(self.tempdir, "shard_{}.bed".format(index)))
+            with open(regions_files[-1], "w") as bed:
+                bed.write("track name=shard\n" + "\n".join(lines) + "\n")
+
+        def read(file_name):
+            with open(file_name) as report_file:
+                return report_file.read()
+
+        for wo_pick, column_yaml, hotspot_only in [(None, None, False),
+                                                   (self.vcf_vep_wo_pick + ".gz",
+                                                    "tests/utils/files/report_columns_select_column2.yaml", False),
+                                                   (None, None, True)]:
+            report = os.path.join(self.tempdir, "whole.report")
+            coverage = os.path.join(self.tempdir, "whole.coverage")
+            generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, wo_pick, column_yaml, coverage_output=coverage, hotspot_only=hotspot_only)
+            for processes, streaming in [(1, False), (3, False), (1, True)]:
+                shards = []
+                for index, regions_file in enumerate(regions_files):
+                    shard = os.path.join(self.tempdir, "shard_{}.report".format(index))
+                    generate_hotspot_report("sample1", shard, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                            self.reference, wo_pick, column_yaml, processes=processes,
+                                            coverage_output=shard + ".coverage", streaming=streaming,
+                                            hotspot_only=hotspot_only, regions_file=regions_file)
+                    self.assertTrue(read(shard).startswith(SHARD_KEY_COLUMN + "\t"))
+                    shards.append(shard)
+                self.assertGreater(len(read(shards[0]).split("\n")), 1)
+                self.assertGreater(len(read(shards[1]).split("\n")), 1)
+                merge_report_shards(shards, report + ".merged")
+                self.assertEqual(read(report + ".merged"), read(report))
+                merge_report_shards([shard + ".coverage" for shard in shards], coverage + ".merged", chunk_size=2)
+                self.assertEqual(read(coverage + ".merged"), read(coverage))
+
+        result = CliRunner().invoke(hotspot_report, ["merge-shards", report + ".cli"] + shards)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(read(report + ".cli"), read(report))
+
+        with self.assertRaises(ValueError):
+            merge_report_shards([shards[0], shards[0]], report + ".merged")
+        with self.assertRaises(ValueError):
+            merge_report_shards([shards[0], report], report + ".merged")
+        with self.assertRaises(ValueError):
+            generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, regions_file=regions_files[0], indexed=True)
+
+    def test_report_worker(self):
+        import socket
+        import threading
+        from click.testing import CliRunner
+        from hydra_genetics.commands.hotspot_report import hotspot_report
+        from hydra_genetics.exceptions import ReportWorkerError
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        from hydra_genetics.utils.io.report_worker import ReportWorker, is_worker_running, stop_worker, submit_hotspot_report
+        from unittest.mock import patch
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+        column_yaml = "tests/utils/files/report_columns_select_column2.yaml"
+
+        def read(file_name):
+            with open(file_name) as report_file:
+                return report_file.read()
+
+        expected = os.path.join(self.tempdir, "expected.report")
+        generate_hotspot_report("sample1", expected, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                self.reference, self.vcf_vep_wo_pick + ".gz", column_yaml)
+
+        # a socket left by a worker that is no longer running is replaced
+        socket_path = os.path.join(self.tempdir, "worker.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(socket_path)
+        self.assertFalse(is_worker_running(socket_path))
+
+        report_worker = ReportWorker(socket_path, self.hotspot, self.reference, column_yaml)
+        thread = threading.Thread(target=report_worker.serve)
+        thread.start()
+        try:
+            self.assertTrue(is_worker_running(socket_path))
+            with self.assertRaises(ReportWorkerError):
+                ReportWorker(socket_path, self.hotspot, self.reference, column_yaml)
+
+            arguments = {'sample': "sample1", 'levels': levels, 'hotspot_file': self.hotspot, 'vcf_file': self.vcf_vep + ".gz",
+                         'gvcf_file': self.gvcf + ".gz", 'chr_mapping': self.reference,
+                         'vcf_file_wo_pick': self.vcf_vep_wo_pick + ".gz", 'column_yaml_file': column_yaml}
+            report = os.path.join(self.tempdir, "worker.report")
+            for _ in range(2):
+                self.assertTrue(submit_hotspot_report(socket_path, output=report, force=True, **arguments))
+                self.assertEqual(read(report), read(expected))
+
+            # the report rows are built in parallel from the inputs loaded by the worker
+            with patch("hydra_genetics.utils.io.hotspot_report.load_report_inputs", side_effect=AssertionError):
+                self.assertTrue(submit_hotspot_report(socket_path, output=report, force=True, processes=2, **arguments))
+            self.assertEqual(read(report), read(expected))
+
+            # reports for other files than the ones loaded by the worker are generated in process
+            report = os.path.join(self.tempdir, "other.report")
+            self.assertFalse(submit_hotspot_report(socket_path, output=report, **dict(arguments, column_yaml_file=None)))
+            self.assertNotEqual(read(report), read(expected))
+
+            with self.assertRaises(ReportWorkerError):
+                submit_hotspot_report(socket_path, output=report, **dict(arguments, vcf_file=self.vcf_vep))
+
+            # a modified hotspot file is loaded again
+            with open(self.hotspot) as hotspot_file:
+                lines = hotspot_file.readlines()
+            with open(self.hotspot, "w") as hotspot_file:
+                hotspot_file.writelines(lines[:2])
+            generate_hotspot_report("sample1", expected, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                    self.reference, self.vcf_vep_wo_pick + ".gz", column_yaml, force=True)
+            result = CliRunner().invoke(hotspot_report, ["submit", "-S", socket_path, "--sample", "sample1", "--output", report,
+                                                         "--vcf", self.vcf_vep + ".gz", "--gvcf", self.gvcf + ".gz",
+                                                         "--vcf-wo-pick", self.vcf_vep_wo_pick + ".gz", "-H", self.hotspot,
+                                                         "-c", self.reference, "-y", column_yaml, "-l", "300", "ok", "yes",
+                                                         "-l", "30", "low", "yes", "-l", "0", "low", "not analyzable"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(read(report), read(expected))
+
+            # an invalid hotspot file fails the request, not the worker
+            with open(self.hotspot, "w") as hotspot_file:
+                hotspot_file.writelines(lines[:2] + ["NC_000002.11\tinvalid\t29445271\n"])
+            with self.assertRaises(ReportWorkerError):
+                submit_hotspot_report(socket_path, output=report, force=True, **arguments)
+            self.assertTrue(is_worker_running(socket_path))
+            with open(self.hotspot, "w") as hotspot_file:
+                hotspot_file.writelines(lines[:2])
+            self.assertTrue(submit_hotspot_report(socket_path, output=report, force=True, **arguments))
+            self.assertEqual(read(report), read(expected))
+        finally:
+            self.assertTrue(stop_worker(socket_path))
+            thread.join()
+        self.assertFalse(os.path.exists(socket_path))
+        self.assertFalse(stop_worker(socket_path))
+
+        report = os.path.join(self.tempdir, "in_process.report")
+        self.assertFalse(submit_hotspot_report(socket_path, output=report, **arguments))
+        self.assertEqual(read(report), read(expected))
+
+    def test_coverage_report(self):
+        from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
+        levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+        report = os.path.join(self.tempdir, "coverage.report")
+        generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                self.reference)
+        with open(report) as report_file:
+            expected = report_file.read()
+        coverage = os.path.join(self.tempdir, "coverage.tsv")
+        generate_hotspot_report("sample1", report, levels, self.hotspot, self.vcf_vep + ".gz", self.gvcf + ".gz",
+                                self.reference, coverage_output=coverage)
+        with open(report) as report_file:
+            self.assertEqual(report_file.read(), expected)
+        with open(coverage) as coverage_file:
+            rows = [line.rstrip("\n").split("\t") for line in coverage_file]
+        self.assertEqual(rows[0], ['sample', 'chr', 'start', 'stop', 'gene', 'report', 'min_depth', 'mean_depth',
+                                   'median_depth', 'fraction_300x', 'fraction_30x', 'fraction_0x'])
+        with open(self.hotspot) as hotspot_file:
+            self.assertEqual(len(rows) - 1, len([line for line in hotspot_file if not line.startswith("#")]))
+        for row in rows[1:]:
+            self.assertEqual(row[0], "sample1")
+            self.assertLessEqual(float(row[6]), float(row[7]))
+            self.assertEqual(row[-1], "1.0000")
+
     def test_filtered_mutation_creation_annovar(self):
         from hydra_genetics.utils.io.hotspot_report import generate_hotspot_report
         levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
@@ -0,0 +1,127 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestReportBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_write_benchmark_inputs(self):
+        from hydra_genetics.utils.io.report_benchmark import write_benchmark_inputs
+        from pysam import VariantFile
+        inputs = write_benchmark_inputs(os.path.join(self.tempdir, "inputs"), 30, 200, 440, 15)
+        with open(inputs['hotspot_file']) as hotspots:
+            self.assertEqual(sum(1 for _ in hotspots), 31)
+        with VariantFile(inputs['vcf_file']) as vcf:
+            self.assertEqual(len(vcf.header.info['CSQ'].description.split("Format: ")[1].split("|")), 15)
+            self.assertEqual(sum(1 for _ in vcf), 200)
+        with VariantFile(inputs['gvcf_file']) as gvcf:
+            self.assertEqual(sum(1 for _ in gvcf), 440)
+
+        with open(inputs['vcf_file'], "rb") as vcf:
+            first = vcf.read()
+        inputs = write_benchmark_inputs(os.path.join(self.tempdir, "again"), 30, 200, 440, 15)
+        with open(inputs['vcf_file'], "rb") as vcf:
+            self.assertEqual(vcf.read(), first)
+
+        with self.assertRaises(ValueError):
+            write_benchmark_inputs(os.path.join(self.tempdir, "invalid"), 30, 200, 440, 5)
+
+    def test_benchmark_command(self):
+        import subprocess
+        import sys
+        from hydra_genetics.commands.hotspot_report import hotspot_report
+        from hydra_genetics.utils.io.report_benchmark import BENCHMARK_MODES
+        mode_option = [option for option in hotspot_report.commands['benchmark'].params if option.name == "mode"][0]
+        self.assertEqual(tuple(mode_option.type.choices), BENCHMARK_MODES)
+        self.assertEqual(tuple(mode_option.default), BENCHMARK_MODES)
+
+        # the benchmark module is only imported when the benchmark is run
+        imported = subprocess.run([sys.executable, "-c", "import sys, hydra_genetics.commands.hotspot_report; "
+                                   "print('hydra_genetics.utils.io.report_benchmark' in sys.modules)"],
+                                  capture_output=True, text=True, check=True)
+        self.assertEqual(imported.stdout.strip(), "False")
+
+    def test_run_benchmarks(self):
+        import json
+        from hydra_genetics.utils.io.report_benchmark import BENCHMARK_MODES, run_benchmarks
+        output = os.path.join(self.tempdir, "results.jsonl")
+        work_dir = os.path.join(self.tempdir, "work")
+        results = run_benchmarks(output, hotspots=[20], variants=[100, 200], gvcf_records=[220], vep_columns=[12],
+                                 threads=[1, 2], repeat=2, work_dir=work_dir)
+
+        self.assertEqual(len(results), 2 * len(BENCHMARK_MODES) * 2)
+        with open(output) as result_file:
+            self.assertEqual([json.loads(line) for line in result_file], results)
+        for result in results:
+            if result['mode'] in ("streaming", "parallel"):
+                self.assertEqual([phase['phase'] for phase in result['phases']], ["load_inputs", "build", "write"])
+            elif result['mode'] == "format-row":
+                self.assertEqual([phase['phase'] for phase in result['phases']],
+                                 ["load_inputs", "match_variants", "load_depth", "format_row", "write"])
+            else:
+                self.assertEqual([phase['phase'] for phase in result['phases']],
+                                 ["load_inputs", "match_variants", "load_depth", "write"])
+            for phase in result['phases']:
+                self.assertEqual(len(phase['wall_times']), 2)
+                self.assertEqual(phase['wall_time'], min(phase['wall_times']))
+                self.assertGreater(phase['peak_memory'], 0)
+                self.assertEqual(phase['wall_time_per_row'], phase['wall_time'] / result['report_rows'])
+            self.assertEqual(result['coverage_rows'], 20)
+            self.assertIsNone(result['column_yaml_file'])
+            self.assertIn('cpus', result['environment'])
+
+        # the modes give the same report, hotspot-only without the variants outside the hotspots
+        case_directory = os.path.join(work_dir, "h20_v200_g220_c12_s1")
+        with open(os.path.join(case_directory, "report.serial.t1.tsv")) as report:
+            expected = report.read()
+        for mode in ["streaming", "parallel", "format-row"]:
+            with open(os.path.join(case_directory, "report.{}.t2.tsv".format(mode))) as report:
+                self.assertEqual(report.read(), expected)
+        rows = {(result['mode'], result['threads']): result['report_rows'] for result in results if result['variants'] == 200}
+        self.assertEqual(len(set(rows.values())), 2)
+        self.assertLess(rows[("hotspot-only", 1)], rows[("serial", 1)])
+
+        # the generated samples are reused
+        modified = os.path.getmtime(os.path.join(case_directory, "sample.vcf.gz"))
+        results = run_benchmarks(output, hotspots=[20], variants=[200], gvcf_records=[220], vep_columns=[12],
+                                 modes=["serial"], repeat=1, memory=False, work_dir=work_dir)
+        self.assertEqual(os.path.getmtime(os.path.join(case_directory, "sample.vcf.gz")), modified)
+        self.assertIsNone(results[0]['phases'][0]['peak_memory'])
+        with open(output) as result_file:
+            self.assertEqual(sum(1 for _ in result_file), 2 * len(BENCHMARK_MODES) * 2 + 1)
+
+        # rows formatted on their own give the serial report, also with the column yaml files of the tests
+        column_yaml_files = ["tests/utils/files/report_columns_vep.yaml",
+                             "tests/utils/files/report_columns_combine_columns_multi_level.yaml"]
+        results = run_benchmarks(output, hotspots=[20], variants=[200], gvcf_records=[220], vep_columns=[12],
+                                 modes=["serial", "format-row"], repeat=1, memory=False, work_dir=work_dir,
+                                 column_yaml_files=column_yaml_files)
+        self.assertEqual([(result['column_yaml_file'], result['mode']) for result in results],
+                         [(column_yaml, mode) for column_yaml in column_yaml_files for mode in ["serial", "format-row"]])
+        with open(os.path.join(case_directory, "report.serial.t1.tsv")) as report:
+            generated_header = report.readline()
+        for column_yaml in ["report_columns_vep", "report_columns_combine_columns_multi_level"]:
+            with open(os.path.join(case_directory, "report.{}.serial.t1.tsv".format(column_yaml))) as report:
+                expected = report.read()
+            with open(os.path.join(case_directory, "report.{}.format-row.t1.tsv".format(column_yaml))) as report:
+                self.assertEqual(report.read(), expected)
+            self.assertNotEqual(expected.split("\n")[0] + "\n", generated_header)
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
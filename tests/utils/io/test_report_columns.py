@@ -0,0 +1,119 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class Hotspot(object):
+    GENE = "BRAF"
+    COMMENT = "hotspot comment"
+
+
+class TestColumnPlan(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.levels = [(300, "ok", "yes"), (30, "low", "yes"), (0, "low", "not analyzable")]
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def write_yaml(self, content):
+        path = os.path.join(self.tempdir, "columns.yaml")
+        with open(path, "w") as yaml_file:
+            yaml_file.write(content)
+        return path
+
+    def data(self):
+        return {'sample': 'sample1', 'chr': 'NC_000007.13', 'start': 140453136, 'stop': 140453136, 'ref': 'A',
+                'alt': 'T', 'report': '1-hotspot', 'gvcf_depth': 500.5, 'ref_depth': 400, 'alt_depth': '100'}
+
+    def test_default_columns(self):
+        from hydra_genetics.utils.io.report_columns import ColumnPlan
+        plan = ColumnPlan()
+        self.assertEqual(plan.depth_field, "DP")
+        self.assertEqual(plan.header, ['sample', 'chr', 'start', 'stop', 'ref', 'alt', 'report', 'gvcf_depth',
+                                       'ref_depth', 'alt_depth'])
+        self.assertEqual(plan.types, {'sample': 'category', 'chr': 'category', 'start': 'int', 'stop': 'int',
+                                      'report': 'category', 'gvcf_depth': 'float', 'ref_depth': 'int'})
+        self.assertEqual(plan.format_row(self.data(), None, None, None, 500.5, self.levels),
+                         ['sample1', 'NC_000007.13', '140453136', '140453136', 'A', 'T', '1-hotspot', '500.5', '400',
+                          '100'])
+
+    def test_columns(self):
+        from hydra_genetics.utils.io.report_columns import ColumnPlan
+        plan = ColumnPlan(self.write_yaml(
+            "columns:\n"
+            "    chr:\n"
+            "        visible: 0\n"
+            "    gvcf_depth:\n"
+            "        field: MIN_DP\n"
+            "        format: ['string', '{:.0f}']\n"
+            "    Gene:\n"
+            "        from: 'hotspot'\n"
+            "        field: 'GENE'\n"
+            "        order: 0\n"
+            "    Analyzable:\n"
+            "        from: 'function'\n"
+            "        name: 'get_read_level'\n"
+            "        variables:\n"
+            "         - levels\n"
+            "         - depth\n"
+            "        column: 1\n"
+            "    Hidden:\n"
+            "        from: 'function'\n"
+            "        name: 'does_not_matter'\n"
+            "        visible: 0\n"
+            "    Depth:\n"
+            "        from: 'variable'\n"
+            "        field: 'depth'\n"
+            "        format: ['string', '{:.2f}']\n"
+            "    Gene_comment:\n"
+            "        from: 'merge'\n"
+            "        divider: '|'\n"
+            "        elements:\n"
+            "            gene:\n"
+            "                from: 'hotspot'\n"
+            "                field: 'GENE'\n"
+            "            comment:\n"
+            "                from: 'hotspot'\n"
+            "                field: 'COMMENT'\n"
+            "                format: ['replace', ' ', '_']\n"))
+        self.assertEqual(plan.depth_field, "MIN_DP")
+        self.assertEqual(plan.header, ['Gene', 'sample', 'start', 'stop', 'ref', 'alt', 'report', 'gvcf_depth',
+                                       'ref_depth', 'alt_depth', 'Analyzable', 'Depth', 'Gene_comment_gene|comment'])
+        # the hidden chr and formatted gvcf_depth aren't typed
+        self.assertEqual(plan.types, {'sample': 'category', 'start': 'int', 'stop': 'int', 'report': 'category',
+                                      'ref_depth': 'int'})
+        self.assertEqual(plan.format_row(self.data(), None, Hotspot(), None, 500.5, self.levels),
+                         ['BRAF', 'sample1', '140453136', '140453136', 'A', 'T', '1-hotspot', '500', '400', '100',
+                          'yes', '500.50', 'BRAF|hotspot_comment'])
+        self.assertEqual(plan.format_row(self.data(), None, None, None, 10, self.levels)[-3:],
+                         ['not analyzable', '10.00', '-|-'])
+
+    def test_unknown_variable(self):
+        from hydra_genetics.utils.io.report_columns import ColumnPlan
+        with self.assertRaises(KeyError):
+            ColumnPlan(self.write_yaml(
+                "columns:\n"
+                "    Unknown:\n"
+                "        from: 'variable'\n"
+                "        field: 'unknown'\n"))
+
+    def test_compile_format(self):
+        from hydra_genetics.utils.io.report_columns import compile_format, format_value
+        for format, value in [(['string', '{:.2f}'], "1.234"), (['string', '{}', 'int'], "12"),
+                              (['replace', '&', ','], "a&b")]:
+            self.assertEqual(compile_format(format)(value), format_value(value, format))
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
@@ -0,0 +1,60 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from pysam import VariantFile
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestAnnotationDataVep(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+        self.vcf = os.path.join(self.tempdir, "data.vcf")
+        with open(self.vcf, 'w', encoding="ascii") as vcf:
+            vcf.write('##fileformat=VCFv4.2\n')
+            vcf.write('##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. '
+                      'Format: Allele|SYMBOL|Feature|EXON">\n')
+            vcf.write("##contig=<ID=chr1,length=249250621>\n")
+            vcf.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
+            vcf.write("chr1\t100\t.\tA\tT\t.\t.\tCSQ=T|GENE1|NM_1.1|,T|GENE1|NM_2.1|2/10,T|GENE2|NM_3.1|4/5\n")
+            vcf.write("chr1\t200\t.\tG\tC\t.\t.\t.\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_get_annotation_data_vep(self):
+        from hydra_genetics.utils.io.utils import get_annotation_data_vep
+        variants = VariantFile(self.vcf)
+        annotated, not_annotated = list(variants)
+        field_dict = {'Allele': 0, 'SYMBOL': 1, 'Feature': 2, 'EXON': 3}
+
+        extractor = get_annotation_data_vep(field_dict)
+        self.assertEqual(extractor(annotated, 'SYMBOL'), "GENE1")
+        self.assertEqual(extractor(annotated, 'Feature'), "NM_1.1")
+        self.assertIsNone(extractor(annotated, 'EXON'))
+        self.assertIsNone(extractor(annotated, 'Unknown'))
+        self.assertIsNone(extractor(not_annotated, 'SYMBOL'))
+        with self.assertRaises(AttributeError):
+            extractor(None, 'SYMBOL')
+
+        extractor = get_annotation_data_vep(field_dict, {"chr1_99_100_A_T": "NM_2", "chr1_199_200_G_C": "NM_3"})
+        self.assertEqual(extractor(annotated, 'Feature'), "NM_2.1")
+        self.assertEqual(extractor(annotated, 'EXON'), "2/10")
+        self.assertIsNone(extractor(not_annotated, 'EXON'))
+        self.assertEqual(extractor(annotated, 'SYMBOL'), "GENE1")
+
+        extractor = get_annotation_data_vep(field_dict, {"chr1_99_100_A_T": "NM_4"})
+        self.assertEqual(extractor(annotated, 'Feature'), "NM_1.1")
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
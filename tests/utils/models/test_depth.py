@@ -0,0 +1,97 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import logging
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestDepthStore(unittest.TestCase):
+    def setUp(self):
+        from hydra_genetics.utils.models.depth import DepthStore
+        self.depth_store = DepthStore()
+        # single positions 100-102, a reference block 102-109 overlapped by a record at 105
+        # and a duplicated start at 120 where the last record should be used
+        self.depth_store.add_contig("chr1",
+                                    [100, 101, 102, 105, 120, 120],
+                                    [101, 102, 110, 106, 121, 121],
+                                    [10, 11, 20, 30, 1, 2])
+
+    def test_get_depth(self):
+        self.assertEqual(self.depth_store.get_depth("chr1", 100, 101), 10)
+        self.assertEqual(self.depth_store.get_depth("chr1", 103, 104), 20)
+        self.assertEqual(self.depth_store.get_depth("chr1", 105, 106), 30)
+        self.assertEqual(self.depth_store.get_depth("chr1", 106, 107), 0)
+        self.assertEqual(self.depth_store.get_depth("chr1", 120, 121), 2)
+        self.assertEqual(self.depth_store.get_depth("chr1", 99, 100), 0)
+        self.assertEqual(self.depth_store.get_depth("chr2", 100, 101), 0)
+        self.assertEqual(self.depth_store.get_depth("chr1", 100, 100), 0)
+
+    def test_get_depth_mean(self):
+        import statistics
+        per_position = {100: 10, 101: 11, 102: 20, 103: 20, 104: 20, 105: 30, 120: 2}
+        for start, stop in [(100, 102), (100, 103), (102, 105), (99, 107), (103, 105), (118, 122)]:
+            expected = statistics.mean([per_position.get(pos, 0) for pos in range(start, stop)])
+            result = self.depth_store.get_depth("chr1", start, stop)
+            self.assertEqual(result, expected)
+            self.assertEqual(str(result), str(expected))
+
+    def test_get_coverage(self):
+        import statistics
+        per_position = {100: 10, 101: 11, 102: 20, 103: 20, 104: 20, 105: 30, 120: 2}
+        thresholds = [0, 11, 20, 31]
+        for start, stop in [(100, 101), (100, 102), (100, 103), (99, 107), (103, 105), (118, 122)]:
+            depths = [per_position.get(pos, 0) for pos in range(start, stop)]
+            minimum, mean, median, fractions = self.depth_store.get_coverage("chr1", start, stop, thresholds)
+            self.assertEqual(minimum, min(depths))
+            self.assertAlmostEqual(mean, statistics.mean(depths))
+            self.assertEqual(median, statistics.median(depths))
+            self.assertEqual(fractions, [sum(depth >= threshold for depth in depths) / len(depths) for threshold in thresholds])
+        self.assertEqual(self.depth_store.get_coverage("chr2", 100, 102, [0, 1]), (0, 0.0, 0.0, [1.0, 0.0]))
+        self.assertEqual(self.depth_store.get_coverage("chr1", 100, 100, [0]), (0, 0.0, 0.0, [0.0]))
+
+    def test_depth_window(self):
+        from hydra_genetics.utils.models.depth import DepthStore, DepthWindow
+        import random
+        rng = random.Random(1)
+        # overlapping blocks, duplicated starts and gaps, with end positions in order as fetched from a gVCF
+        blocks = [(0, 1, 0)]
+        position = 0
+        for _ in range(2000):
+            position += rng.choice([0, 1, 1, 5, 20, 3000])
+            blocks.append((position, max(blocks[-1][1], position + rng.choice([1, 1, 10, 200])), rng.randint(0, 500)))
+        depth_store = DepthStore()
+        depth_store.add_contig("chr1", *zip(*blocks))
+        fetched = []
+
+        def fetch(contig, start):
+            fetched.append(start)
+            return [block for block in blocks if block[1] > start] if contig == "chr1" else []
+
+        window = DepthWindow(fetch, distance=100)
+        position = 0
+        while position < blocks[-1][1]:
+            for start in [position, position + rng.randint(0, 50)]:
+                stop = start + rng.choice([0, 1, 2, 150])
+                self.assertEqual(window.get_depth("chr1", start, stop), depth_store.get_depth("chr1", start, stop))
+                self.assertEqual(window.get_coverage("chr1", start, stop, [0, 100]),
+                                 depth_store.get_coverage("chr1", start, stop, [0, 100]))
+            position += rng.choice([1, 10, 500, 5000])
+            window.advance("chr1", position)
+        self.assertGreater(len(fetched), 1)
+        with self.assertRaises(ValueError):
+            window.get_depth("chr1", position - 1, position)
+        self.assertEqual(window.get_depth("chr2", 0, 10), 0)
+
+    def test_unsorted(self):
+        from hydra_genetics.utils.models.depth import DepthStore
+        with self.assertRaises(ValueError):
+            DepthStore().add_contig("chr1", [10, 5], [11, 6], [1, 1])
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
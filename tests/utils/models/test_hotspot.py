@@ -110,6 +110,46 @@ class TestModels(unittest.TestCase):
                     "p.V773",
                     ReportClass["region_all"], "-", "e20", "NM_004448")
 
+    def test_hotspot_add_variant(self):
+        import pysam
+        from hydra_genetics.utils.io.chr import ChrTranslater
+        from hydra_genetics.utils.models.hotspot import Hotspot
+        from hydra_genetics.utils.models.hotspot import ReportClass
+        translater = ChrTranslater(os.path.join(self.tempdir, "mapping"))
+        header = pysam.VariantHeader()
+        header.contigs.add("chr17", length=81195210)
+
+        def variant(pos, ref, alt):
+            return header.new_record(contig="chr17", start=pos - 1, alleles=(ref, alt))
+
+        hotspot = Hotspot("NC_000017.10", 37880990, 2000037880989, "ERBB2", "-", "-",
+                          ReportClass["region_all"], "-", "exon20", "NM_004448")
+        self.assertEqual(len(hotspot.VARIANTS), 2000000000000)
+        self.assertEqual(hotspot.VARIANTS[0], {'extended': False, 'variants': []})
+        self.assertEqual(hotspot.VARIANTS[-1], {'extended': False, 'variants': []})
+        self.assertEqual(list(hotspot.iter_positions(False)), [])
+
+        hotspot = Hotspot("NC_000017.10", 37880990, 37880992, "ERBB2", "-", "-",
+                          ReportClass["region_all"], "-", "exon20", "NM_004448")
+        snv = variant(37880991, "A", "T")
+        deletion = variant(37880988, "ACGT", "A")
+        deletion2 = variant(37880985, "ACGTACG", "A")
+        self.assertFalse(hotspot.add_variant(variant(37880993, "A", "T"), translater))
+        self.assertTrue(hotspot.add_variant(snv, translater))
+        self.assertTrue(hotspot.add_variant(deletion, translater))
+        self.assertTrue(hotspot.add_variant(deletion2, translater))
+        self.assertEqual((hotspot.EXTENDED_START, hotspot.EXTENDED_END), (37880985, 37880992))
+        self.assertEqual(list(hotspot.iter_positions(False)), [(37880985, [deletion2], True),
+                                                               (37880988, [deletion], True),
+                                                               (37880991, [snv], False)])
+        self.assertEqual([(p, e) for p, _, e in hotspot.iter_positions()],
+                         [(37880985 + i, i < 5) for i in range(8)])
+        self.assertEqual(hotspot.VARIANTS[6], {'extended': False, 'variants': [snv]})
+
+        hotspot.clear_variants()
+        self.assertEqual((hotspot.EXTENDED_START, hotspot.EXTENDED_END), (37880990, 37880992))
+        self.assertEqual(list(hotspot.VARIANTS), [{'extended': False, 'variants': []} for i in range(3)])
+
     def test_mapping_creation(self):
         from hydra_genetics.utils.io.chr import ChrTranslater
         translater = ChrTranslater(os.path.join(self.tempdir, "mapping"))
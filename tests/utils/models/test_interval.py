@@ -0,0 +1,80 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import logging
+import random
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestIntervalIndex(unittest.TestCase):
+    def test_overlap(self):
+        from hydra_genetics.utils.models.interval import IntervalIndex
+        index = IntervalIndex()
+        index.add("NC_000002.11", 29445271, 29445281, "region_all")
+        index.add("NC_000002.11", 29445271, 29445271, "hotspot")
+        index.add("NC_000002.11", 29999990, 30000010, "cross_mb")
+        index.add("NC_000007.13", 140498361, 140498361, "EGFR")
+
+        self.assertEqual(index.overlap("NC_000002.11", 29445271, 29445271), ["region_all", "hotspot"])
+        self.assertEqual(index.overlap("NC_000002.11", 29445272, 29445300), ["region_all"])
+        self.assertEqual(index.overlap("NC_000002.11", 29445282, 29445300), [])
+        self.assertEqual(index.overlap("NC_000002.11", 30000005, 30000005), ["cross_mb"])
+        self.assertEqual(index.overlap("NC_000007.13", 140498359, 140498362), ["EGFR"])
+        self.assertEqual(index.overlap("NC_000008.11", 1, 1000000), [])
+        self.assertEqual(list(index), ["region_all", "hotspot", "cross_mb", "EGFR"])
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.contigs(), ["NC_000002.11", "NC_000007.13"])
+
+        with self.assertRaises(ValueError):
+            index.add("NC_000002.11", 10, 9, "invalid")
+
+    def test_overlap_random(self):
+        from hydra_genetics.utils.models.interval import IntervalIndex
+        generator = random.Random(1)
+        for size in [0, 1, 2, 7, 15, 16, 17, 100, 513]:
+            index = IntervalIndex()
+            intervals = []
+            for i in range(size):
+                contig = generator.choice(["chr1", "chr2"])
+                start = generator.randint(1, 10000)
+                end = start + generator.choice([0, 1, 10, 100, 5000])
+                index.add(contig, start, end, i)
+                intervals.append((contig, start, end, i))
+            for _ in range(200):
+                contig = generator.choice(["chr1", "chr2"])
+                start = generator.randint(1, 16000)
+                end = start + generator.randint(0, 50)
+                expected = [i for c, s, e, i in intervals if c == contig and s <= end and start <= e]
+                self.assertEqual(index.overlap(contig, start, end), expected)
+
+
+class TestMergeRegions(unittest.TestCase):
+    def test_merge_regions(self):
+        from hydra_genetics.utils.models.interval import merge_regions
+        regions = [("chr2", 100, 110), ("chr1", 50, 60), ("chr2", 105, 120), ("chr2", 120, 121), ("chr2", 200, 210)]
+        self.assertEqual(merge_regions(regions), {"chr2": [(100, 121), (200, 210)], "chr1": [(50, 60)]})
+        self.assertEqual(list(merge_regions(regions).keys()), ["chr2", "chr1"])
+        self.assertEqual(merge_regions(regions, 100), {"chr2": [(100, 210)], "chr1": [(50, 60)]})
+        self.assertEqual(merge_regions([]), {})
+
+
+class TestRegionSet(unittest.TestCase):
+    def test_contains(self):
+        from hydra_genetics.utils.models.interval import RegionSet
+        regions = RegionSet([("chr2", 100, 110), ("chr1", 50, 60), ("chr2", 110, 120), ("chr2", 200, 210)])
+        self.assertEqual(list(regions), [("chr2", 100, 120), ("chr2", 200, 210), ("chr1", 50, 60)])
+        self.assertEqual(len(regions), 3)
+        self.assertEqual([position for position in [99, 100, 119, 120, 199, 209, 210] if regions.contains("chr2", position)],
+                         [100, 119, 209])
+        self.assertTrue(regions.contains("chr1", 50))
+        self.assertFalse(regions.contains("chr3", 50))
+        self.assertEqual(len(RegionSet([])), 0)
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()
@@ -0,0 +1,65 @@
+# vim: syntax=python tabstop=4 expandtab
+# coding: utf-8
+
+import importlib.util
+import logging
+import unittest
+
+logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestHotspotReport(unittest.TestCase):
+    def setUp(self):
+        self.columns = ['sample', 'chr', 'start']
+        self.rows = [['sample1', 'NC_000002.11', '29445271'], ['sample1', 'NC_000007.13', '140498361']]
+
+    def test_iterate(self):
+        from hydra_genetics.utils.models.report import HotspotReport
+        report = HotspotReport(self.columns, (row for row in self.rows))
+        self.assertEqual(report.columns, self.columns)
+        self.assertIsNone(report.coverage)
+        self.assertEqual(list(report), self.rows)
+        self.assertEqual(list(report), [])
+
+        report = HotspotReport(self.columns, self.rows)
+        self.assertEqual(list(report.to_dicts())[1], {'sample': 'sample1', 'chr': 'NC_000007.13', 'start': '140498361'})
+
+    def test_tables(self):
+        from hydra_genetics.utils.models.report import HotspotReport
+        self.assertEqual(HotspotReport(self.columns, self.rows).to_columns(),
+                         {'sample': ['sample1', 'sample1'], 'chr': ['NC_000002.11', 'NC_000007.13'],
+                          'start': ['29445271', '140498361']})
+        self.assertEqual(HotspotReport(self.columns, []).to_columns(), {'sample': [], 'chr': [], 'start': []})
+
+        data_frame = HotspotReport(self.columns, self.rows).to_pandas()
+        self.assertEqual(list(data_frame.columns), self.columns)
+        self.assertEqual(data_frame['start'].tolist(), ['29445271', '140498361'])
+        self.assertEqual(len(HotspotReport(self.columns, []).to_pandas()), 0)
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "requires pyarrow")
+    def test_to_arrow(self):
+        import pyarrow
+        from hydra_genetics.utils.models.report import HotspotReport
+        columns = self.columns + ['depth', 'ref_depth']
+        rows = [row + [depth, ref_depth] for row, depth, ref_depth in zip(self.rows, ['30.5', '300'], ['-', '12'])]
+        types = {'chr': 'category', 'start': 'int', 'depth': 'float', 'ref_depth': 'int'}
+
+        table = HotspotReport(columns, rows, types=types).to_arrow()
+        self.assertEqual(table.column_names, columns)
+        self.assertEqual(table.schema.field('sample').type, pyarrow.string())
+        self.assertEqual(table.schema.field('chr').type, pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+        self.assertEqual(table.column('start').to_pylist(), [29445271, 140498361])
+        self.assertEqual(table.column('depth').to_pylist(), [30.5, 300.0])
+        self.assertEqual(table.column('ref_depth').to_pylist(), [None, 12])
+        self.assertEqual(table.column('chr').to_pylist(), ['NC_000002.11', 'NC_000007.13'])
+
+        batches = list(HotspotReport(columns, rows, types=types).to_arrow_batches(1))
+        self.assertEqual([batch.num_rows for batch in batches], [1, 1])
+        self.assertEqual(HotspotReport(columns, [], types=types).to_arrow().num_rows, 0)
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stdout, format='%(message)s')
+    unittest.main()